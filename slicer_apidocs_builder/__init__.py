@@ -3,19 +3,104 @@
 from __future__ import absolute_import
 
 import argparse
+import asyncio
+import atexit
+import contextlib
+import errno
+import json
 import os
+import posixpath
+import random
 import re
 import shlex
 import shutil
 import subprocess
+import sys
 import tempfile
 import textwrap
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+
+from . import daemon
+from .build_cache import DEFAULT_BUILD_CACHE_MAX_SIZE, BuildDirCache
+from .compress import SIDECAR_EXTENSIONS, available_encodings, compress_html_tree
+from .dedup import SHARED_DIR, SHARED_MANIFEST_FILENAME, dedup_html_tree, read_shared_manifest
+from .doxyfile import documented_input_paths
+from .doxygen_warnings import (
+    WARNINGS_DIFF_FILENAME,
+    WARNINGS_INDEX_FILENAME,
+    DoxygenWarningCollector,
+    diff_warning_indexes,
+    format_warning_summary,
+    read_warning_index,
+    read_warning_summary,
+    write_warning_index,
+)
+from .fingerprint import (
+    CONFIGURE_FINGERPRINT_FILENAME,
+    DOXYGEN_INPUT_PATHS,
+    clear_build_fingerprint,
+    compute_build_fingerprint,
+    compute_configure_fingerprint,
+    read_build_fingerprint,
+    write_build_fingerprint,
+)
+from .github_api import GITHUB_API_URL, GitHubAPIError, GitHubClient
+from .instrumentation import REPORT, call_with_spans, span
+from .linkcheck import DISPLAYED_BROKEN_LINKS, LINK_REPORT_FILENAME, check_html_links, write_link_report
+from .normalize import normalize_html_tree
+from .publish import DEFAULT_KEEP_VERSIONS, FilesystemPublishBackend, PublishBackend
+from .partitions import (
+    PARTITIONS_DIRNAME,
+    build_partitions,
+    configured_doxyfile,
+    doxygen_executable,
+)
+from .search_index import build_search_index
+from .sync import display_sync_report, sync_tree
+from .refs import (
+    GitCatFile,
+    RefCache,
+    extract_apidocs_version_from_tag,
+    extract_slicer_xy_version_from_lines,
+    lookup_slicer_ref,
+    resolve_slicer_ref,
+)
+from .utils import CommandCancelled, execute, file_lock, mkdir_p, working_dir
 
-import github3
+__version__ = "0.1.0"
 
-from .utils import execute, mkdir_p, working_dir
+BUILD_LOG_FILENAME = "doc-build.log.gz"
 
-__version__ = "0.1.0"
+# Directory created next to the html output directory and holding its shared assets
+SHARED_STORE_DIRNAME = "apidocs-shared"
+
+# Entries of each page indexed by the last search index build
+SEARCH_INDEX_CACHE_FILENAME = "apidocs-search-cache.json.gz"
+
+# Number of push attempts and initial delay (in seconds) between attempts
+PUSH_ATTEMPTS = 5
+PUSH_RETRY_DELAY = 2.0
+
+# Messages reported by "git push" when the remote branch was updated by another publisher
+PUSH_REJECTED_REASONS = [
+    "[rejected]",
+    "non-fast-forward",
+    "fetch first",
+    "failed to update ref",
+    "cannot lock ref",
+    "stale info",
+]
+
+# Subject of the root commit standing for the squashed history of the publishing branch
+HISTORY_SQUASHED_SUBJECT = "Slicer apidocs history squashed"
+
+# Published subdirs documenting releases (see extract_apidocs_version_from_tag). They are never collected.
+RELEASE_SUBDIR_REGEX = re.compile(r"^v[0-9]+\.[0-9]+$")
+
+# Number of days during which subdirs of removed branches are kept by default
+DEFAULT_GC_KEEP_DAYS = 30
 
 
 def extract_slicer_xy_version(slicer_src_dir):
@@ -23,90 +108,359 @@ def extract_slicer_xy_version(slicer_src_dir):
     from top-level CMakeLists.txt
     """
     slicer_src_dir = os.path.abspath(slicer_src_dir)
-    expressions = {part: re.compile(r"set\(Slicer_VERSION_%s \"([0-9]+)\"\)" % part.upper())
-                   for part in ["major", "minor"]}
-    parts = {}
     with open(slicer_src_dir + "/CMakeLists.txt") as fp:
-        for line in fp:
-            for part, expression in expressions.items():
-                m = expression.match(line.strip())
-                if m is not None:
-                    parts[part] = m.group(1)
-            if len(parts) == len(expressions):
-              break
-    return "{major}.{minor}".format(**parts) if parts else None
+        return extract_slicer_xy_version_from_lines(fp)
 
 
-def extract_apidocs_version_from_tag(slicer_repo_tag):
-    return "v" + ".".join(slicer_repo_tag.lstrip("v").split(".")[:2])
+def _is_checkout_root(repo_dir):
+    """Return True if ``repo_dir`` is the top-level directory of a git work tree."""
+    try:
+        toplevel = execute(["git", "-C", repo_dir, "rev-parse", "--show-toplevel"], capture=True, verbose=False)
+    except subprocess.CalledProcessError:
+        return False
+    return os.path.realpath(toplevel.strip()) == os.path.realpath(repo_dir)
 
 
 def is_tag(source_dir, branch_or_tag):
-    with working_dir(source_dir):
-        # branch or tag ?
-        try:
-            execute("git describe --exact --tags %s" % branch_or_tag, capture=True)
-            return True
-        except subprocess.CalledProcessError:
-            return False
+    # branch or tag ?
+    try:
+        execute(["git", "-C", source_dir, "rev-parse", "--verify", "--quiet", "refs/tags/%s" % branch_or_tag],
+                capture=True, verbose=False)
+        return True
+    except subprocess.CalledProcessError:
+        return False
+
+
+def _apidocs_checkout_slicer(
+        slicer_repo_clone_url=None,
+        slicer_repo_dir=None,
+        slicer_repo_branch_or_tag=None,
+        slicer_repo_mirror_dir=None,
+        skip_mirror_update=False,
+        slicer_repo_sparse=False,
+):
+    """Checkout Slicer sources and return the associated :class:`ResolvedRef`.
+
+    If ``slicer_repo_mirror_dir`` is set, the sources are checked out as a
+    worktree of that bare mirror (created or updated unless ``skip_mirror_update``
+    is True) so that git objects are downloaded and stored only once for all
+    the documented refs. Otherwise, ``slicer_repo_dir`` is a regular clone.
+
+    If ``slicer_repo_sparse`` is True, new mirrors and clones are blobless
+    partial clones and only the paths read by Doxygen are checked out.
+    """
+    assert slicer_repo_clone_url
+    assert slicer_repo_dir
+    assert slicer_repo_branch_or_tag
+
+    # Running git in a directory that is not a checkout would update an enclosing repository
+    reuse_checkout = os.path.isdir(slicer_repo_dir) and bool(os.listdir(slicer_repo_dir))
+    assert not reuse_checkout or _is_checkout_root(slicer_repo_dir), \
+        "%s exists and is not a git checkout" % slicer_repo_dir
+
+    # Existing clones are still supported when a mirror is specified
+    use_worktree = slicer_repo_mirror_dir and not os.path.isdir(slicer_repo_dir + "/.git")
+
+    if use_worktree:
+
+        # Get Slicer source
+        if not skip_mirror_update:
+            _update_mirror(slicer_repo_clone_url, slicer_repo_mirror_dir, partial=slicer_repo_sparse)
+
+        # Get reference
+        slicer_repo_ref = _mirror_ref(slicer_repo_mirror_dir, slicer_repo_branch_or_tag)
+        print("\nslicer_repo_ref: %s" % slicer_repo_ref)
+
+        # Checkout expected reference
+        if not reuse_checkout:
+            with file_lock(slicer_repo_mirror_dir + ".lock"):
+                execute(["git", "-C", slicer_repo_mirror_dir, "worktree", "add", "--force", "--detach"]
+                        + (["--no-checkout"] if slicer_repo_sparse else [])
+                        + [slicer_repo_dir, slicer_repo_ref])
+        if slicer_repo_sparse:
+            _sparse_checkout_set(slicer_repo_dir, slicer_repo_mirror_dir, slicer_repo_ref)
+        execute(["git", "-C", slicer_repo_dir, "checkout", "--force", "--detach", slicer_repo_ref])
+
+    else:
+
+        # Get Slicer source
+        if not reuse_checkout:
+            partial_args = "--filter=blob:none --no-checkout " if slicer_repo_sparse else ""
+            execute("git clone %s%s --branch %s --depth 1 %s" % (
+                partial_args, slicer_repo_clone_url, slicer_repo_branch_or_tag, slicer_repo_dir))
+        else:
+            execute(["git", "-C", slicer_repo_dir, "fetch", "origin"])
+
+        # Get reference
+        slicer_repo_ref = "origin/" + slicer_repo_branch_or_tag
+        if is_tag(slicer_repo_dir, slicer_repo_branch_or_tag):
+            slicer_repo_ref = slicer_repo_branch_or_tag
+
+        print("\nslicer_repo_ref: %s" % slicer_repo_ref)
+
+        if slicer_repo_sparse:
+            _sparse_checkout_set(slicer_repo_dir, slicer_repo_dir, slicer_repo_ref)
+
+        # Checkout expected reference
+        execute(["git", "-C", slicer_repo_dir, "reset", "--hard", slicer_repo_ref])
+
+    slicer_ref = resolve_slicer_ref(slicer_repo_dir, slicer_repo_branch_or_tag)
+    print("\nslicer_ref: %s" % (slicer_ref,))
+    return slicer_ref
 
 
 def _apidocs_build_doxygen(
         html_output_dir=None,
         apidocs_src_dir=None,
         apidocs_build_dir=None,
-        slicer_repo_clone_url=None,
         slicer_repo_dir=None,
-        slicer_repo_branch_or_tag=None
+        slicer_ref=None,
+        extra_cmake_args=(),
+        force_build=False,
+        build_timeout=None,
+        doxygen_partition_depth=None,
+        doxygen_jobs=None,
 ):
+    """Generate the html documentation of the Slicer sources checked out
+    in ``slicer_repo_dir`` (see :func:`_apidocs_checkout_slicer`).
+
+    The output of the Doxygen build is streamed and saved into
+    ``<apidocs_build_dir>/doc-build.log.gz``. The build is terminated if it
+    lasts more than ``build_timeout`` seconds. Doxygen warnings are indexed
+    by file, line and kind into ``<html_output_dir>/apidocs-warnings.json``.
+
+    If ``doxygen_partition_depth`` is specified, each component found at that
+    depth of the Doxygen input directories is documented by its own Doxygen
+    run using up to ``doxygen_jobs`` parallel processes instead of running the
+    ``doc`` target (see :func:`build_partitions`). Logs are then saved
+    into ``<apidocs_build_dir>/apidocs-partitions/<component>``.
+
+    The build is skipped if the fingerprint of the documented inputs matches
+    the one of the last successful build and its html output is still
+    available. The CMake configuration is skipped if its inputs are unchanged
+    (see :func:`compute_configure_fingerprint`): changes of the CMake files
+    it does not track are still detected by the build tool. Return True if
+    the documentation was (re)generated.
+    """
     assert html_output_dir
     assert apidocs_src_dir
     assert apidocs_build_dir
-    assert slicer_repo_clone_url
     assert slicer_repo_dir
-    assert slicer_repo_branch_or_tag
+    assert slicer_ref
+    assert slicer_ref.version
 
     apidocs_cmakelists = os.path.dirname(os.path.abspath(__file__)) + "/CMakeLists.txt"
     print("\nCopying %s into %s" % (apidocs_cmakelists, apidocs_src_dir))
     mkdir_p(apidocs_src_dir)
     shutil.copy(apidocs_cmakelists, apidocs_src_dir)
 
-    # Get Slicer source
-    if not os.path.exists(slicer_repo_dir):
-        execute("git clone %s --branch %s --depth 1 %s" % (
-            slicer_repo_clone_url, slicer_repo_branch_or_tag, slicer_repo_dir))
-    else:
-        with working_dir(slicer_repo_dir):
-            execute("git fetch origin")
-
-    # Get reference
-    slicer_repo_ref = "origin/" + slicer_repo_branch_or_tag
-    if is_tag(slicer_repo_dir, slicer_repo_branch_or_tag):
-        slicer_repo_ref = slicer_repo_branch_or_tag
-
-    print("\nslicer_repo_ref: %s" % slicer_repo_ref)
-
-    # Checkout expected reference
-    with working_dir(slicer_repo_dir):
-        execute("git reset --hard %s" % slicer_repo_ref)
-
-    version = extract_slicer_xy_version(slicer_repo_dir)
-    assert version
+    # Reuse html output if documented inputs are unchanged
+    fingerprint, fingerprint_inputs = compute_build_fingerprint(
+        slicer_repo_dir, slicer_ref.version, apidocs_cmakelists,
+        cmake_args=extra_cmake_args, revision=slicer_ref.sha,
+        options={"doxygen_partition_depth": doxygen_partition_depth})
+    print("\nbuild fingerprint: %s" % fingerprint)
+    if (not force_build
+            and read_build_fingerprint(apidocs_build_dir) == fingerprint
+            and os.path.exists(html_output_dir + "/index.html")):
+        print("\nDocumented inputs are unchanged: reusing %s" % html_output_dir)
+        return False
 
     with working_dir(apidocs_build_dir, make_directory=True):
 
+        clear_build_fingerprint(apidocs_build_dir)
+
         # configure
-        execute([
-            "cmake",
-            "-DSlicer_SOURCE_DIR:PATH=%s" % slicer_repo_dir,
-            "-DSlicer_VERSION:STRING=%s" % version,
-            apidocs_src_dir
-        ])
+        configure_fingerprint, configure_inputs = compute_configure_fingerprint(
+            slicer_repo_dir, slicer_ref.version, apidocs_src_dir, apidocs_cmakelists,
+            cmake_args=extra_cmake_args, revision=slicer_ref.sha)
+        if (read_build_fingerprint(apidocs_build_dir, CONFIGURE_FINGERPRINT_FILENAME) == configure_fingerprint
+                and os.path.exists(os.path.join(apidocs_build_dir, "CMakeCache.txt"))):
+            print("\nCMake inputs are unchanged: skipping configuration of %s" % apidocs_build_dir)
+        else:
+            clear_build_fingerprint(apidocs_build_dir, CONFIGURE_FINGERPRINT_FILENAME)
+            execute([
+                "cmake",
+                "-DSlicer_SOURCE_DIR:PATH=%s" % slicer_repo_dir,
+                "-DSlicer_VERSION:STRING=%s" % slicer_ref.version,
+            ] + list(extra_cmake_args) + [
+                apidocs_src_dir
+            ])
+            write_build_fingerprint(
+                apidocs_build_dir, configure_fingerprint, configure_inputs, CONFIGURE_FINGERPRINT_FILENAME)
 
         # build
-        execute("cmake --build . --target doc")
+        warning_collector = DoxygenWarningCollector(slicer_repo_dir)
+        if doxygen_partition_depth:
+            doxyfile = configured_doxyfile(apidocs_build_dir, slicer_repo_dir)
+            assert doxyfile, "Doxygen configuration not found in %s" % apidocs_build_dir
+            partitions = build_partitions(
+                doxyfile, doxygen_executable(apidocs_build_dir), slicer_repo_dir, slicer_ref.sha,
+                html_output_dir, os.path.join(apidocs_build_dir, PARTITIONS_DIRNAME),
+                depth=doxygen_partition_depth, max_workers=doxygen_jobs, timeout=build_timeout,
+                force=force_build)
+            print("\nDoxygen partitions")
+            for partition in partitions:
+                print("  * %s: %s" % (partition.name, partition.outcome))
+                warning_collector.warnings.extend(partition.warnings)
+        else:
+            # Pages of removed sources would be published again
+            if os.path.isdir(html_output_dir):
+                print("\nRemoving %s" % html_output_dir)
+                shutil.rmtree(html_output_dir)
+            execute("cmake --build . --target doc", streaming=True, output_callback=warning_collector,
+                    log_file=os.path.join(apidocs_build_dir, BUILD_LOG_FILENAME), timeout=build_timeout)
         assert os.path.exists(html_output_dir + "/index.html")
 
+        warning_index = warning_collector.index()
+        write_warning_index(os.path.join(html_output_dir, WARNINGS_INDEX_FILENAME), warning_index)
+        print("\nDoxygen warnings: %d" % warning_index["count"])
+
+        write_build_fingerprint(apidocs_build_dir, fingerprint, fingerprint_inputs)
+
+    return True
+
+
+def _apidocs_normalize_html(html_output_dir, strip_prefixes):
+    print("\nNormalizing %s" % html_output_dir)
+    modified = normalize_html_tree(html_output_dir, strip_prefixes=strip_prefixes)
+    print("  * normalized files ............: %d" % modified)
+
+
+def _apidocs_compress_html(html_output_dir):
+    encodings = available_encodings()
+    print("\nCompressing %s (%s)" % (html_output_dir, ", ".join(encodings)))
+    compressed, reused = compress_html_tree(html_output_dir, encodings)
+    print("  * compressed files ............: %d" % compressed)
+    print("  * unchanged files .............: %d" % reused)
+
+
+def _apidocs_build_search_index(html_output_dir):
+    print("\nIndexing %s" % html_output_dir)
+    cache_file = os.path.join(os.path.dirname(os.path.abspath(html_output_dir)), SEARCH_INDEX_CACHE_FILENAME)
+    parsed, written = build_search_index(html_output_dir, cache_file)
+    print("  * parsed pages ................: %d" % parsed)
+    print("  * written shards ..............: %d" % written)
+
+
+def _apidocs_check_links(html_output_dir, max_broken_links=None):
+    """Check the links of ``html_output_dir`` (see :func:`check_html_links`) and save the report
+    next to it. Return False if there are more than ``max_broken_links`` broken links."""
+    print("\nChecking links of %s" % html_output_dir)
+    report = check_html_links(html_output_dir)
+    write_link_report(
+        os.path.join(os.path.dirname(os.path.abspath(html_output_dir)), LINK_REPORT_FILENAME), report)
+    print("  * checked pages ...............: %d" % report["pages"])
+    print("  * checked links ...............: %d" % report["links"])
+    print("  * unchecked links .............: %d" % report["unchecked"])
+    print("  * broken links ................: %d" % len(report["broken"]))
+    print("  * orphan files ................: %d" % len(report["orphans"]))
+    for page, link, reason in report["broken"][:DISPLAYED_BROKEN_LINKS]:
+        print("    %s: %s (%s)" % (page, link, reason))
+    if len(report["broken"]) > DISPLAYED_BROKEN_LINKS:
+        print("    ...")
+    if max_broken_links is not None and len(report["broken"]) > max_broken_links:
+        print("\nMore than %d broken links found in %s" % (max_broken_links, html_output_dir))
+        return False
+    return True
+
+
+def _apidocs_diff_warnings(html_output_dir, published_dir):
+    """Compare the warning index of ``html_output_dir`` with the one previously
+    published in ``published_dir``.
+
+    The summary is saved next to ``html_output_dir`` so that it is not published
+    and can be reported by a later status update.
+    """
+    current = read_warning_index(os.path.join(html_output_dir, WARNINGS_INDEX_FILENAME))
+    if current is None:
+        return None
+    previous = read_warning_index(os.path.join(published_dir, WARNINGS_INDEX_FILENAME))
+    summary = diff_warning_indexes(previous, current)
+    with open(_warnings_diff_file(html_output_dir), "w") as fp:
+        json.dump(summary, fp, indent=2)
+    print("\nDoxygen warnings: %d (%s)" % (summary["total"], format_warning_summary(summary)))
+    return summary
+
+
+def _git_published_blobs():
+    """Return the list of ``(path, blob_id)`` of the files of the publishing repository."""
+    try:
+        output = execute(["git", "ls-tree", "-r", "--full-tree", "HEAD"], capture=True, verbose=False)
+    except subprocess.CalledProcessError:
+        # Branch without commit
+        return []
+    blobs = []
+    for line in output.splitlines():
+        info, path = line.split("\t", 1)
+        blobs.append((path, info.split()[2]))
+    return blobs
+
+
+def _apidocs_dedup_assets(html_output_dir, publish_github_subdir, published_blobs):
+    """Move the assets of ``html_output_dir`` identical to files published outside of
+    ``publish_github_subdir`` into the shared asset directory (see :func:`dedup_html_tree`).
+
+    Shared assets are kept next to ``html_output_dir`` and copied into the
+    publishing repository (current directory) if they are missing. Return
+    the paths of the copied files.
+    """
+    blob_ids = {blob_id for path, blob_id in published_blobs
+                if not path.startswith(publish_github_subdir + "/")}
+    store_dir = os.path.join(os.path.dirname(os.path.abspath(html_output_dir)), SHARED_STORE_DIRNAME)
+    shared = dedup_html_tree(html_output_dir, publish_github_subdir, blob_ids, store_dir)
+    copied_paths = []
+    for shared_path in sorted(shared):
+        for extension in [""] + list(SIDECAR_EXTENSIONS.values()):
+            source = os.path.join(store_dir, shared_path + extension)
+            if os.path.exists(source) and not os.path.exists(shared_path + extension):
+                mkdir_p(os.path.dirname(shared_path))
+                shutil.copyfile(source, shared_path + extension)
+                copied_paths.append(shared_path + extension)
+        if not os.path.exists(shared_path):
+            print("\nWarning: shared asset %s (%s) is missing" % (shared_path, shared[shared_path]))
+    print("\nApidocs dedup report")
+    print("  * shared assets ...............: %d" % len(shared))
+    print("  * new shared files ............: %d" % len(copied_paths))
+    return copied_paths
+
+
+def _warnings_diff_file(html_output_dir):
+    return os.path.join(os.path.dirname(os.path.abspath(html_output_dir)), WARNINGS_DIFF_FILENAME)
+
+
+def _git_stage_paths(updated_paths, deleted_paths):
+    """Stage only the listed paths instead of scanning the whole work tree."""
+    for paths, cmd in [
+        (updated_paths, "git --literal-pathspecs add --force"),
+        (deleted_paths, "git --literal-pathspecs rm --cached --ignore-unmatch --quiet"),
+    ]:
+        if not paths:
+            continue
+        with tempfile.NamedTemporaryFile("w", suffix=".pathspec", delete=False) as fp:
+            fp.write("\0".join(paths))
+        try:
+            execute("%s --pathspec-from-file=%s --pathspec-file-nul" % (cmd, fp.name))
+        finally:
+            os.remove(fp.name)
+
+
+def _clone_publish_repo(publish_github_repo_url, publish_github_repo_dir, publish_github_repo_branch):
+    try:
+        execute(
+            f"git clone --branch {publish_github_repo_branch} --depth 1 {publish_github_repo_url} {publish_github_repo_dir}",
+            capture=True)
+    except subprocess.CalledProcessError as exc_info:
+        msg = "Remote branch %s not found in upstream origin" % publish_github_repo_branch
+        if msg not in exc_info.output:
+            raise
+        # Create orphan branch
+        execute(f"git clone {publish_github_repo_url} {publish_github_repo_dir}")
+        with working_dir(publish_github_repo_dir):
+            execute("git symbolic-ref HEAD refs/heads/%s" % publish_github_repo_branch)
+            os.remove(".git/index")
+            execute("git clean -fdx")
+
 
 def _apidocs_publish_doxygen(
         html_output_dir=None,
@@ -121,8 +475,31 @@ def _apidocs_publish_doxygen(
         publish_github_subdir=None,
         slicer_repo_sha_ref=None,
         skip_publish=False,
+        publications=None,
+        publish_github_push_attempts=PUSH_ATTEMPTS,
+        publish_github_max_history=None,
+        publish_dedup_assets=False,
 ):
-    assert html_output_dir
+    """Publish generated html directories into the publishing repository.
+
+    By default, ``html_output_dir`` is published into ``publish_github_subdir``.
+    To publish several directories using a single commit, ``publications``
+    may instead be set to a list of ``(html_output_dir, publish_github_subdir,
+    slicer_repo_sha_ref)`` tuples.
+
+    Rejected pushes are retried up to ``publish_github_push_attempts`` times.
+    If ``publish_github_max_history`` is set, the history of the publishing
+    branch is bounded (see :func:`_git_bound_history`).
+
+    If ``publish_dedup_assets`` is True, assets also published in other
+    subdirectories are moved into a shared directory (see :func:`_apidocs_dedup_assets`).
+    """
+    if publications is None:
+        assert html_output_dir
+        assert publish_github_subdir
+        assert slicer_repo_sha_ref
+        publications = [(html_output_dir, publish_github_subdir, slicer_repo_sha_ref)]
+    assert publications
     if publish_github_repo_dir is None:
         assert publish_github_repo_url
     if publish_github_repo_dir is not None or not publish_github_skip_auth:
@@ -132,96 +509,542 @@ def _apidocs_publish_doxygen(
     assert publish_github_user_email
     if not publish_github_skip_auth:
         assert publish_github_token
-    assert publish_github_subdir
-    assert slicer_repo_sha_ref
 
     # Checkout publishing repo
     if publish_github_repo_dir is None:
         publish_github_repo_dir = "apidocs"
 
-    if not os.path.exists(publish_github_repo_dir):
-        try:
-            execute(
-                f"git clone --branch {publish_github_repo_branch} --depth 1 {publish_github_repo_url} {publish_github_repo_dir}",
-                capture=True)
-        except subprocess.CalledProcessError as exc_info:
-            msg = "Remote branch %s not found in upstream origin" % publish_github_repo_branch
-            if msg not in exc_info.output:
-                raise
-            # Create orphan branch
-            execute(f"git clone {publish_github_repo_url} {publish_github_repo_dir}")
-            with working_dir(publish_github_repo_dir):
-                execute("git symbolic-ref HEAD refs/heads/%s" % publish_github_repo_branch)
-                os.remove(".git/index")
+    # Runs sharing the publishing checkout are serialized
+    with file_lock(os.path.abspath(publish_github_repo_dir) + ".lock"):
+
+        if not os.path.exists(publish_github_repo_dir):
+            with span("publish-clone"):
+                _clone_publish_repo(publish_github_repo_url, publish_github_repo_dir, publish_github_repo_branch)
+
+        with working_dir(publish_github_repo_dir):
+
+            # Update
+            with span("publish-update"):
+                execute("git fetch origin")
+                try:
+                    execute("git reset --hard origin/%s" % publish_github_repo_branch, capture=True)
+                except subprocess.CalledProcessError:
+                    pass
+                # Untracked files left by an interrupted run would be considered as published by sync_tree
                 execute("git clean -fdx")
 
-    with working_dir(publish_github_repo_dir):
+            # Synchronize html directories (<html_output_dir> -> (vX.Y|<branch_name>)
+            updated_paths, deleted_paths, owned_paths = [], [], []
+            published_blobs = _git_published_blobs() if publish_dedup_assets else None
+            for html_output_dir, publish_github_subdir, _ in publications:
+                if not os.path.exists(html_output_dir):
+                    continue
+                _apidocs_diff_warnings(html_output_dir, publish_github_subdir)
+                if publish_dedup_assets:
+                    with span("publish-dedup", subdir=publish_github_subdir):
+                        shared_paths = _apidocs_dedup_assets(
+                            html_output_dir, publish_github_subdir, published_blobs)
+                    updated_paths += shared_paths
+                    owned_paths += shared_paths
+                with span("publish-sync", subdir=publish_github_subdir):
+                    result = sync_tree(html_output_dir, publish_github_subdir)
+                print("\n%s -> %s" % (html_output_dir, publish_github_subdir))
+                display_sync_report(result)
+                updated_paths += [publish_github_subdir + "/" + path for path in result.added + result.changed]
+                deleted_paths += [publish_github_subdir + "/" + path for path in result.deleted]
+                owned_paths.append(publish_github_subdir)
+
+            # Check if there are changes
+            if updated_paths or deleted_paths:
+
+                with span("publish-stage", updated=len(updated_paths), deleted=len(deleted_paths)):
+                    _git_stage_paths(updated_paths, deleted_paths)
+
+                msg = textwrap.dedent("""
+                Slicer apidocs update for %s
+
+                It was automatically generated by the script ``slicer-apidocs-builder`` [1]
+
+                [1] https://github.com/Slicer/slicer-apidocs-builder
+                """ % ", ".join(sha_ref for _, _, sha_ref in publications))
+                # Pass user.name and user.email to the commit instead of rewriting the configuration
+                with span("publish-commit"):
+                    execute([
+                        "git",
+                        "-c", "user.name=%s" % publish_github_user_name,
+                        "-c", "user.email=%s" % publish_github_user_email,
+                        "commit", "-m", msg
+                    ])
+
+            else:
+                print("\nNo new changes to publish")
+                skip_publish = True
+
+            # Publish
+            if skip_publish:
+                return
+
+            with span("publish-push"):
+                _git_push_with_retry(
+                    publish_github_repo_name, publish_github_repo_branch,
+                    publish_github_token, publish_github_skip_auth,
+                    owned_paths,
+                    publish_github_user_name, publish_github_user_email,
+                    attempts=publish_github_push_attempts)
+
+            if publish_github_max_history:
+                with span("publish-bound-history"):
+                    _git_bound_history(
+                        publish_github_repo_name, publish_github_repo_branch,
+                        publish_github_token, publish_github_skip_auth, publish_github_max_history)
+
+
+class GitPublishBackend(PublishBackend):
+    """Publish into subdirectories of a branch of a git repository (e.g gh-pages).
+
+    ``publish_kwargs`` are the keyword arguments of :func:`_apidocs_publish_doxygen`.
+    """
+
+    name = "git"
+
+    def __init__(self, **publish_kwargs):
+        self.publish_kwargs = publish_kwargs
+
+    def publish(self, publications):
+        _apidocs_publish_doxygen(publications=publications, **self.publish_kwargs)
 
-        # Setup user.name and user.email
-        execute("git config user.email '%s'" % publish_github_user_email)
-        execute("git config user.name '%s'" % publish_github_user_name)
+    def is_published(self, subdir, slicer_repo_sha_ref):
+        """Look up ``slicer_repo_sha_ref`` in the message of the last commit of the local
+        publishing checkout updating ``subdir``. The checkout is not fetched.
 
-        # Update
-        execute("git fetch origin")
+        The publishing checkout is shallow (see :func:`_clone_publish_repo`) and its
+        history may be squashed (see :func:`_git_bound_history`): a commit without
+        parent appears to update every subdir. If it does not list
+        ``slicer_repo_sha_ref``, the last update of ``subdir`` is unknown.
+        """
+        publish_github_repo_dir = self.publish_kwargs.get("publish_github_repo_dir") or "apidocs"
+        if not os.path.exists(os.path.join(publish_github_repo_dir, ".git")):
+            return None
         try:
-            execute("git reset --hard origin/%s" % publish_github_repo_branch, capture=True)
+            output = execute([
+                "git", "-C", publish_github_repo_dir, "log", "-1", "--format=%H%x00%P%x00%B",
+                "refs/remotes/origin/%s" % self.publish_kwargs["publish_github_repo_branch"], "--", subdir
+            ], capture=True, verbose=False)
         except subprocess.CalledProcessError:
-            pass
+            return None
+        if not output.strip():
+            return False
+        commit, parents, message = output.split("\0", 2)
+        # See the message written by _apidocs_publish_doxygen
+        for line in message.splitlines():
+            if line.startswith("Slicer apidocs update for "):
+                if slicer_repo_sha_ref in line[len("Slicer apidocs update for "):].split(", "):
+                    return True
+                break
+        try:
+            with open(os.path.join(publish_github_repo_dir, ".git", "shallow")) as fp:
+                shallow_commits = fp.read().split()
+        except (IOError, OSError):
+            shallow_commits = []
+        if not parents.strip() or commit in shallow_commits:
+            return None
+        return False
 
-        # Rename html directory (<html_output_dir> -> (vX.Y|<branch_name>)
-        if os.path.exists(html_output_dir):
-            if os.path.exists(publish_github_subdir):
-                shutil.rmtree(publish_github_subdir)
-            shutil.move(html_output_dir, publish_github_subdir)
 
-        # Check if there are changes
-        if not execute("git status --porcelain", capture=True) == "":
+def _git_push(publish_github_repo_name, publish_github_repo_branch,
+              publish_github_token, publish_github_skip_auth, force_with_lease=None, refspec=None):
+    """Push ``refspec`` (default: the publishing branch).
 
-            execute("git add --all")
+    If ``force_with_lease`` is set, the remote branch is overwritten only if
+    its tip is still that commit.
+    """
+    if refspec is None:
+        refspec = publish_github_repo_branch
+    options = ""
+    if force_with_lease:
+        options = "--force-with-lease=%s:%s " % (publish_github_repo_branch, force_with_lease)
+
+    if publish_github_skip_auth:
+        print(execute("git push %sorigin %s" % (options, refspec), capture=True))
+        return
 
-            msg = textwrap.dedent("""
-            Slicer apidocs update for %s
+    xxx_token = len(publish_github_token) * "X"
+    publish_github_push_url = "https://%s@github.com/%s" % (
+        xxx_token, publish_github_repo_name)
+    xxx_cmd = "git push %s%s %s" % (options, publish_github_push_url, refspec)
+    try:
+        print("\n%s" % xxx_cmd)
+        subprocess.check_output(
+            shlex.split(xxx_cmd.replace(xxx_token, publish_github_token)),
+            stderr=subprocess.STDOUT
+        )
+    except subprocess.CalledProcessError as exc_info:
+        # The output is kept to identify rejected pushes, the token is obfuscated
+        output = exc_info.output.decode("utf-8", "replace").replace(publish_github_token, xxx_token)
+        raise subprocess.CalledProcessError(
+            exc_info.returncode, xxx_cmd, "Failed to publish documentation.\n" + output)
 
-            It was automatically generated by the script ``slicer-apidocs-builder`` [1]
 
-            [1] https://github.com/Slicer/slicer-apidocs-builder
-            """ % slicer_repo_sha_ref)
-            execute("git commit -m '%s'" % msg)
+def _git_rewrite_history(commits, root_message):
+    """Recreate ``commits`` (oldest first) on top of a new root commit.
 
-        else:
-            print("\nNo new changes to publish")
-            skip_publish = True
+    The root commit has the tree of the first commit and ``root_message``: it
+    stands for the history leading to the first commit. Trees, messages, authors,
+    committers and dates of ``commits`` are preserved. Return the new tip.
+    """
+    parent = None
+    for commit in commits:
+        info = execute(["git", "log", "-1", "--format=%T%x00%an%x00%ae%x00%aD%x00%cn%x00%ce%x00%cD%x00%B",
+                        commit], capture=True, verbose=False)
+        tree, author_name, author_email, author_date, committer_name, committer_email, committer_date, message = \
+            info.split("\0", 7)
+        env = dict(os.environ,
+                   GIT_AUTHOR_NAME=author_name, GIT_AUTHOR_EMAIL=author_email, GIT_AUTHOR_DATE=author_date,
+                   GIT_COMMITTER_NAME=committer_name, GIT_COMMITTER_EMAIL=committer_email,
+                   GIT_COMMITTER_DATE=committer_date)
+        if parent is None:
+            parent = subprocess.check_output(
+                ["git", "commit-tree", tree, "-m", root_message], env=env, universal_newlines=True).strip()
+        parent = subprocess.check_output(
+            ["git", "commit-tree", tree, "-m", message.rstrip("\n"), "-p", parent],
+            env=env, universal_newlines=True).strip()
+    return parent
+
+
+def _git_bound_history(publish_github_repo_name, publish_github_repo_branch,
+                       publish_github_token, publish_github_skip_auth, max_history):
+    """Keep the last ``max_history`` commits of the publishing branch once it has
+    more than twice that number of commits. Older commits are squashed into a
+    root commit preceding the kept ones (see :func:`_git_rewrite_history`).
+
+    The rewritten branch is force-pushed only if no other publisher updated it
+    in the meantime. Otherwise, it is left untouched and the next publication
+    bounds it. Return True if the branch was rewritten.
+    """
+    # Only fetch the commits needed to decide if the history should be rewritten
+    execute(["git", "fetch", "--depth", str(2 * max_history + 1), "origin", publish_github_repo_branch])
+    tip = execute(["git", "rev-parse", "HEAD"], capture=True, verbose=False).strip()
+    count = int(execute(["git", "rev-list", "--count", tip], capture=True, verbose=False))
+    if count <= 2 * max_history:
+        return False
+
+    commits = execute(["git", "rev-list", "--reverse", "--max-count=%d" % max_history, tip],
+                      capture=True, verbose=False).split()
+    root_message = textwrap.dedent("""
+    %s
+
+    The history of the publishing branch is bounded to the last %d updates.
+    This commit stands for the updates preceding them.
+    """ % (HISTORY_SQUASHED_SUBJECT, max_history)).strip()
+    new_tip = _git_rewrite_history(commits, root_message)
+    try:
+        _git_push(publish_github_repo_name, publish_github_repo_branch,
+                  publish_github_token, publish_github_skip_auth,
+                  force_with_lease=tip, refspec="%s:refs/heads/%s" % (new_tip, publish_github_repo_branch))
+    except subprocess.CalledProcessError as exc_info:
+        if not _is_push_rejected(exc_info.output):
+            raise
+        print("\nHistory not bounded: %s was updated by another publisher" % publish_github_repo_branch)
+        return False
+    execute(["git", "reset", "--hard", new_tip])
+    execute(["git", "update-ref", "refs/remotes/origin/%s" % publish_github_repo_branch, new_tip])
+    print("\nHistory bounded: %d commits kept" % max_history)
+    return True
 
-        # Publish
-        if skip_publish:
-            return
 
-        if publish_github_skip_auth:
-            execute("git push origin %s" % publish_github_repo_branch)
-            return
+def _is_push_rejected(output):
+    """Return True if ``output`` of ``git push`` reports that the remote branch moved."""
+    return any(reason in (output or "") for reason in PUSH_REJECTED_REASONS)
+
+
+def _git_replay_publish_commit(publish_github_repo_branch, publish_github_subdirs,
+                               publish_github_user_name, publish_github_user_email):
+    """Replay the publishing commit (HEAD) on top of the fetched remote branch.
 
-        xxx_token = len(publish_github_token) * "X"
-        publish_github_push_url = "https://%s@github.com/%s" % (
-            xxx_token, publish_github_repo_name)
-        xxx_cmd = "git push %s %s" % (publish_github_push_url, publish_github_repo_branch)
+    The commit is rebased. If this fails, the remote branch is checked out and
+    the content of ``publish_github_subdirs`` is restored from the commit: since
+    each publisher owns its subdirectories, they can be overwritten safely. The
+    same goes for the shared assets, which are content-addressed.
+    """
+    git_identity = ["git",
+                    "-c", "user.name=%s" % publish_github_user_name,
+                    "-c", "user.email=%s" % publish_github_user_email]
+    upstream = "origin/%s" % publish_github_repo_branch
+    try:
+        execute(git_identity + ["rebase", upstream])
+        return
+    except subprocess.CalledProcessError:
+        execute(["git", "rebase", "--abort"])
+    publish_commit = execute(["git", "rev-parse", "HEAD"], capture=True, verbose=False).strip()
+    execute(["git", "reset", "--hard", upstream])
+    execute(["git", "rm", "-r", "-q", "--cached", "--ignore-unmatch", "--"] + publish_github_subdirs)
+    execute(["git", "checkout", publish_commit, "--"] + publish_github_subdirs)
+    execute(["git", "clean", "-f", "-d", "-q", "--"] + publish_github_subdirs)
+    execute(git_identity + ["commit", "--allow-empty", "-C", publish_commit])
+
+
+def _git_push_with_retry(publish_github_repo_name, publish_github_repo_branch,
+                         publish_github_token, publish_github_skip_auth,
+                         publish_github_subdirs, publish_github_user_name, publish_github_user_email,
+                         attempts=PUSH_ATTEMPTS):
+    """Push the publishing commit, replaying it on top of the remote branch if the push is
+    rejected because another publisher updated the branch.
+
+    Retries are delayed using an exponential backoff with jitter.
+    """
+    for attempt in range(1, attempts + 1):
         try:
-            print("\n%s" % xxx_cmd)
-            subprocess.check_output(
-                shlex.split(xxx_cmd.replace(xxx_token, publish_github_token)),
-                stderr=subprocess.STDOUT
-            )
+            _git_push(publish_github_repo_name, publish_github_repo_branch,
+                      publish_github_token, publish_github_skip_auth)
+            return
         except subprocess.CalledProcessError as exc_info:
-            raise subprocess.CalledProcessError(
-                exc_info.returncode, xxx_cmd, "Failed to publish documentation.")
+            if attempt == attempts or not _is_push_rejected(exc_info.output):
+                raise
+        delay = PUSH_RETRY_DELAY * 2 ** (attempt - 1) * random.uniform(1.0, 1.5)
+        print("\nPush rejected (attempt %d/%d): replaying publishing commit in %.1fs" % (
+            attempt, attempts, delay))
+        time.sleep(delay)
+        with span("publish-replay", attempt=attempt):
+            execute("git fetch origin")
+            _git_replay_publish_commit(
+                publish_github_repo_branch, publish_github_subdirs,
+                publish_github_user_name, publish_github_user_email)
 
 
-def _gh_repository_api(repo_name, github_token):
-    if not repo_name or not github_token:
-        return None
-    owner, repository = repo_name.split("/")
-    gh = github3.GitHub()
-    gh.login(token=github_token)
-    return gh.repository(owner, repository)
+def _git_remote_branches(repo_url):
+    """Return the names of the branches of ``repo_url`` (an URL or a local path)."""
+    output = execute(["git", "ls-remote", "--heads", repo_url], capture=True, verbose=False)
+    return {line.split("\t", 1)[1][len("refs/heads/"):] for line in output.splitlines() if "\t" in line}
+
+
+def _git_published_subdirs():
+    """Return the subdirs published in the current checkout: the shallowest
+    directories holding an ``index.html`` (e.g ``main``, ``v5.6`` or ``fix/doc``
+    for a namespaced branch). Directories starting with ``_`` or ``.`` are ignored.
+    """
+    output = execute([
+        "git", "ls-files", "-z", "--",
+        ":(glob)*/index.html", ":(glob)*/*/index.html", ":(glob)*/*/*/index.html",
+    ], capture=True, verbose=False)
+    subdirs = []
+    for path in sorted(filter(None, output.split("\0")), key=lambda path: path.count("/")):
+        subdir = posixpath.dirname(path)
+        if subdir.startswith(("_", ".")) or any(subdir.startswith(other + "/") for other in subdirs):
+            continue
+        subdirs.append(subdir)
+    return sorted(subdirs)
+
+
+def _is_shallow_repository():
+    return execute("git rev-parse --is-shallow-repository", capture=True, verbose=False).strip() == "true"
+
+
+def _git_deepen_since(publish_github_repo_branch, since):
+    """Fetch the history of the shallow publishing checkout up to ``since`` (a timestamp).
+
+    One more commit is fetched so that the changes of the oldest commit more
+    recent than ``since`` are known: the boundary commit of a shallow history
+    appears to add all the files.
+
+    If no commit is more recent than ``since``, nothing is fetched: the
+    commits of the shallow history, including its boundary, are older than
+    ``since`` and no subdir is considered updated (see :func:`_git_updated_since`).
+    """
+    if not _is_shallow_repository():
+        return
+    try:
+        execute(["git", "fetch", "--shallow-since=%s" % time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(since)),
+                 "origin", publish_github_repo_branch], capture=True)
+    except subprocess.CalledProcessError as exc_info:
+        if "no commits selected for shallow requests" not in (exc_info.output or ""):
+            raise
+        print("\nNo commits of %s more recent than %s" % (
+            publish_github_repo_branch, time.strftime("%Y-%m-%d", time.gmtime(since))))
+        return
+    if _is_shallow_repository():
+        execute(["git", "fetch", "--deepen=1", "origin", publish_github_repo_branch])
+
+
+def _git_updated_since(subdir, since):
+    """Return True if ``subdir`` was updated by a commit more recent than ``since`` (a timestamp)."""
+    output = execute(["git", "log", "-1", "--format=%ct", "--since=@%d" % since, "HEAD", "--", subdir],
+                     capture=True, verbose=False)
+    return bool(output.strip())
+
+
+_INDEX_ITEM = re.compile(r"(?P<indent>^[ \t]*)?<li\b(?:(?!</?li\b).)*?</li>(?P<eol>[ \t]*\n)?", re.I | re.M | re.S)
+
+_INDEX_LINK = re.compile(r"""href=["']([^"']*)["']""", re.I)
+
+
+def _remove_index_entries(index_file, subdirs):
+    """Remove the entries of ``index_file`` linking to one of ``subdirs``. Return the number of removed entries.
+
+    List items (``<li>``) only linking to removed subdirs are removed. Other
+    lines are removed if they only link to removed subdirs. Lines also
+    linking elsewhere (e.g to a kept subdir) are left as is with a warning.
+    """
+    removed_link = re.compile(r"^(?:\./)?(?:%s)(?:/.*)?$" % "|".join(re.escape(subdir) for subdir in subdirs))
+
+    def _only_links_removed(fragment):
+        links = _INDEX_LINK.findall(fragment)
+        return bool(links) and all(removed_link.match(link) for link in links)
+
+    removed = 0
+
+    def _remove_item(match):
+        nonlocal removed
+        if not _only_links_removed(match.group(0)):
+            return match.group(0)
+        removed += 1
+        # Items on their own line are removed along with the line
+        return "" if match.group("indent") is not None else match.group("eol") or ""
+
+    with open(index_file, encoding="utf-8") as fp:
+        content = fp.read()
+    lines = []
+    for line in _INDEX_ITEM.sub(_remove_item, content).splitlines(True):
+        if not any(removed_link.match(link) for link in _INDEX_LINK.findall(line)):
+            lines.append(line)
+        elif _only_links_removed(line):
+            removed += 1
+        else:
+            print("\nWarning: %s: not removing line also linking to kept content: %s" % (index_file, line.strip()))
+            lines.append(line)
+    if removed:
+        with open(index_file, "w", encoding="utf-8") as fp:
+            fp.writelines(lines)
+    return removed
+
+
+def _git_unused_shared_assets():
+    """Return the shared assets (and their sidecars) of the current checkout not
+    listed in the shared manifest of any published subdir (see :func:`dedup_html_tree`)."""
+    manifests = execute(["git", "ls-files", "-z", "--", ":(glob)**/%s" % SHARED_MANIFEST_FILENAME],
+                        capture=True, verbose=False)
+    referenced = set()
+    for manifest in filter(None, manifests.split("\0")):
+        referenced.update(read_shared_manifest(posixpath.dirname(manifest)))
+    assets = execute(["git", "ls-files", "-z", "--", SHARED_DIR + "/"], capture=True, verbose=False)
+    sidecar_extensions = tuple(SIDECAR_EXTENSIONS.values())
+    unused = []
+    for path in filter(None, assets.split("\0")):
+        source = path.rsplit(".", 1)[0] if path.endswith(sidecar_extensions) else path
+        if source not in referenced:
+            unused.append(path)
+    return unused
+
+
+def _apidocs_gc(
+        slicer_repo_url=None,
+        publish_github_repo_dir=None,
+        publish_github_repo_url=None,
+        publish_github_repo_name=None,
+        publish_github_repo_branch=None,
+        publish_github_user_name=None,
+        publish_github_user_email=None,
+        publish_github_token=None,
+        publish_github_skip_auth=False,
+        publish_github_push_attempts=PUSH_ATTEMPTS,
+        keep_days=DEFAULT_GC_KEEP_DAYS,
+        prune_shared_assets=False,
+        dry_run=False,
+):
+    """Remove from the publishing branch the subdirs of the branches no longer found in
+    ``slicer_repo_url`` using a single commit.
+
+    Release subdirs (e.g ``v5.6``) are kept, as well as the subdirs updated
+    during the last ``keep_days`` days: the history of a shallow publishing
+    checkout is fetched up to that date. Entries of the top-level ``index.html``
+    linking to removed subdirs are removed (see :func:`_remove_index_entries`). If ``prune_shared_assets`` is True,
+    the shared assets no longer listed by any shared manifest are removed too.
+
+    If the push is rejected because another publisher updated the branch, the
+    stale subdirs are collected again on top of it. Return the list of the
+    removed subdirs (or of the subdirs that would be removed if ``dry_run`` is True).
+    """
+    assert slicer_repo_url
+    assert publish_github_repo_dir
+    assert publish_github_repo_branch
+    if not dry_run:
+        assert publish_github_user_name
+        assert publish_github_user_email
+        if not publish_github_skip_auth:
+            assert publish_github_token
+
+    live_branches = _git_remote_branches(slicer_repo_url)
+    assert live_branches, "No branches found in %s" % slicer_repo_url
+
+    with file_lock(os.path.abspath(publish_github_repo_dir) + ".lock"):
+
+        if not os.path.exists(publish_github_repo_dir):
+            with span("publish-clone"):
+                _clone_publish_repo(publish_github_repo_url, publish_github_repo_dir, publish_github_repo_branch)
+
+        with working_dir(publish_github_repo_dir):
+
+            for attempt in range(1, publish_github_push_attempts + 1):
+
+                execute("git fetch origin")
+                execute("git reset --hard origin/%s" % publish_github_repo_branch)
+
+                since = time.time() - keep_days * 24 * 3600
+                if keep_days:
+                    _git_deepen_since(publish_github_repo_branch, since)
+
+                print("\nApidocs garbage collection")
+                stale = []
+                for subdir in _git_published_subdirs():
+                    if RELEASE_SUBDIR_REGEX.match(subdir):
+                        reason = "release"
+                    elif subdir in live_branches:
+                        reason = "branch exists"
+                    elif keep_days and _git_updated_since(subdir, since):
+                        reason = "updated during the last %g days" % keep_days
+                    else:
+                        stale.append(subdir)
+                        reason = "stale"
+                    print("  * %s: %s" % (subdir, reason))
+
+                if not stale or dry_run:
+                    print("\n%d stale subdirs" % len(stale))
+                    return stale
+
+                execute(["git", "rm", "-r", "-q", "--"] + stale)
+                if os.path.exists("index.html") and _remove_index_entries("index.html", stale):
+                    _git_stage_paths(["index.html"], [])
+                unused_assets = []
+                if prune_shared_assets:
+                    unused_assets = _git_unused_shared_assets()
+                    for path in unused_assets:
+                        os.remove(path)
+                    _git_stage_paths([], unused_assets)
+                print("\nRemoving %d stale subdirs and %d unused shared assets" % (len(stale), len(unused_assets)))
+
+                msg = textwrap.dedent("""
+                Slicer apidocs garbage collection
+
+                Removed subdirs of branches no longer found in %s:
+                %s
+                """) % (slicer_repo_url, "\n".join("* %s" % subdir for subdir in stale))
+                execute([
+                    "git",
+                    "-c", "user.name=%s" % publish_github_user_name,
+                    "-c", "user.email=%s" % publish_github_user_email,
+                    "commit", "-m", msg
+                ])
+
+                try:
+                    _git_push(publish_github_repo_name, publish_github_repo_branch,
+                              publish_github_token, publish_github_skip_auth)
+                    return stale
+                except subprocess.CalledProcessError as exc_info:
+                    if attempt == publish_github_push_attempts or not _is_push_rejected(exc_info.output):
+                        raise
+                delay = PUSH_RETRY_DELAY * 2 ** (attempt - 1) * random.uniform(1.0, 1.5)
+                print("\nPush rejected (attempt %d/%d): collecting again in %.1fs" % (
+                    attempt, publish_github_push_attempts, delay))
+                time.sleep(delay)
 
 
 def _missing(value):
@@ -236,51 +1059,77 @@ def _obfuscate(value):
     return "x" * len(value) if value else value
 
 
-def _apidocs_status_update(
+async def _apidocs_status_update_async(
+        client,
         status_update_state,
         status_update_repo_name=None,
         status_update_revision=None,
         status_update_target_url=None,
         status_update_branch_or_tag=None,
-        status_update_token=None
+        status_update_token=None,
+        slicer_ref=None,
+        warnings_summary=None,
 ):
+    """Create a GitHub status for the documented Slicer revision using ``client``.
+
+    If the :class:`ResolvedRef` of the documented ref is available, it is
+    used instead of querying the GitHub API for the kind of ref. Its SHA is
+    only used for tags: the SHA of a branch checked out by an earlier run
+    may be outdated (e.g a ``pending`` status is updated before the build),
+    so branches are resolved using the GitHub API.
+
+    If the ``warnings_summary`` computed when publishing is available, the
+    number of new Doxygen warnings is appended to the success description.
+    """
     assert status_update_state
 
-    repository_api = _gh_repository_api(status_update_repo_name, status_update_token)
+    if slicer_ref is not None:
+        status_update_branch_or_tag = status_update_branch_or_tag or slicer_ref.name
+        status_update_revision = status_update_revision or slicer_ref.name
+        if status_update_revision == slicer_ref.name and slicer_ref.is_tag:
+            status_update_revision = slicer_ref.sha
+
+    if not status_update_repo_name:
+        client = None
 
     # Handle case when revision is a branch.
     is_revision_branch = status_update_revision and len(status_update_revision) != 40
-    if repository_api and is_revision_branch:
-        ref = repository_api.ref("heads/" + status_update_revision)
-        if ref:
-            status_update_revision = ref.object.sha
+    if client and is_revision_branch:
+        sha = await client.ref_sha(status_update_repo_name, "heads/" + status_update_revision)
+        if sha:
+            status_update_revision = sha
 
-    print("\nApidocs status update parameters")
-    print("  * state .......................: %s" % status_update_state)
-    print("  * repo_name ...................: %s" % _missing(status_update_repo_name))
-    print("  * revision ....................: %s" % _missing(status_update_revision))
-    print("  * github_token ................: %s" % _missing(_obfuscate(status_update_token)))
+    # Branch or tag ?
+    target_url_path = None
+    if status_update_state == "success":
+        target_url_path = status_update_branch_or_tag
+        if slicer_ref is not None and slicer_ref.name == status_update_branch_or_tag:
+            target_url_path = slicer_ref.subdir
+        elif client and status_update_branch_or_tag:
+            if await client.ref_sha(status_update_repo_name, "tags/" + status_update_branch_or_tag):
+                target_url_path = extract_apidocs_version_from_tag(status_update_branch_or_tag)
+
+    # Parameters are displayed at once since several updates may run concurrently
+    lines = ["\nApidocs status update parameters"]
+    lines.append("  * state .......................: %s" % status_update_state)
+    lines.append("  * repo_name ...................: %s" % _missing(status_update_repo_name))
+    lines.append("  * revision ....................: %s" % _missing(status_update_revision))
+    lines.append("  * github_token ................: %s" % _missing(_obfuscate(status_update_token)))
 
     missing_extra = False
     if status_update_state == "success":
 
-        # Branch or tag ?
-        target_url_path = status_update_branch_or_tag
-        if repository_api and status_update_branch_or_tag:
-            try:
-                if repository_api.ref("tags/" + status_update_branch_or_tag) is not None:
-                    target_url_path = extract_apidocs_version_from_tag(status_update_branch_or_tag)
-            except github3.exceptions.NotFoundError:
-                pass
-
         status_update_target_url += "/%s" % target_url_path
 
         missing_extra = not status_update_branch_or_tag or not target_url_path
 
-        print("  * branch_or_tag ...............: %s" % _missing(status_update_branch_or_tag))
-        print("  * target_url_path .............: %s" % _missing(target_url_path))
+        lines.append("  * branch_or_tag ...............: %s" % _missing(status_update_branch_or_tag))
+        lines.append("  * target_url_path .............: %s" % _missing(target_url_path))
 
-    print("  * target_url ..................: %s" % _missing(status_update_target_url))
+    lines.append("  * target_url ..................: %s" % _missing(status_update_target_url))
+    if warnings_summary is not None:
+        lines.append("  * warnings ....................: %s" % format_warning_summary(warnings_summary))
+    print("\n".join(lines))
 
     missing = (not status_update_repo_name
                or not status_update_revision
@@ -299,15 +1148,93 @@ def _apidocs_status_update(
         "success": "API documentation published"
     }
 
-    response = repository_api.create_status(
+    description = messages[status_update_state]
+    if status_update_state == "success" and warnings_summary is not None:
+        description += " (%s)" % format_warning_summary(warnings_summary)
+
+    await client.create_status(
+        status_update_repo_name,
         status_update_revision,
         state=status_update_state,
         context="slicer/apidocs",
-        description=messages[status_update_state],
+        description=description,
         target_url=status_update_target_url
     )
-    if response is None:
-        raise RuntimeError("Failed to create GitHub status")
+
+
+def _apidocs_status_updates(status_update_state, updates, status_update_token=None,
+                            status_update_api_url=GITHUB_API_URL):
+    """Create the GitHub statuses described by ``updates`` concurrently.
+
+    Each update is a dictionary of keyword arguments of :func:`_apidocs_status_update_async`.
+    A single client is used so that connections and ref lookups are shared.
+    """
+    client = GitHubClient(status_update_token, status_update_api_url) if status_update_token else None
+
+    async def _update_all():
+        return await asyncio.gather(*[
+            _apidocs_status_update_async(
+                client, status_update_state, status_update_token=status_update_token, **update)
+            for update in updates], return_exceptions=True)
+
+    try:
+        results = asyncio.run(_update_all())
+    finally:
+        if client is not None:
+            client.close()
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+
+
+def _apidocs_status_update(status_update_state, status_update_token=None,
+                           status_update_api_url=GITHUB_API_URL, **update):
+    """Create a GitHub status for the documented Slicer revision.
+
+    See :func:`_apidocs_status_update_async` for the supported parameters.
+    """
+    _apidocs_status_updates(status_update_state, [update], status_update_token, status_update_api_url)
+
+
+def _status_update_parameters(status_update_state, root_dir, directory, slicer_repo_dir,
+                              slicer_repo_branch_or_tag, status_update_revision=None,
+                              ref_cache=None, slicer_repo_mirror_dir=None, slicer_repo_clone_url=None,
+                              build_cache=None, build_configuration=None, **update):
+    """Return the keyword arguments of :func:`_apidocs_status_update_async` completed
+    using the Slicer checkout and the summary of new warnings saved when publishing.
+
+    If there is no checkout, the ref is resolved using the remote repository
+    (see :func:`lookup_slicer_ref`), the possibly outdated mirror and
+    ``ref_cache`` only providing the Slicer version. If the remote repository
+    can not be queried, the ref is resolved using the GitHub API.
+    """
+    _, _, html_output_dir = _default_apidocs_directories(root_dir, directory, build_cache, build_configuration)
+    warnings_summary = None
+    if status_update_state == "success":
+        warnings_summary = read_warning_summary(_warnings_diff_file(html_output_dir))
+
+    slicer_ref = None
+    if os.path.exists(slicer_repo_dir + "/.git"):
+        if slicer_repo_branch_or_tag:
+            slicer_ref = resolve_slicer_ref(slicer_repo_dir, slicer_repo_branch_or_tag)
+        if not status_update_revision:
+            # Commit checked out by the last run
+            with GitCatFile(slicer_repo_dir) as cat_file:
+                status_update_revision = cat_file.sha("HEAD")
+    elif slicer_repo_branch_or_tag and ref_cache is not None:
+        try:
+            slicer_ref = lookup_slicer_ref(
+                slicer_repo_branch_or_tag, ref_cache, slicer_repo_mirror_dir, slicer_repo_clone_url)
+        except subprocess.CalledProcessError:
+            slicer_ref = None
+
+    return dict(
+        update,
+        status_update_revision=status_update_revision,
+        status_update_branch_or_tag=slicer_repo_branch_or_tag,
+        slicer_ref=slicer_ref,
+        warnings_summary=warnings_summary,
+    )
 
 
 def _default_output_directories(repo_name, repo_branch_or_tag):
@@ -322,6 +1249,428 @@ def _default_output_directories(repo_name, repo_branch_or_tag):
     return root_dir, directory, repo_dir
 
 
+def _default_apidocs_directories(root_dir, directory, build_cache=None, build_configuration=None):
+    """Return ``(apidocs_src_dir, apidocs_build_dir, html_output_dir)``.
+
+    If ``build_cache`` is specified, the directories are located into the entry
+    associated with ``directory`` and ``build_configuration`` (see :class:`BuildDirCache`).
+    """
+    if build_cache is not None:
+        entry_dir = build_cache.entry_dir(directory, build_configuration)
+        apidocs_src_dir = entry_dir + "/src"
+        apidocs_build_dir = entry_dir + "/build"
+    else:
+        apidocs_src_dir = root_dir + "/" + "%s-src" % directory
+        apidocs_build_dir = root_dir + "/" + "%s-build" % directory
+    html_output_dir = apidocs_build_dir + "/Utilities/Doxygen/html"
+    return apidocs_src_dir, apidocs_build_dir, html_output_dir
+
+
+def _apidocs_build_configuration(extra_cmake_args=(), doxygen_partition_depth=None):
+    """Return the build options identifying an entry of the build cache along with the ref."""
+    return {"cmake_args": list(extra_cmake_args), "doxygen_partition_depth": doxygen_partition_depth}
+
+
+def _apidocs_update_build_cache(build_cache, entry_dirs):
+    """Record the use of ``entry_dirs`` and evict the least recently used entries of ``build_cache``."""
+    for entry_dir in entry_dirs:
+        if os.path.isdir(entry_dir):
+            build_cache.touch(entry_dir)
+    with span("build-cache-evict"):
+        removed, size = build_cache.evict()
+    print("\nApidocs build cache report")
+    print("  * cache_dir ...................: %s" % build_cache.cache_dir)
+    print("  * evicted entries .............: %d" % len(removed))
+    print("  * size ........................: %.1f MB" % (size / 1024.0 ** 2))
+
+
+def _default_publish_repo_directory(repo_name, repo_branch):
+    return tempfile.gettempdir() + "/" + "%s-%s" % (repo_name.replace("/", "-"), repo_branch)
+
+
+def _default_ref_cache_file(repo_name):
+    return tempfile.gettempdir() + "/" + "%s-refs.json" % repo_name.replace("/", "-")
+
+
+def _default_mirror_directory(repo_name):
+    return tempfile.gettempdir() + "/" + "%s.git" % repo_name.replace("/", "-")
+
+
+def _default_daemon_socket():
+    return tempfile.gettempdir() + "/" + "slicer-apidocs-builder.sock"
+
+
+def _update_mirror(repo_clone_url, mirror_dir, partial=False):
+    """Create or update the bare mirror of ``repo_clone_url`` found in ``mirror_dir``.
+
+    Only branches and tags are mirrored, worktrees whose directory was
+    removed are pruned. If ``partial`` is True, a new mirror is created as
+    a blobless partial clone: file contents are only downloaded when checked out.
+    """
+    with file_lock(mirror_dir + ".lock"):
+        if not os.path.exists(mirror_dir):
+            execute(["git", "init", "--bare", "--quiet", mirror_dir])
+            execute(["git", "-C", mirror_dir, "remote", "add", "origin", repo_clone_url])
+            execute(["git", "-C", mirror_dir, "config", "remote.origin.fetch", "+refs/heads/*:refs/heads/*"])
+            execute(["git", "-C", mirror_dir, "config", "--add", "remote.origin.fetch", "+refs/tags/*:refs/tags/*"])
+            if partial:
+                execute(["git", "-C", mirror_dir, "config", "remote.origin.promisor", "true"])
+                execute(["git", "-C", mirror_dir, "config", "remote.origin.partialclonefilter", "blob:none"])
+        execute(["git", "-C", mirror_dir, "fetch", "--prune", "origin"])
+        execute(["git", "-C", mirror_dir, "worktree", "prune"], verbose=False)
+
+
+def _mirror_ref(mirror_dir, branch_or_tag):
+    """Return the fully qualified mirror reference associated with ``branch_or_tag``."""
+    tag_ref = "refs/tags/" + branch_or_tag
+    try:
+        execute(["git", "-C", mirror_dir, "rev-parse", "--verify", "--quiet", tag_ref],
+                capture=True, verbose=False)
+        return tag_ref
+    except subprocess.CalledProcessError:
+        return "refs/heads/" + branch_or_tag
+
+
+def _sparse_checkout_set(repo_dir, objects_repo_dir, revision):
+    """Restrict the checkout of ``repo_dir`` to the paths read when generating
+    the documentation of ``revision``.
+
+    The paths are derived from the Doxygen configuration template read from
+    ``objects_repo_dir`` (e.g the mirror) before anything is checked out.
+    """
+    paths = documented_input_paths(objects_repo_dir, revision) or DOXYGEN_INPUT_PATHS
+    print("\nsparse checkout paths: %s" % " ".join(paths))
+    execute(["git", "-C", repo_dir, "sparse-checkout", "set", "--no-cone"]
+            + ["/" + path for path in paths])
+
+
+def _read_batch_refs(batch_refs, batch_refs_file):
+    """Return the list of refs given on the command line and/or listed in a file.
+
+    Empty lines and lines starting with ``#`` are ignored. Duplicates are removed.
+    """
+    refs = list(batch_refs)
+    if batch_refs_file:
+        with open(batch_refs_file) as fp:
+            refs.extend(line.strip() for line in fp)
+    unique_refs = []
+    for ref in refs:
+        if ref and not ref.startswith("#") and ref not in unique_refs:
+            unique_refs.append(ref)
+    return unique_refs
+
+
+def _apidocs_batch_build_one(checkout_kwargs, build_kwargs, skip_normalize, compress_html=False,
+                             search_index=False, check_links=False, max_broken_links=None):
+    """Checkout and build documentation of a single ref. Executed in a worker process.
+
+    Return the :class:`ResolvedRef` of the documented ref and False if its
+    links were checked and more than ``max_broken_links`` are broken.
+    """
+    html_output_dir = build_kwargs["html_output_dir"]
+    with span("batch-ref", ref=checkout_kwargs["slicer_repo_branch_or_tag"]), \
+            file_lock(checkout_kwargs["slicer_repo_dir"] + ".lock"):
+        with span("checkout"):
+            slicer_ref = _apidocs_checkout_slicer(**checkout_kwargs)
+        with span("build"):
+            built = _apidocs_build_doxygen(slicer_ref=slicer_ref, **build_kwargs)
+        if built and not skip_normalize:
+            with span("normalize"):
+                _apidocs_normalize_html(
+                    html_output_dir, [build_kwargs["slicer_repo_dir"], build_kwargs["apidocs_build_dir"]])
+        if search_index:
+            with span("search-index"):
+                _apidocs_build_search_index(html_output_dir)
+        if compress_html:
+            with span("compress"):
+                _apidocs_compress_html(html_output_dir)
+        links_ok = True
+        if check_links:
+            with span("check-links"):
+                links_ok = _apidocs_check_links(html_output_dir, max_broken_links)
+    return slicer_ref, links_ok
+
+
+def _apidocs_batch(
+        slicer_repo_name=None,
+        slicer_repo_refs=None,
+        slicer_repo_clone_url=None,
+        slicer_repo_mirror_dir=None,
+        slicer_repo_sparse=False,
+        batch_jobs=1,
+        extra_cmake_args=(),
+        force_build=False,
+        build_timeout=None,
+        doxygen_partition_depth=None,
+        doxygen_jobs=None,
+        skip_normalize=False,
+        compress_html=False,
+        search_index=False,
+        check_links=False,
+        max_broken_links=None,
+        skip_publish=False,
+        publish_backend=None,
+        build_cache=None,
+):
+    """Build documentation of several Slicer refs and publish them at once using
+    ``publish_backend`` (e.g a single commit with :class:`GitPublishBackend`).
+
+    The Slicer mirror is fetched once and shared by all the worktrees. Each
+    ref is built in its own worktree and build directories using up to
+    ``batch_jobs`` worker processes. If ``build_cache`` is specified, build
+    directories are entries of the cache kept until the batch is published.
+
+    If ``check_links`` is True, the links of each generated tree are checked
+    and refs having more than ``max_broken_links`` broken links are not published.
+
+    Return the list of refs that failed to build.
+    """
+    assert slicer_repo_name
+    assert slicer_repo_refs
+
+    if slicer_repo_clone_url is None:
+        slicer_repo_clone_url = "https://github.com/%s" % slicer_repo_name
+    if slicer_repo_mirror_dir is None:
+        slicer_repo_mirror_dir = _default_mirror_directory(slicer_repo_name)
+    _update_mirror(slicer_repo_clone_url, slicer_repo_mirror_dir, partial=slicer_repo_sparse)
+
+    build_configuration = _apidocs_build_configuration(extra_cmake_args, doxygen_partition_depth)
+    entry_dirs = []
+
+    # Entries of the build cache used by the batch are not evicted
+    with contextlib.ExitStack() as entry_locks:
+
+        builds = []
+        with ProcessPoolExecutor(max_workers=batch_jobs) as executor:
+            for slicer_repo_ref in slicer_repo_refs:
+                root_dir, directory, slicer_repo_dir = \
+                    _default_output_directories(slicer_repo_name, slicer_repo_ref)
+                apidocs_src_dir, apidocs_build_dir, html_output_dir = \
+                    _default_apidocs_directories(root_dir, directory, build_cache, build_configuration)
+                if build_cache is not None:
+                    entry_dirs.append(build_cache.entry_dir(directory, build_configuration))
+                    entry_locks.enter_context(build_cache.lock(entry_dirs[-1]))
+                checkout_kwargs = dict(
+                    slicer_repo_clone_url=slicer_repo_clone_url,
+                    slicer_repo_dir=slicer_repo_dir,
+                    slicer_repo_branch_or_tag=slicer_repo_ref,
+                    slicer_repo_mirror_dir=slicer_repo_mirror_dir,
+                    skip_mirror_update=True,
+                    slicer_repo_sparse=slicer_repo_sparse,
+                )
+                build_kwargs = dict(
+                    html_output_dir=html_output_dir,
+                    apidocs_src_dir=apidocs_src_dir,
+                    apidocs_build_dir=apidocs_build_dir,
+                    slicer_repo_dir=slicer_repo_dir,
+                    extra_cmake_args=extra_cmake_args,
+                    force_build=force_build,
+                    build_timeout=build_timeout,
+                    doxygen_partition_depth=doxygen_partition_depth,
+                    doxygen_jobs=doxygen_jobs,
+                )
+                # Spans recorded by the worker are merged into the report once the ref is built
+                future = executor.submit(
+                    call_with_spans, _apidocs_batch_build_one, checkout_kwargs, build_kwargs, skip_normalize,
+                    compress_html, search_index, check_links, max_broken_links)
+                builds.append((slicer_repo_ref, html_output_dir, future))
+
+        failed_refs = []
+        publications = []
+        ref_cache = RefCache(_default_ref_cache_file(slicer_repo_name))
+        print("\nApidocs batch report")
+        for slicer_repo_ref, html_output_dir, future in builds:
+            try:
+                (slicer_ref, links_ok), spans = future.result()
+                REPORT.merge(spans)
+            except (subprocess.SubprocessError, AssertionError) as exc_info:
+                REPORT.merge(getattr(exc_info, "spans", []))
+                print("  * %s: failed (%s)" % (slicer_repo_ref, exc_info))
+                failed_refs.append(slicer_repo_ref)
+                continue
+            if not links_ok:
+                print("  * %s: failed (more than %d broken links)" % (slicer_repo_ref, max_broken_links))
+                failed_refs.append(slicer_repo_ref)
+                continue
+            print("  * %s: %s -> %s" % (slicer_repo_ref, slicer_ref.sha, slicer_ref.subdir))
+            ref_cache.put(slicer_ref)
+            publications.append((html_output_dir, slicer_ref.subdir, slicer_ref.sha_ref(slicer_repo_name)))
+
+        if publications and not skip_publish:
+            publish_backend.publish(publications)
+
+        if build_cache is not None:
+            _apidocs_update_build_cache(build_cache, entry_dirs)
+
+    return failed_refs
+
+
+def _has_commit(repo_dir, sha):
+    if not repo_dir or not os.path.isdir(repo_dir):
+        return False
+    with GitCatFile(repo_dir) as cat_file:
+        return cat_file.sha(sha + "^{commit}") is not None
+
+
+def _mirror_ref_sha(mirror_dir, branch_or_tag):
+    """Return the SHA of the commit of ``branch_or_tag`` in ``mirror_dir`` or None."""
+    if not mirror_dir or not os.path.isdir(mirror_dir):
+        return None
+    with GitCatFile(mirror_dir) as cat_file:
+        return cat_file.sha("refs/tags/%s^{commit}" % branch_or_tag) \
+            or cat_file.sha("refs/heads/%s^{commit}" % branch_or_tag)
+
+
+def _apidocs_plan_ref(
+        slicer_repo_name=None,
+        slicer_repo_branch_or_tag=None,
+        slicer_repo_clone_url=None,
+        slicer_repo_dir=None,
+        slicer_repo_mirror_dir=None,
+        apidocs_build_dir=None,
+        html_output_dir=None,
+        extra_cmake_args=(),
+        force_build=False,
+        doxygen_partition_depth=None,
+        skip_build=False,
+        skip_publish=False,
+        publish_backend=None,
+):
+    """Return a dictionary describing the work a run documenting ``slicer_repo_branch_or_tag``
+    would do, without doing it.
+
+    The SHA of the ref is resolved using ``git ls-remote`` (see
+    :func:`lookup_slicer_ref`), the mirror and the existing checkout are not
+    fetched and only provide git objects. The build fingerprint (see
+    :func:`compute_build_fingerprint`) is computed from these objects and
+    compared with the one of the last build. If the ref of the mirror differs
+    from the one of the remote repository, the build is unknown: the outdated
+    mirror would be fetched first. If the documentation would be reused, the publication is a
+    no-op if the subdir was last published from the same ref (see
+    :meth:`PublishBackend.is_published`).
+
+    Each step (``mirror``, ``checkout``, ``build`` and ``publish``) is a
+    dictionary with an ``action`` and a ``reason``. The action is None if it
+    can not be determined using local state and cached metadata only.
+    """
+    assert slicer_repo_name
+    assert slicer_repo_branch_or_tag
+    assert slicer_repo_dir
+
+    plan = dict(ref=slicer_repo_branch_or_tag, kind=None, sha=None, subdir=None, version=None)
+
+    # Clones and checkouts (see _apidocs_checkout_slicer)
+    use_worktree = slicer_repo_mirror_dir and not os.path.isdir(slicer_repo_dir + "/.git")
+    if skip_build:
+        plan["mirror"] = plan["checkout"] = dict(action="skip", reason="--skip-build")
+    elif use_worktree:
+        plan["mirror"] = dict(action="fetch", reason=slicer_repo_mirror_dir) \
+            if os.path.isdir(slicer_repo_mirror_dir) else dict(action="clone", reason=slicer_repo_clone_url)
+        plan["checkout"] = dict(
+            action="update worktree" if os.path.exists(slicer_repo_dir) else "add worktree", reason=slicer_repo_dir)
+    else:
+        plan["mirror"] = dict(action="skip", reason="no mirror")
+        plan["checkout"] = dict(
+            action="fetch" if os.path.exists(slicer_repo_dir) else "clone", reason=slicer_repo_dir)
+
+    try:
+        slicer_ref = lookup_slicer_ref(
+            slicer_repo_branch_or_tag, RefCache(_default_ref_cache_file(slicer_repo_name)),
+            slicer_repo_mirror_dir, slicer_repo_clone_url)
+    except subprocess.CalledProcessError:
+        plan["build"] = plan["publish"] = dict(action=None, reason="%s is not reachable" % slicer_repo_clone_url)
+        return plan
+    if slicer_ref is None:
+        plan["build"] = plan["publish"] = dict(action=None, reason="ref not found")
+        return plan
+
+    # Git objects of the documented commit available without fetching
+    objects_repo_dir = None
+    for repo_dir in [slicer_repo_mirror_dir, slicer_repo_dir]:
+        if _has_commit(repo_dir, slicer_ref.sha):
+            objects_repo_dir = repo_dir
+            break
+
+    version = slicer_ref.version
+    if version is None and objects_repo_dir is not None:
+        with GitCatFile(objects_repo_dir) as cat_file:
+            cmakelists = cat_file.read(slicer_ref.sha + ":CMakeLists.txt")
+        if cmakelists is not None:
+            version = extract_slicer_xy_version_from_lines(cmakelists.decode("utf-8", "replace").splitlines())
+
+    plan.update(kind=slicer_ref.kind, sha=slicer_ref.sha, subdir=slicer_ref.subdir, version=version)
+
+    mirror_sha = _mirror_ref_sha(slicer_repo_mirror_dir, slicer_repo_branch_or_tag)
+
+    # Build
+    if skip_build:
+        plan["build"] = dict(action="skip", reason="--skip-build")
+    elif force_build:
+        plan["build"] = dict(action="build", reason="--force-build")
+    elif mirror_sha is not None and mirror_sha != slicer_ref.sha:
+        plan["build"] = dict(action=None, reason="mirror is outdated: %s is %s instead of %s" % (
+            slicer_repo_branch_or_tag, mirror_sha[:8], slicer_ref.sha[:8]))
+    elif objects_repo_dir is None:
+        plan["build"] = dict(action=None, reason="commit %s is not available locally" % slicer_ref.sha)
+    elif version is None:
+        plan["build"] = dict(action=None, reason="Slicer version not found")
+    else:
+        fingerprint, _ = compute_build_fingerprint(
+            objects_repo_dir, version, os.path.dirname(os.path.abspath(__file__)) + "/CMakeLists.txt",
+            cmake_args=extra_cmake_args, revision=slicer_ref.sha,
+            options={"doxygen_partition_depth": doxygen_partition_depth})
+        previous_fingerprint = read_build_fingerprint(apidocs_build_dir)
+        if previous_fingerprint == fingerprint and os.path.exists(html_output_dir + "/index.html"):
+            plan["build"] = dict(action="reuse", reason="documented inputs are unchanged")
+        elif previous_fingerprint is None:
+            plan["build"] = dict(action="build", reason="no previous build in %s" % apidocs_build_dir)
+        else:
+            plan["build"] = dict(action="build", reason="documented inputs changed")
+
+    # Publication
+    slicer_repo_sha_ref = slicer_ref.sha_ref(slicer_repo_name)
+    if skip_publish:
+        plan["publish"] = dict(action="skip", reason="--skip-publish")
+    elif plan["build"]["action"] == "build":
+        plan["publish"] = dict(action="publish", reason="documentation is regenerated")
+    elif plan["build"]["action"] is None:
+        plan["publish"] = dict(action=None, reason=plan["build"]["reason"])
+    else:
+        published = publish_backend.is_published(slicer_ref.subdir, slicer_repo_sha_ref)
+        if published is None:
+            plan["publish"] = dict(action=None, reason="publication state not available locally")
+        elif published:
+            plan["publish"] = dict(
+                action="no-op", reason="%s already published from %s" % (slicer_ref.subdir, slicer_repo_sha_ref))
+        else:
+            plan["publish"] = dict(
+                action="publish", reason="%s not published from %s" % (slicer_ref.subdir, slicer_repo_sha_ref))
+
+    return plan
+
+
+def _is_noop_plan(plan):
+    return (plan["build"]["action"] in ("reuse", "skip")
+            and plan["publish"]["action"] in ("no-op", "skip"))
+
+
+def _apidocs_display_plan(plans):
+    for plan in plans:
+        print("\nApidocs plan for %s" % plan["ref"])
+        print("  * kind ........................: %s" % _missing(plan["kind"]))
+        print("  * sha .........................: %s" % _missing(plan["sha"]))
+        print("  * subdir ......................: %s" % _missing(plan["subdir"]))
+        print("  * version .....................: %s" % _missing(plan["version"]))
+        print("  * mirror ......................: %s (%s)" % (plan["mirror"]["action"], plan["mirror"]["reason"]))
+        print("  * checkout ....................: %s (%s)" % (
+            plan["checkout"]["action"], plan["checkout"]["reason"]))
+        print("  * build .......................: %s (%s)" % (
+            plan["build"]["action"] or "unknown", plan["build"]["reason"]))
+        print("  * publish .....................: %s (%s)" % (
+            plan["publish"]["action"] or "unknown", plan["publish"]["reason"]))
+        print("  * noop ........................: %s" % _is_noop_plan(plan))
+
+
 def cli():
     parser = argparse.ArgumentParser()
     # Apidocs building parameters
@@ -334,6 +1683,20 @@ def cli():
         "--slicer-repo-dir", type=str,
         help="Slicer sources checkout to reuse. By default, checkout source in TEMP directory."
     )
+    build_group.add_argument(
+        "--slicer-repo-mirror", action="store_true",
+        help="If specified, checkout Slicer sources as a worktree of a bare mirror of the Slicer "
+             "repository shared by all the checkouts instead of cloning them. Always enabled in batch mode."
+    )
+    build_group.add_argument(
+        "--slicer-repo-mirror-dir", type=str,
+        help="Bare mirror of the Slicer repository. It implies --slicer-repo-mirror. "
+             "By default, the mirror is created in TEMP directory."
+    )
+    build_group.add_argument(
+        "--slicer-repo-sparse", action="store_true",
+        help="If specified, use a blobless partial clone and only checkout the paths read by Doxygen."
+    )
     build_group.add_argument(
         "--slicer-repo-branch", type=str,
         help="Slicer branch to document (example: main)"
@@ -346,8 +1709,141 @@ def cli():
         "--skip-build", action="store_true",
         help="If specified, skip generation of HTML and reuse existing files."
     )
+    build_group.add_argument(
+        "--cmake-arg", dest="cmake_args", action="append", default=[],
+        help="Extra argument passed to CMake when configuring the apidocs project. "
+             "Can be specified multiple times."
+    )
+    build_group.add_argument(
+        "--build-timeout", type=float,
+        help="If specified, maximum duration of the Doxygen build in seconds."
+    )
+    build_group.add_argument(
+        "--doxygen-partition-depth", type=int,
+        help="If specified, document each component found at this depth of the Doxygen input "
+             "directories (e.g 1 for Base, Libs, Modules, ...) using its own Doxygen run. Runs are "
+             "linked using tag files and components with unchanged inputs are reused."
+    )
+    build_group.add_argument(
+        "--doxygen-jobs", type=int,
+        help="Number of Doxygen partitions generated in parallel (default: number of CPUs)"
+    )
+    build_group.add_argument(
+        "--build-cache-dir", type=str,
+        help="If specified, keep the apidocs build directories into this persistent cache (one entry "
+             "per ref and build configuration) so that the CMake configuration and the unchanged "
+             "outputs are reused by the next builds. By default, build directories are created in "
+             "TEMP directory."
+    )
+    build_group.add_argument(
+        "--build-cache-max-size", type=float, default=DEFAULT_BUILD_CACHE_MAX_SIZE,
+        help="Maximum size of the build cache in GB. Least recently used entries are removed "
+             "once it is exceeded. (default: %(default)s)"
+    )
+    build_group.add_argument(
+        "--force-build", action="store_true",
+        help="If specified, generate HTML even if documented inputs are unchanged since the last build."
+    )
+    build_group.add_argument(
+        "--skip-normalize", action="store_true",
+        help="If specified, skip the removal of volatile content (timestamps, ...) from generated HTML."
+    )
+    build_group.add_argument(
+        "--search-index", action="store_true",
+        help="If specified, write a search index of the generated html split into small gzipped "
+             "JSON shards. Only pages modified since the last run are parsed."
+    )
+    build_group.add_argument(
+        "--compress-html", action="store_true",
+        help="If specified, write pre-compressed .gz (and .br if the brotli module is available) "
+             "sidecars of the generated text files along with a manifest."
+    )
+    build_group.add_argument(
+        "--check-links", action="store_true",
+        help="If specified, check the links of the generated html and write a report of the broken "
+             "links and orphan files."
+    )
+    build_group.add_argument(
+        "--check-links-max-broken", type=int,
+        help="If specified with --check-links, do not publish documentation having more broken links."
+    )
+    parser.add_argument(
+        "--report-file", type=str,
+        help="If specified, write timing and resource usage of each phase and command as JSON."
+    )
+    parser.add_argument(
+        "--plan", action="store_true",
+        help="If specified, display the work the other arguments would do (ref resolution, clones, "
+             "build and publication) without doing it. Only cached metadata, local git queries "
+             "and git ls-remote are used."
+    )
+    parser.add_argument(
+        "--plan-format", type=str, choices=["text", "json"], default="text",
+        help="Format of the plan displayed with --plan (default: text)"
+    )
+    # apidocs batch parameters
+    batch_group = parser.add_argument_group('Apidocs Batch')
+    batch_group.add_argument(
+        "--batch-ref", dest="batch_refs", action="append", default=[],
+        help="Slicer branch or tag to document in batch mode. Can be specified multiple times."
+    )
+    batch_group.add_argument(
+        "--batch-refs-file", type=str,
+        help="File listing Slicer branches or tags to document in batch mode (one per line)."
+    )
+    batch_group.add_argument(
+        "--batch-jobs", type=int, default=1,
+        help="Number of refs built in parallel in batch mode (default: 1)"
+    )
+    # apidocs daemon parameters
+    daemon_group = parser.add_argument_group('Apidocs Daemon')
+    daemon_group.add_argument(
+        "--daemon-socket", type=str, default=_default_daemon_socket(),
+        help="Unix socket of the build daemon (default: %(default)s)"
+    )
+    daemon_group.add_argument(
+        "--daemon-serve", action="store_true",
+        help="If specified, run the build daemon. Jobs submitted for the same ref are "
+             "coalesced and jobs for different refs run in parallel."
+    )
+    daemon_group.add_argument(
+        "--daemon-workers", type=int, default=2,
+        help="Number of jobs run in parallel by the build daemon (default: 2)"
+    )
+    daemon_group.add_argument(
+        "--daemon-submit", action="store_true",
+        help="If specified, submit the other arguments as a job to the build daemon instead of running them."
+    )
+    daemon_group.add_argument(
+        "--daemon-sha", type=str,
+        help="SHA of the submitted ref. A job is not submitted if one with the same SHA "
+             "is already pending or running."
+    )
+    daemon_group.add_argument(
+        "--daemon-status", action="store_true",
+        help="If specified, display the jobs of the build daemon."
+    )
+    daemon_group.add_argument(
+        "--daemon-stop", action="store_true",
+        help="If specified, stop the build daemon once running jobs are completed."
+    )
     # apidocs publishing parameters
     publish_group = parser.add_argument_group('Apidocs Publishing')
+    publish_group.add_argument(
+        "--publish-backend", type=str, choices=["git", "filesystem"], default="git",
+        help="Destination of the generated HTML: a branch of a GitHub repository or a local "
+             "static site directory (see --publish-site-dir). (default: git)"
+    )
+    publish_group.add_argument(
+        "--publish-site-dir", type=str,
+        help="Static site directory used by the filesystem backend. Each subdirectory is a symbolic "
+             "link atomically switched to the last published version."
+    )
+    publish_group.add_argument(
+        "--publish-site-keep-versions", type=int, default=DEFAULT_KEEP_VERSIONS,
+        help="Number of published versions of each subdirectory kept by the filesystem backend "
+             "(default: %(default)s)"
+    )
     publish_group.add_argument(
         "--publish-github-username", type=str, default="Slicer Bot",
         help="Github name to associate with the commits (default: Slicer Bot)"
@@ -380,10 +1876,50 @@ def cli():
         "--publish-github-skip-auth", action="store_true",
         help="If specified, attempt to publish without token."
     )
+    publish_group.add_argument(
+        "--publish-github-push-attempts", type=int, default=PUSH_ATTEMPTS,
+        help="Number of attempts to push when the branch is concurrently updated "
+             "by another publisher (default: %(default)s)"
+    )
+    publish_group.add_argument(
+        "--publish-github-max-history", type=int,
+        help="If specified, keep the last N commits of the publishing branch once it has "
+             "more than 2*N commits so that cloning and fetching time remain bounded."
+    )
+    publish_group.add_argument(
+        "--publish-dedup-assets", action="store_true",
+        help="If specified, move images, scripts and stylesheets also published for other "
+             "versions into a shared content-addressed directory and update references."
+    )
     publish_group.add_argument(
         "--skip-publish", action="store_true",
         help="If specified, skip publication of HTML files."
     )
+    # apidocs garbage collection parameters
+    gc_group = parser.add_argument_group('Apidocs Garbage Collection')
+    gc_group.add_argument(
+        "--gc", action="store_true",
+        help="If specified, remove from the publishing branch the subdirs of the branches no longer "
+             "found in the Slicer repository using a single commit. Release subdirs are kept."
+    )
+    gc_group.add_argument(
+        "--gc-slicer-repo-url", type=str,
+        help="URL or path of the Slicer repository whose branches are listed "
+             "(default: https://github.com/<--slicer-repo-name>)"
+    )
+    gc_group.add_argument(
+        "--gc-keep-days", type=float, default=DEFAULT_GC_KEEP_DAYS,
+        help="Subdirs of removed branches updated during the last N days are kept (default: %(default)s)"
+    )
+    gc_group.add_argument(
+        "--gc-shared-assets", action="store_true",
+        help="If specified, also remove the shared assets (see --publish-dedup-assets) no longer "
+             "referenced by any published subdir."
+    )
+    gc_group.add_argument(
+        "--gc-dry-run", action="store_true",
+        help="If specified, only display the subdirs that would be removed."
+    )
     # apidocs builder overall status update
     status_update_group = parser.add_argument_group('Apidocs Status Update')
     status_update_group.add_argument(
@@ -408,6 +1944,11 @@ def cli():
         "--status-update-repo-name", type=str,
         help="Slicer repo name to update (default to --slicer-repo-name)"
     )
+    status_update_group.add_argument(
+        "--status-update-api-url", type=str, default=GITHUB_API_URL,
+        help="URL of the GitHub API (default: GITHUB_API_URL env. variable or https://api.github.com). "
+             "Statuses of all the refs specified using --batch-ref are updated concurrently."
+    )
     status_update_group.add_argument(
         "--status-update-token", type=str,
         default=os.environ.get("STATUS_UPDATE_GITHUB_TOKEN", None),
@@ -416,6 +1957,43 @@ def cli():
     )
     args = parser.parse_args()
 
+    # apidocs daemon
+    if args.daemon_serve:
+        try:
+            daemon.serve(args.daemon_socket, max_workers=args.daemon_workers)
+        except OSError as exc_info:
+            if exc_info.errno != errno.EADDRINUSE:
+                raise
+            print("\nAborting: %s on %s" % (exc_info.strerror, args.daemon_socket))
+            return 1
+        return 0
+
+    if args.daemon_status or args.daemon_stop:
+        response = daemon.send_request(
+            args.daemon_socket, {"action": "status" if args.daemon_status else "shutdown"})
+        print(json.dumps(response, indent=2))
+        return 0
+
+    if args.daemon_submit:
+        batch_refs = _read_batch_refs(args.batch_refs, args.batch_refs_file)
+        ref = args.slicer_repo_tag or args.slicer_repo_branch or ",".join(batch_refs)
+        if not ref:
+            print("\nAborting: parameters are missing. Specify --slicer-repo-branch, --slicer-repo-tag or --batch-ref")
+            return 1
+        key = [args.slicer_repo_name, ref]
+        if args.status_update_state:
+            key.append("status-update")
+        argv = daemon.strip_option(sys.argv[1:], "--daemon-submit", has_value=False)
+        for option in ["--daemon-socket", "--daemon-sha"]:
+            argv = daemon.strip_option(argv, option)
+        response = daemon.send_request(args.daemon_socket, {
+            "action": "submit", "key": key, "argv": argv, "sha": args.daemon_sha, "cwd": os.getcwd()})
+        print(json.dumps(response, indent=2))
+        return 0 if "job" in response else 1
+
+    if args.report_file:
+        atexit.register(REPORT.write, args.report_file)
+
     # Slicer repo name, branch and tag
     slicer_repo_name = args.slicer_repo_name
     slicer_repo_branch = args.slicer_repo_branch
@@ -429,6 +2007,18 @@ def cli():
     if args.slicer_repo_dir:
         slicer_repo_dir = os.path.abspath(args.slicer_repo_dir)
 
+    slicer_repo_sparse = args.slicer_repo_sparse
+    slicer_repo_mirror_dir = None
+    if args.slicer_repo_mirror_dir:
+        slicer_repo_mirror_dir = os.path.abspath(args.slicer_repo_mirror_dir)
+    elif args.slicer_repo_mirror:
+        slicer_repo_mirror_dir = _default_mirror_directory(slicer_repo_name)
+
+    build_cache = None
+    if args.build_cache_dir:
+        build_cache = BuildDirCache(args.build_cache_dir, max_size=int(args.build_cache_max_size * 1024 ** 3))
+    build_configuration = _apidocs_build_configuration(args.cmake_args, args.doxygen_partition_depth)
+
     # apidocs status update
     if args.status_update_state:
 
@@ -441,43 +2031,86 @@ def cli():
         if not status_update_repo_name:
             status_update_repo_name = slicer_repo_name
 
-        if not status_update_revision:
-            if os.path.exists(slicer_repo_dir + "/.git"):
-                with working_dir(slicer_repo_dir):
-                    status_update_revision = execute(
-                        "git rev-parse HEAD", capture=True, verbose=False).strip()
-
-        _apidocs_status_update(
-            status_update_state,
-            status_update_token=status_update_token,
-            status_update_repo_name=status_update_repo_name,
-            status_update_revision=status_update_revision,
-            status_update_target_url=status_update_target_url,
-            status_update_branch_or_tag=slicer_repo_branch_or_tag
+        # Refs are resolved without checkout if needed
+        ref_lookup_kwargs = dict(
+            ref_cache=RefCache(_default_ref_cache_file(slicer_repo_name)),
+            slicer_repo_mirror_dir=slicer_repo_mirror_dir,
+            slicer_repo_clone_url="https://github.com/%s" % slicer_repo_name,
+            build_cache=build_cache,
+            build_configuration=build_configuration,
         )
+
+        # Statuses of batch refs are updated concurrently
+        batch_refs = _read_batch_refs(args.batch_refs, args.batch_refs_file)
+        if batch_refs:
+            updates = []
+            for batch_ref in batch_refs:
+                batch_root_dir, batch_directory, batch_repo_dir = \
+                    _default_output_directories(slicer_repo_name, batch_ref)
+                updates.append(_status_update_parameters(
+                    status_update_state, batch_root_dir, batch_directory, batch_repo_dir, batch_ref,
+                    status_update_repo_name=status_update_repo_name,
+                    status_update_revision=batch_ref,
+                    status_update_target_url=status_update_target_url,
+                    **ref_lookup_kwargs
+                ))
+        else:
+            updates = [_status_update_parameters(
+                status_update_state, root_dir, directory, slicer_repo_dir, slicer_repo_branch_or_tag,
+                status_update_repo_name=status_update_repo_name,
+                status_update_revision=status_update_revision,
+                status_update_target_url=status_update_target_url,
+                **ref_lookup_kwargs
+            )]
+
+        with span("status-update", count=len(updates)):
+            _apidocs_status_updates(
+                status_update_state,
+                updates,
+                status_update_token=status_update_token,
+                status_update_api_url=args.status_update_api_url,
+            )
         return 0
 
     # apidocs building parameters
     slicer_repo_clone_url = "https://github.com/%s" % args.slicer_repo_name
 
     # Apidocs directories
-    apidocs_src_dir = root_dir + "/" + "%s-src" % directory
-    apidocs_build_dir = root_dir + "/" + "%s-build" % directory
-    html_output_dir = apidocs_build_dir + "/Utilities/Doxygen/html"
+    apidocs_src_dir, apidocs_build_dir, html_output_dir = \
+        _default_apidocs_directories(root_dir, directory, build_cache, build_configuration)
 
     # apidocs publishing
     publish_github_username = args.publish_github_username
     publish_github_useremail = args.publish_github_useremail
-    publish_github_repo_dir = args.publish_github_repo_dir
     publish_github_repo_name = args.publish_github_repo_name
     publish_github_repo_branch = args.publish_github_repo_branch
+    # The publishing checkout is shared by the runs of the same branch. It is kept out
+    # of the build directory which may be an entry of the build cache.
+    publish_github_repo_dir = os.path.abspath(args.publish_github_repo_dir or _default_publish_repo_directory(
+        publish_github_repo_name, publish_github_repo_branch))
     publish_github_repo_url = "https://github.com/" + publish_github_repo_name
     publish_github_token = args.publish_github_token
     publish_github_skip_auth = args.publish_github_skip_auth
+    publish_github_push_attempts = args.publish_github_push_attempts
+    publish_github_max_history = args.publish_github_max_history
+    publish_dedup_assets = args.publish_dedup_assets
+    publish_backend_name = args.publish_backend
+    publish_site_dir = args.publish_site_dir
+    publish_site_keep_versions = args.publish_site_keep_versions
 
     # Skipping
     skip_build = args.skip_build
     skip_publish = args.skip_publish
+    skip_normalize = args.skip_normalize
+    compress_html = args.compress_html
+    search_index = args.search_index
+    check_links = args.check_links
+    max_broken_links = args.check_links_max_broken
+    cmake_args = args.cmake_args
+    force_build = args.force_build
+    build_timeout = args.build_timeout
+    doxygen_partition_depth = args.doxygen_partition_depth
+    doxygen_jobs = args.doxygen_jobs
 
     def _apidocs_display_report():
 
@@ -487,12 +2120,35 @@ def cli():
             print("  * repo_name....................: %s" % slicer_repo_name)
             print("  * repo_branch_or_tag ..........: %s" % _missing(slicer_repo_branch_or_tag))
             print("  * repo_dir ....................: %s" % slicer_repo_dir)
+            print("  * repo_mirror_dir .............: %s" % _missing(slicer_repo_mirror_dir))
+            print("  * repo_sparse .................: %s" % slicer_repo_sparse)
             print("  * html_output_dir .............: %s" % html_output_dir)
             print("  * apidocs_src_dir .............: %s" % apidocs_src_dir)
             print("  * apidocs_build_dir ...........: %s" % apidocs_build_dir)
+            print("  * build_cache_dir .............: %s" % _missing(args.build_cache_dir))
+            print("  * cmake_args ..................: %s" % " ".join(cmake_args))
+            print("  * force_build .................: %s" % force_build)
+            print("  * build_timeout ...............: %s" % _missing(build_timeout))
+            print("  * doxygen_partition_depth .....: %s" % _missing(doxygen_partition_depth))
+            print("  * doxygen_jobs ................: %s" % _missing(doxygen_jobs))
+            print("  * skip_normalize ..............: %s" % skip_normalize)
+            print("  * search_index ................: %s" % search_index)
+            print("  * compress_html ...............: %s" % compress_html)
+            print("  * check_links .................: %s" % check_links)
+            print("  * check_links_max_broken ......: %s" % _missing(max_broken_links))
+
+        if not skip_publish and publish_backend_name == "filesystem":
+            print("\nApidocs publishing parameters")
+            print("  * backend .....................: %s" % publish_backend_name)
+            print("  * repo_branch_or_tag ..........: %s" % _missing(slicer_repo_branch_or_tag))
+            print("  * html_output_dir .............: %s" % html_output_dir)
+            print("  * site_dir ....................: %s" % _missing(publish_site_dir))
+            print("  * keep_versions ...............: %s" % publish_site_keep_versions)
+            print("  * skip_publish ................: %s" % skip_publish)
 
-        if not skip_publish:
+        elif not skip_publish:
             print("\nApidocs publishing parameters")
+            print("  * backend .....................: %s" % publish_backend_name)
             print("  * repo_branch_or_tag ..........: %s" % _missing(slicer_repo_branch_or_tag))
             print("  * apidocs_build_dir ...........: %s" % apidocs_build_dir)
             print("  * html_output_dir .............: %s" % html_output_dir)
@@ -504,47 +2160,55 @@ def cli():
             print("  * repo_branch .................: %s" % publish_github_repo_branch)
             print("  * github_token.................: %s" % _missing(
                 _skipped(_obfuscate(publish_github_token), skipped=publish_github_skip_auth)))
+            print("  * push_attempts ...............: %s" % publish_github_push_attempts)
+            print("  * max_history .................: %s" % _missing(publish_github_max_history))
+            print("  * dedup_assets ................: %s" % publish_dedup_assets)
             print("  * skip_publish ................: %s" % skip_publish)
 
-    _apidocs_display_report()
-
-    if not slicer_repo_branch_or_tag:
-        print("\nAborting: parameters are missing. Specify --slicer-repo-branch and/or --slicer-repo-tag")
-        return 1
-
-    if not skip_publish and not publish_github_skip_auth and not publish_github_token:
-        print("\nAborting: parameters are missing. Specify --publish-github-token or --publish-skip-github-auth")
-        return 1
-
-    if not skip_build:
+    def _missing_publish_parameters():
+        if skip_publish:
+            return None
+        if publish_backend_name == "filesystem":
+            return None if publish_site_dir else "--publish-site-dir"
+        if not publish_github_skip_auth and not publish_github_token:
+            return "--publish-github-token or --publish-skip-github-auth"
+        return None
 
-        _apidocs_build_doxygen(
-            html_output_dir=html_output_dir,
-            apidocs_src_dir=apidocs_src_dir,
-            apidocs_build_dir=apidocs_build_dir,
-            slicer_repo_clone_url=slicer_repo_clone_url,
-            slicer_repo_dir=slicer_repo_dir,
-            slicer_repo_branch_or_tag=slicer_repo_branch_or_tag,
+    def _publish_backend(publish_github_repo_dir):
+        if publish_backend_name == "filesystem":
+            return FilesystemPublishBackend(
+                publish_site_dir, keep_versions=publish_site_keep_versions, on_publish=_apidocs_diff_warnings)
+        return GitPublishBackend(
+            publish_github_repo_dir=publish_github_repo_dir,
+            publish_github_repo_url=publish_github_repo_url,
+            publish_github_repo_name=publish_github_repo_name,
+            publish_github_repo_branch=publish_github_repo_branch,
+            publish_github_user_name=publish_github_username,
+            publish_github_user_email=publish_github_useremail,
+            publish_github_token=publish_github_token,
+            publish_github_skip_auth=publish_github_skip_auth,
+            publish_github_push_attempts=publish_github_push_attempts,
+            publish_github_max_history=publish_github_max_history,
+            publish_dedup_assets=publish_dedup_assets,
         )
 
-    if not skip_publish:
+    # Batch
+    batch_refs = _read_batch_refs(args.batch_refs, args.batch_refs_file)
+    batch_jobs = args.batch_jobs
 
-        # Set "<repo_name>@<ref>" for the commit message
-        with working_dir(slicer_repo_dir):
-            slicer_repo_head_sha = execute("git rev-parse HEAD", capture=True)
-            print("slicer_repo_head_sha: %s" % slicer_repo_head_sha)
+    if args.gc:
 
-            slicer_repo_sha_ref = "%s@%s" % (
-                slicer_repo_name, slicer_repo_tag if slicer_repo_tag else slicer_repo_head_sha[:8])
+        if publish_backend_name != "git":
+            print("\nAborting: --gc requires the git publish backend")
+            return 1
 
-        # Get subdirectory in which documentation should be pushed
-        publish_github_subdir = slicer_repo_branch_or_tag
-        if is_tag(slicer_repo_dir, slicer_repo_branch_or_tag):
-            publish_github_subdir = extract_apidocs_version_from_tag(slicer_repo_branch_or_tag)
+        if not args.gc_dry_run and _missing_publish_parameters():
+            print("\nAborting: parameters are missing. Specify %s" % _missing_publish_parameters())
+            return 1
 
-        with working_dir(apidocs_build_dir):
-            _apidocs_publish_doxygen(
-                html_output_dir=html_output_dir,
+        with span("gc"):
+            _apidocs_gc(
+                slicer_repo_url=args.gc_slicer_repo_url or slicer_repo_clone_url,
                 publish_github_repo_dir=publish_github_repo_dir,
                 publish_github_repo_url=publish_github_repo_url,
                 publish_github_repo_name=publish_github_repo_name,
@@ -553,17 +2217,188 @@ def cli():
                 publish_github_user_email=publish_github_useremail,
                 publish_github_token=publish_github_token,
                 publish_github_skip_auth=publish_github_skip_auth,
-                publish_github_subdir=publish_github_subdir,
-                slicer_repo_sha_ref=slicer_repo_sha_ref,
+                publish_github_push_attempts=publish_github_push_attempts,
+                keep_days=args.gc_keep_days,
+                prune_shared_assets=args.gc_shared_assets,
+                dry_run=args.gc_dry_run,
+            )
+        REPORT.display()
+        return 0
+
+    if batch_refs and (skip_build or args.slicer_repo_dir):
+        print("\nAborting: --skip-build and --slicer-repo-dir are not supported with --batch-ref or --batch-refs-file")
+        return 1
+
+    if args.plan:
+
+        if not batch_refs and not slicer_repo_branch_or_tag:
+            print("\nAborting: parameters are missing. Specify --slicer-repo-branch, --slicer-repo-tag or --batch-ref")
+            return 1
+
+        if _missing_publish_parameters():
+            print("\nAborting: parameters are missing. Specify %s" % _missing_publish_parameters())
+            return 1
+
+        plans = []
+        for ref in batch_refs or [slicer_repo_branch_or_tag]:
+            ref_slicer_repo_dir, ref_apidocs_build_dir, ref_html_output_dir = \
+                slicer_repo_dir, apidocs_build_dir, html_output_dir
+            ref_slicer_repo_mirror_dir = slicer_repo_mirror_dir
+            if batch_refs:
+                ref_root_dir, ref_directory, ref_slicer_repo_dir = \
+                    _default_output_directories(slicer_repo_name, ref)
+                _, ref_apidocs_build_dir, ref_html_output_dir = _default_apidocs_directories(
+                    ref_root_dir, ref_directory, build_cache, build_configuration)
+                # The batch mode always checks out worktrees of the mirror
+                ref_slicer_repo_mirror_dir = slicer_repo_mirror_dir or _default_mirror_directory(slicer_repo_name)
+            plans.append(_apidocs_plan_ref(
+                slicer_repo_name=slicer_repo_name,
+                slicer_repo_branch_or_tag=ref,
+                slicer_repo_clone_url=slicer_repo_clone_url,
+                slicer_repo_dir=ref_slicer_repo_dir,
+                slicer_repo_mirror_dir=ref_slicer_repo_mirror_dir,
+                apidocs_build_dir=ref_apidocs_build_dir,
+                html_output_dir=ref_html_output_dir,
+                extra_cmake_args=cmake_args,
+                force_build=force_build,
+                doxygen_partition_depth=doxygen_partition_depth,
+                skip_build=skip_build,
                 skip_publish=skip_publish,
+                publish_backend=_publish_backend(publish_github_repo_dir),
+            ))
+
+        if args.plan_format == "json":
+            print(json.dumps({"version": 1, "noop": all(_is_noop_plan(plan) for plan in plans), "refs": plans},
+                             indent=2, sort_keys=True))
+        else:
+            _apidocs_display_plan(plans)
+        return 0
+
+    if batch_refs:
+
+        if _missing_publish_parameters():
+            print("\nAborting: parameters are missing. Specify %s" % _missing_publish_parameters())
+            return 1
+
+        print("\nApidocs batch parameters")
+        print("  * repo_name....................: %s" % slicer_repo_name)
+        print("  * refs ........................: %s" % " ".join(batch_refs))
+        print("  * jobs ........................: %s" % batch_jobs)
+
+        with span("batch"):
+            failed_refs = _apidocs_batch(
+                slicer_repo_name=slicer_repo_name,
+                slicer_repo_refs=batch_refs,
+                slicer_repo_mirror_dir=slicer_repo_mirror_dir,
+                slicer_repo_sparse=slicer_repo_sparse,
+                batch_jobs=batch_jobs,
+                extra_cmake_args=cmake_args,
+                force_build=force_build,
+                build_timeout=build_timeout,
+                doxygen_partition_depth=doxygen_partition_depth,
+                doxygen_jobs=doxygen_jobs,
+                skip_normalize=skip_normalize,
+                compress_html=compress_html,
+                search_index=search_index,
+                check_links=check_links,
+                max_broken_links=max_broken_links,
+                skip_publish=skip_publish,
+                publish_backend=_publish_backend(publish_github_repo_dir),
+                build_cache=build_cache,
             )
+        REPORT.display()
+        return 1 if failed_refs else 0
+
+    _apidocs_display_report()
+
+    if not slicer_repo_branch_or_tag:
+        print("\nAborting: parameters are missing. Specify --slicer-repo-branch and/or --slicer-repo-tag")
+        return 1
+
+    if _missing_publish_parameters():
+        print("\nAborting: parameters are missing. Specify %s" % _missing_publish_parameters())
+        return 1
+
+    # Runs documenting the same ref share the same directories
+    with file_lock(slicer_repo_dir + ".lock"), contextlib.ExitStack() as entry_locks:
+
+        entry_dirs = []
+        if build_cache is not None:
+            entry_dirs.append(build_cache.entry_dir(directory, build_configuration))
+            entry_locks.enter_context(build_cache.lock(entry_dirs[-1]))
 
-        # Since building the doxygen documentation outputs a lot of text,
-        # for convenience let's display the report again.
         if not skip_build:
-            _apidocs_display_report()
 
-    return 0
+            with span("checkout"):
+                slicer_ref = _apidocs_checkout_slicer(
+                    slicer_repo_clone_url=slicer_repo_clone_url,
+                    slicer_repo_dir=slicer_repo_dir,
+                    slicer_repo_branch_or_tag=slicer_repo_branch_or_tag,
+                    slicer_repo_mirror_dir=slicer_repo_mirror_dir,
+                    slicer_repo_sparse=slicer_repo_sparse,
+                )
+            RefCache(_default_ref_cache_file(slicer_repo_name)).put(slicer_ref)
+
+            with span("build"):
+                built = _apidocs_build_doxygen(
+                    html_output_dir=html_output_dir,
+                    apidocs_src_dir=apidocs_src_dir,
+                    apidocs_build_dir=apidocs_build_dir,
+                    slicer_repo_dir=slicer_repo_dir,
+                    slicer_ref=slicer_ref,
+                    extra_cmake_args=cmake_args,
+                    force_build=force_build,
+                    build_timeout=build_timeout,
+                    doxygen_partition_depth=doxygen_partition_depth,
+                    doxygen_jobs=doxygen_jobs,
+                )
+
+            if built and not skip_normalize:
+                with span("normalize"):
+                    _apidocs_normalize_html(html_output_dir, [slicer_repo_dir, apidocs_build_dir])
+
+            if search_index:
+                with span("search-index"):
+                    _apidocs_build_search_index(html_output_dir)
+
+            if compress_html:
+                with span("compress"):
+                    _apidocs_compress_html(html_output_dir)
+
+        else:
+            slicer_ref = resolve_slicer_ref(slicer_repo_dir, slicer_repo_branch_or_tag)
+
+        links_ok = True
+        if check_links:
+            with span("check-links"):
+                links_ok = _apidocs_check_links(html_output_dir, max_broken_links)
+            if not links_ok and not skip_publish:
+                print("\nSkipping publication of %s" % html_output_dir)
+
+        if not skip_publish and links_ok:
+
+            # Set "<repo_name>@<ref>" for the commit message
+            print("slicer_repo_head_sha: %s" % slicer_ref.sha)
+            slicer_repo_sha_ref = slicer_ref.sha_ref(slicer_repo_name)
+
+            # Get subdirectory in which documentation should be pushed
+            publish_github_subdir = slicer_ref.subdir
+
+            with working_dir(apidocs_build_dir), span("publish"):
+                _publish_backend(publish_github_repo_dir).publish(
+                    [(html_output_dir, publish_github_subdir, slicer_repo_sha_ref)])
+
+            # Since building the doxygen documentation outputs a lot of text,
+            # for convenience let's display the report again.
+            if not skip_build:
+                _apidocs_display_report()
+
+        if build_cache is not None:
+            _apidocs_update_build_cache(build_cache, entry_dirs)
+
+    REPORT.display()
+
+    return 0 if links_ok else 1
 
 
 def main():
@@ -574,6 +2409,14 @@ def main():
         if exc_info.output:
             print("\nOutput: %s" % exc_info.output)
         raise SystemExit(exc_info.returncode)
+    except GitHubAPIError as exc_info:
+        print("\nGitHub API error: %s" % exc_info)
+        raise SystemExit(1)
+    except (subprocess.TimeoutExpired, CommandCancelled) as exc_info:
+        print("\n%s" % exc_info)
+        if exc_info.output:
+            print("\nOutput: %s" % exc_info.output)
+        raise SystemExit(1)
     except KeyboardInterrupt:
         print("interrupt received, stopping...")
 
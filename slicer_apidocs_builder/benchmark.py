@@ -0,0 +1,334 @@
+# -*- coding: utf-8 -*-
+"""Benchmark of the build and publish pipeline using a synthetic Slicer repository.
+
+Usage::
+
+    python -m slicer_apidocs_builder.benchmark --sizes 500 2000 --output baseline.json
+    python -m slicer_apidocs_builder.benchmark --sizes 500 2000 --compare baseline.json
+
+Everything runs offline: Doxygen and dot are replaced by stubs generating
+Doxygen-like pages, the documentation is published into a local bare
+repository and statuses are sent to a local server mimicking the GitHub API.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import textwrap
+import time
+
+from contextlib import contextmanager
+
+import slicer_apidocs_builder as sab
+
+from .instrumentation import span
+from .testing import SLICER_DOXYGEN_FILES, fake_doxygen, fake_dot, fake_github
+from .utils import execute, mkdir_p
+
+# Number of headers of the synthetic repositories
+DEFAULT_SIZES = [500, 2000, 5000]
+
+# Scenarios timed for each size, in execution order
+SCENARIOS = [
+    "checkout",
+    "build",
+    "build-noop",
+    "normalize",
+    "publish",
+    "republish-noop",
+    "status-update",
+]
+
+# Relative slowdown reported as a regression by --compare
+DEFAULT_TOLERANCE = 0.25
+
+# Slowdowns smaller than this duration (in seconds) are ignored by --compare
+DEFAULT_MIN_DELTA = 0.1
+
+_COMPONENTS = ["Base/QTCore", "Base/QTGUI", "Libs/MRML/Core", "Libs/MRML/Widgets", "Modules/Loadable/Volumes",
+               "Modules/Loadable/Markups", "Modules/Scripted/DICOM"]
+
+_SLICER_CMAKELISTS = """\
+cmake_minimum_required(VERSION 3.16.3)
+project(Slicer)
+set(Slicer_VERSION_MAJOR "5")
+set(Slicer_VERSION_MINOR "7")
+set(Slicer_VERSION_PATCH "0")
+"""
+
+
+def _write(path, content):
+    mkdir_p(os.path.dirname(path))
+    with open(path, "w") as fp:
+        fp.write(content)
+
+
+def _git(*args, **kwargs):
+    return execute(["git", "-c", "user.name=Benchmark", "-c", "user.email=benchmark@example.org"] + list(args),
+                   verbose=False, **kwargs)
+
+
+def create_slicer_repository(repo_dir, size):
+    """Create a git repository with the layout of the Slicer sources holding ``size`` headers."""
+    _write(os.path.join(repo_dir, "CMakeLists.txt"), _SLICER_CMAKELISTS)
+    for path, content in SLICER_DOXYGEN_FILES.items():
+        _write(os.path.join(repo_dir, path), content)
+    for index in range(size):
+        component = _COMPONENTS[index % len(_COMPONENTS)]
+        name = "vtkSlicer%s%dLogic" % (component.rsplit("/", 1)[1], index)
+        _write(os.path.join(repo_dir, component, name + ".h"), textwrap.dedent("""\
+            /// \\brief Logic number %d of %s
+            class %s
+            {
+            public:
+              /// Apply the logic
+              void Method0();
+            };
+            """) % (index, component, name))
+    _git("init", "--quiet", "--initial-branch=main", repo_dir)
+    _git("-C", repo_dir, "add", "--all")
+    _git("-C", repo_dir, "commit", "--quiet", "-m", "Synthetic Slicer sources")
+
+
+def create_publish_repository(bare_dir, branch="gh-pages"):
+    """Create a bare publishing repository whose ``branch`` has an initial commit."""
+    _git("init", "--quiet", "--bare", bare_dir)
+    seed_dir = bare_dir + "-seed"
+    _git("init", "--quiet", "--initial-branch=%s" % branch, seed_dir)
+    _write(os.path.join(seed_dir, "README.md"), "Synthetic API documentation\n")
+    _git("-C", seed_dir, "add", "--all")
+    _git("-C", seed_dir, "commit", "--quiet", "-m", "Initial commit")
+    _git("-C", seed_dir, "push", "--quiet", bare_dir, branch, capture=True)
+    shutil.rmtree(seed_dir)
+
+
+@contextmanager
+def _redirect_output(log_file):
+    """Redirect the output of the process and of its children into ``log_file``."""
+    sys.stdout.flush()
+    sys.stderr.flush()
+    saved = [os.dup(1), os.dup(2)]
+    with open(log_file, "a") as fp:
+        os.dup2(fp.fileno(), 1)
+        os.dup2(fp.fileno(), 2)
+        try:
+            yield
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os.dup2(saved[0], 1)
+            os.dup2(saved[1], 2)
+            for fd in saved:
+                os.close(fd)
+
+
+def run_pipeline(work_dir, size, doxygen_partition_depth=None):
+    """Run the pipeline scenarios against a new synthetic repository of ``size`` headers.
+
+    Return a dictionary mapping each scenario to its span record (wall time, CPU time, ...).
+    """
+    source_dir = os.path.join(work_dir, "Slicer-source")
+    bin_dir = os.path.join(work_dir, "bin")
+    remote_dir = os.path.join(work_dir, "apidocs.git")
+    slicer_repo_dir = os.path.join(work_dir, "Slicer")
+    apidocs_src_dir, apidocs_build_dir, html_output_dir = sab._default_apidocs_directories(work_dir, "Slicer")
+
+    create_slicer_repository(source_dir, size)
+    create_publish_repository(remote_dir)
+    cmake_args = [
+        "-DDOXYGEN_EXECUTABLE:FILEPATH=%s" % fake_doxygen(bin_dir),
+        "-DDOXYGEN_DOT_EXECUTABLE:FILEPATH=%s" % fake_dot(bin_dir),
+    ]
+    publish_kwargs = dict(
+        html_output_dir=html_output_dir,
+        publish_github_repo_dir=os.path.join(work_dir, "apidocs"),
+        publish_github_repo_url="file://" + remote_dir,
+        publish_github_repo_name="Benchmark/apidocs",
+        publish_github_repo_branch="gh-pages",
+        publish_github_user_name="Benchmark",
+        publish_github_user_email="benchmark@example.org",
+        publish_github_skip_auth=True,
+        publish_github_subdir="main",
+    )
+
+    records = {}
+
+    @contextmanager
+    def _scenario(name):
+        with span("benchmark-" + name, size=size) as record:
+            yield
+        records[name] = record
+
+    with _scenario("checkout"):
+        slicer_ref = sab._apidocs_checkout_slicer(
+            slicer_repo_clone_url="file://" + source_dir,
+            slicer_repo_dir=slicer_repo_dir,
+            slicer_repo_branch_or_tag="main",
+            slicer_repo_mirror_dir=os.path.join(work_dir, "Slicer.git"),
+        )
+    build_kwargs = dict(
+        html_output_dir=html_output_dir,
+        apidocs_src_dir=apidocs_src_dir,
+        apidocs_build_dir=apidocs_build_dir,
+        slicer_repo_dir=slicer_repo_dir,
+        slicer_ref=slicer_ref,
+        extra_cmake_args=cmake_args,
+        doxygen_partition_depth=doxygen_partition_depth,
+    )
+    with _scenario("build"):
+        assert sab._apidocs_build_doxygen(force_build=True, **build_kwargs)
+    with _scenario("build-noop"):
+        assert not sab._apidocs_build_doxygen(**build_kwargs)
+    with _scenario("normalize"):
+        sab._apidocs_normalize_html(html_output_dir, [slicer_repo_dir, apidocs_build_dir])
+    with _scenario("publish"):
+        sab._apidocs_publish_doxygen(slicer_repo_sha_ref=slicer_ref.sha_ref("Benchmark/Slicer"), **publish_kwargs)
+    with _scenario("republish-noop"):
+        sab._apidocs_publish_doxygen(slicer_repo_sha_ref=slicer_ref.sha_ref("Benchmark/Slicer"), **publish_kwargs)
+    with fake_github({"heads/main": slicer_ref.sha}) as api, _scenario("status-update"):
+        sab._apidocs_status_update(
+            "success", status_update_token="benchmark", status_update_api_url=api.url,
+            status_update_repo_name="Benchmark/Slicer", status_update_revision="main",
+            status_update_target_url="http://apidocs.example.org", status_update_branch_or_tag="main")
+    return records
+
+
+def _tool_version(args):
+    try:
+        return execute(args, capture=True, verbose=False).splitlines()[0].strip()
+    except (OSError, subprocess.CalledProcessError, IndexError):
+        return None
+
+
+def run_benchmark(sizes, repeat=1, work_dir=None, doxygen_partition_depth=None, keep=False):
+    """Run the pipeline ``repeat`` times for each size and return the baseline.
+
+    Each scenario reports the median of the wall and CPU times of its runs.
+    """
+    root_dir = work_dir or tempfile.mkdtemp(prefix="apidocs-benchmark-")
+    log_file = os.path.join(root_dir, "benchmark.log")
+    mkdir_p(root_dir)
+    results = {}
+    print("\nApidocs benchmark (output: %s)" % log_file)
+    for size in sizes:
+        runs = []
+        for iteration in range(repeat):
+            run_dir = os.path.join(root_dir, "%d-%d" % (size, iteration))
+            if os.path.exists(run_dir):
+                shutil.rmtree(run_dir)
+            with _redirect_output(log_file):
+                runs.append(run_pipeline(run_dir, size, doxygen_partition_depth))
+            if not keep:
+                shutil.rmtree(run_dir)
+        results[str(size)] = {}
+        for scenario in SCENARIOS:
+            results[str(size)][scenario] = {
+                "wall_s": round(statistics.median(run[scenario]["wall_s"] for run in runs), 6),
+                "cpu_children_s": round(statistics.median(run[scenario]["cpu_children_s"] for run in runs), 6),
+                "cpu_self_s": round(statistics.median(run[scenario]["cpu_self_s"] for run in runs), 6),
+                "runs": [run[scenario]["wall_s"] for run in runs],
+            }
+            print("  * %-5d %s %s: %8.2fs" % (
+                size, scenario, "." * (20 - len(scenario)), results[str(size)][scenario]["wall_s"]))
+    if not keep and work_dir is None:
+        shutil.rmtree(root_dir)
+    return {
+        "version": 1,
+        "created": time.time(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "git": _tool_version(["git", "--version"]),
+        "cmake": _tool_version(["cmake", "--version"]),
+        "repeat": repeat,
+        "doxygen_partition_depth": doxygen_partition_depth,
+        "results": results,
+    }
+
+
+def compare_baselines(baseline, current, tolerance=DEFAULT_TOLERANCE, min_delta=DEFAULT_MIN_DELTA):
+    """Return the list of ``(size, scenario, baseline_s, current_s)`` regressions.
+
+    A scenario regressed if its wall time increased by more than ``tolerance``
+    (relative) and ``min_delta`` seconds. Sizes and scenarios missing from
+    either baseline are ignored.
+    """
+    regressions = []
+    for size, scenarios in sorted(current["results"].items(), key=lambda item: int(item[0])):
+        for scenario, result in scenarios.items():
+            previous = baseline["results"].get(size, {}).get(scenario)
+            if previous is None:
+                continue
+            delta = result["wall_s"] - previous["wall_s"]
+            if delta > min_delta and delta > tolerance * previous["wall_s"]:
+                regressions.append((size, scenario, previous["wall_s"], result["wall_s"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+        help="Number of headers of the synthetic repositories (default: %s)" % " ".join(map(str, DEFAULT_SIZES))
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=1,
+        help="Number of runs of each size. The median is reported (default: 1)"
+    )
+    parser.add_argument(
+        "--work-dir", type=str,
+        help="Directory where repositories are generated (default: temporary directory)"
+    )
+    parser.add_argument(
+        "--keep", action="store_true",
+        help="If specified, keep the generated repositories and build directories."
+    )
+    parser.add_argument(
+        "--doxygen-partition-depth", type=int,
+        help="If specified, benchmark the partitioned Doxygen build (see the builder cli)."
+    )
+    parser.add_argument(
+        "--output", type=str,
+        help="If specified, write the results as JSON into this file."
+    )
+    parser.add_argument(
+        "--compare", type=str,
+        help="Baseline previously written using --output. Exit with a non-zero code if a scenario regressed."
+    )
+    parser.add_argument(
+        "--tolerance", type=float, default=DEFAULT_TOLERANCE,
+        help="Relative slowdown considered as a regression (default: %(default)s)"
+    )
+    parser.add_argument(
+        "--min-delta", type=float, default=DEFAULT_MIN_DELTA,
+        help="Slowdowns smaller than this duration in seconds are ignored (default: %(default)s)"
+    )
+    args = parser.parse_args()
+
+    current = run_benchmark(args.sizes, args.repeat, args.work_dir, args.doxygen_partition_depth, args.keep)
+    if args.output:
+        with open(args.output, "w") as fp:
+            json.dump(current, fp, indent=2, sort_keys=True)
+        print("\nBaseline written into %s" % args.output)
+
+    if args.compare:
+        with open(args.compare) as fp:
+            baseline = json.load(fp)
+        regressions = compare_baselines(baseline, current, args.tolerance, args.min_delta)
+        print("\nApidocs benchmark comparison with %s" % args.compare)
+        for size, scenario, previous, wall in regressions:
+            print("  * %-5s %s %s: %8.2fs -> %8.2fs (+%d%%)" % (
+                size, scenario, "." * (20 - len(scenario)), previous, wall, 100 * (wall - previous) / previous))
+        if regressions:
+            return 1
+        print("  * no regression")
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    sys.exit(main())
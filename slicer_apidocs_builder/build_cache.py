@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+
+from .utils import file_lock, mkdir_p, try_file_lock
+
+# Index of the cache recording the size and the time of last use of each entry
+BUILD_CACHE_INDEX_FILENAME = "apidocs-build-cache.json"
+
+# Default maximum size of the cache in GB
+DEFAULT_BUILD_CACHE_MAX_SIZE = 20
+
+
+def directory_size(path):
+    """Return the size in bytes of the files found in ``path``. Hardlinked files are counted once."""
+    seen = set()
+    size = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                stat = os.lstat(os.path.join(dirpath, filename))
+            except OSError:
+                continue
+            if (stat.st_dev, stat.st_ino) in seen:
+                continue
+            seen.add((stat.st_dev, stat.st_ino))
+            size += stat.st_size
+    return size
+
+
+class BuildDirCache(object):
+    """Persistent cache of apidocs build directories bounded in size.
+
+    Each entry ``<cache_dir>/<name>-<hash>`` holds the apidocs source and
+    build directories of a Slicer ref, ``hash`` identifying the build
+    ``configuration`` (CMake arguments, partition depth, ...). The CMake
+    configuration, the fingerprint of the last build, the html output and
+    the Doxygen partitions are kept in the entry so that the next build of
+    the same ref starts warm.
+
+    The index ``apidocs-build-cache.json`` records the size and the time of
+    last use of each entry (see :meth:`touch`). Least recently used entries
+    are removed by :meth:`evict` once the cache is larger than ``max_size``
+    bytes. Entries locked by a running build (see :meth:`lock`) are kept.
+    """
+
+    def __init__(self, cache_dir, max_size=DEFAULT_BUILD_CACHE_MAX_SIZE * 1024 ** 3):
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_size = max_size
+
+    def entry_dir(self, name, configuration=None):
+        """Return the directory of the entry associated with ``name`` (e.g ``Slicer-Slicer-main``)
+        and ``configuration``, a JSON serializable dictionary."""
+        digest = hashlib.sha1(json.dumps(configuration or {}, sort_keys=True).encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, "%s-%s" % (re.sub(r"[^\w.-]", "-", name), digest[:12]))
+
+    def lock(self, entry_dir):
+        """Return a context manager preventing the eviction of ``entry_dir``."""
+        return file_lock(entry_dir + ".lock")
+
+    def _index_file(self):
+        return os.path.join(self.cache_dir, BUILD_CACHE_INDEX_FILENAME)
+
+    def _read_index(self):
+        try:
+            with open(self._index_file()) as fp:
+                return json.load(fp)["entries"]
+        except (IOError, OSError, ValueError, KeyError):
+            return {}
+
+    def _write_index(self, entries):
+        with open(self._index_file() + ".tmp", "w") as fp:
+            json.dump({"version": 1, "entries": entries}, fp, indent=1, sort_keys=True)
+        os.replace(self._index_file() + ".tmp", self._index_file())
+
+    def touch(self, entry_dir):
+        """Record the use of ``entry_dir`` along with its current size. Return the size."""
+        size = directory_size(entry_dir)
+        mkdir_p(self.cache_dir)
+        with file_lock(self._index_file() + ".lock"):
+            entries = self._read_index()
+            entries[os.path.basename(entry_dir)] = {"size": size, "last_used": time.time()}
+            self._write_index(entries)
+        return size
+
+    def evict(self):
+        """Remove the least recently used entries until the cache is not larger than ``max_size``.
+
+        Entries missing from the index (e.g left by an interrupted run) are
+        accounted using their modification time. Return ``(removed_entries, size)``,
+        ``size`` being the size of the remaining entries.
+        """
+        if not os.path.isdir(self.cache_dir):
+            return [], 0
+        with file_lock(self._index_file() + ".lock"):
+            entries = {}
+            indexed = self._read_index()
+            for name in os.listdir(self.cache_dir):
+                path = os.path.join(self.cache_dir, name)
+                if not os.path.isdir(path):
+                    continue
+                entries[name] = indexed.get(name) or {
+                    "size": directory_size(path), "last_used": os.path.getmtime(path)}
+
+            size = sum(entry["size"] for entry in entries.values())
+            removed = []
+            for name in sorted(entries, key=lambda name: entries[name]["last_used"]):
+                if size <= self.max_size:
+                    break
+                path = os.path.join(self.cache_dir, name)
+                with try_file_lock(path + ".lock") as locked:
+                    if not locked:
+                        continue
+                    shutil.rmtree(path)
+                size -= entries.pop(name)["size"]
+                removed.append(path)
+
+            self._write_index(entries)
+        return removed, size
@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+
+import gzip
+import io
+import json
+import os
+import shutil
+
+from concurrent.futures import ProcessPoolExecutor
+
+from .sync import file_digest, list_files
+from .utils import mkdir_p
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+# Extensions of the generated files worth compressing: html pages, search
+# data, stylesheets, diagrams and tag files.
+COMPRESSED_EXTENSIONS = (".html", ".js", ".css", ".svg", ".map", ".json", ".xml", ".tag", ".txt")
+
+# Files smaller than this are served as is.
+MIN_COMPRESSED_SIZE = 512
+
+# Directory written next to the html directory holding the manifest and a copy
+# of the sidecars indexed by the sha1 of the compressed content. It is kept out
+# of the html directory so that the sidecars of unchanged files are reused once
+# Doxygen generated the html directory again.
+COMPRESSED_CACHE_DIRNAME = "apidocs-compressed"
+
+# Manifest of the cache directory listing the sidecars available for each file
+COMPRESSED_MANIFEST_FILENAME = "apidocs-compressed.json"
+
+# Sidecar extension associated with each supported encoding
+SIDECAR_EXTENSIONS = {"gzip": ".gz", "br": ".br"}
+
+
+def available_encodings():
+    """Return the supported encodings. ``br`` requires the optional :mod:`brotli` module."""
+    return ["gzip", "br"] if brotli is not None else ["gzip"]
+
+
+def _compress(content, encoding):
+    if encoding == "br":
+        return brotli.compress(content, quality=11)
+    # Fixed mtime and no filename: sidecars only change when the content changes.
+    buffer = io.BytesIO()
+    with gzip.GzipFile(filename="", mode="wb", fileobj=buffer, compresslevel=9, mtime=0) as fp:
+        fp.write(content)
+    return buffer.getvalue()
+
+
+def _write_sidecars(path, encodings):
+    """Write the sidecars of ``path`` smaller than the original file.
+
+    Return a dictionary mapping each written encoding to the sidecar size.
+    """
+    with open(path, "rb") as fp:
+        content = fp.read()
+    sizes = {}
+    for encoding in encodings:
+        sidecar = path + SIDECAR_EXTENSIONS[encoding]
+        compressed = _compress(content, encoding)
+        if len(compressed) < len(content):
+            with open(sidecar, "wb") as fp:
+                fp.write(compressed)
+            sizes[encoding] = len(compressed)
+        elif os.path.exists(sidecar):
+            os.remove(sidecar)
+    return sizes
+
+
+def compressed_cache_dir(html_dir):
+    """Return the directory holding the manifest and the cached sidecars of ``html_dir``."""
+    return os.path.join(os.path.dirname(os.path.abspath(html_dir)), COMPRESSED_CACHE_DIRNAME)
+
+
+def read_compressed_manifest(html_dir):
+    try:
+        with open(os.path.join(compressed_cache_dir(html_dir), COMPRESSED_MANIFEST_FILENAME)) as fp:
+            return json.load(fp)
+    except (IOError, OSError, ValueError):
+        return None
+
+
+def _cached_sidecar(cache_dir, sha1, encoding):
+    return os.path.join(cache_dir, sha1[:2], sha1[2:] + SIDECAR_EXTENSIONS[encoding])
+
+
+def _restore_sidecars(cache_dir, sha1, sidecars, path):
+    """Copy the cached ``sidecars`` of the content ``sha1`` next to ``path``.
+
+    Return False if one of them is missing.
+    """
+    cached_paths = {encoding: _cached_sidecar(cache_dir, sha1, encoding) for encoding in sidecars}
+    if not all(os.path.exists(cached_path) for cached_path in cached_paths.values()):
+        return False
+    for encoding, cached_path in cached_paths.items():
+        shutil.copyfile(cached_path, path + SIDECAR_EXTENSIONS[encoding])
+    return True
+
+
+def _cache_sidecars(cache_dir, sha1, sidecars, path):
+    for encoding in sidecars:
+        cached_path = _cached_sidecar(cache_dir, sha1, encoding)
+        mkdir_p(os.path.dirname(cached_path))
+        shutil.copyfile(path + SIDECAR_EXTENSIONS[encoding], cached_path)
+
+
+def _prune_cache(cache_dir, cache):
+    """Remove the cached sidecars not listed in ``cache``."""
+    expected = {os.path.relpath(_cached_sidecar(cache_dir, sha1, encoding), cache_dir).replace(os.sep, "/")
+                for sha1, sidecars in cache.items() for encoding in sidecars}
+    for path in list_files(cache_dir) - expected - {COMPRESSED_MANIFEST_FILENAME}:
+        os.remove(os.path.join(cache_dir, path))
+
+
+def discard_compressed_entries(html_dir, paths):
+    """Remove ``paths`` from the manifest written by :func:`compress_html_tree`, if any."""
+    manifest = read_compressed_manifest(html_dir)
+    if manifest is None or not any(path in manifest["files"] for path in paths):
+        return
+    for path in paths:
+        manifest["files"].pop(path, None)
+    _write_compressed_manifest(html_dir, manifest)
+
+
+def refresh_compressed_entries(html_dir, paths, max_workers=None):
+    """Write again the sidecars of ``paths`` modified after :func:`compress_html_tree`
+    compressed them (e.g pages rewritten by :func:`dedup_html_tree`) and update their
+    manifest entries. Paths missing from the manifest are ignored.
+    """
+    manifest = read_compressed_manifest(html_dir)
+    if manifest is None:
+        return
+    paths = sorted(path for path in set(paths) if path in manifest["files"])
+    if not paths:
+        return
+    cache_dir = compressed_cache_dir(html_dir)
+    encodings = [encoding for encoding in manifest["encodings"] if encoding in available_encodings()]
+    to_compress = []
+    for path in paths:
+        full_path = os.path.join(html_dir, path)
+        size = os.path.getsize(full_path)
+        for extension in SIDECAR_EXTENSIONS.values():
+            if os.path.exists(full_path + extension):
+                os.remove(full_path + extension)
+        if not _is_compressible(path, size):
+            del manifest["files"][path]
+            continue
+        entry = manifest["files"][path] = {"sha1": file_digest(full_path), "size": size}
+        cached = manifest["cache"].get(entry["sha1"])
+        if cached is not None and _restore_sidecars(cache_dir, entry["sha1"], cached, full_path):
+            entry["sidecars"] = cached
+        else:
+            to_compress.append(path)
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(
+            _write_sidecars, [os.path.join(html_dir, path) for path in to_compress],
+            [encodings] * len(to_compress), chunksize=16)
+        for path, sizes in zip(to_compress, results):
+            entry = manifest["files"][path]
+            entry["sidecars"] = sizes
+            # Sidecars missing an unavailable encoding are not reused by later runs
+            if encodings == manifest["encodings"]:
+                _cache_sidecars(cache_dir, entry["sha1"], sizes, os.path.join(html_dir, path))
+                manifest["cache"][entry["sha1"]] = sizes
+
+    _write_compressed_manifest(html_dir, manifest)
+
+
+def _write_compressed_manifest(html_dir, manifest):
+    cache_dir = compressed_cache_dir(html_dir)
+    mkdir_p(cache_dir)
+    with open(os.path.join(cache_dir, COMPRESSED_MANIFEST_FILENAME), "w") as fp:
+        json.dump(manifest, fp, indent=1, sort_keys=True)
+
+
+def _is_compressible(path, size):
+    return path.endswith(COMPRESSED_EXTENSIONS) and size >= MIN_COMPRESSED_SIZE
+
+
+def compress_html_tree(html_dir, encodings=None, max_workers=None):
+    """Write pre-compressed sidecars (e.g ``page.html.gz`` and ``page.html.br``)
+    of the text files found in ``html_dir`` using a pool of processes.
+
+    Files whose content hash is the one recorded in the manifest of the
+    previous run and whose sidecars exist are skipped. The sidecars of the
+    other files are copied from the cache directory (see
+    :func:`compressed_cache_dir`) if their content was compressed by the
+    previous run, e.g before Doxygen generated ``html_dir`` again. Sidecars of
+    removed files are deleted. The manifest maps each compressed file to its
+    hash, size and the size of each sidecar.
+
+    Return ``(compressed, reused)`` counts.
+    """
+    if encodings is None:
+        encodings = available_encodings()
+    cache_dir = compressed_cache_dir(html_dir)
+    previous = read_compressed_manifest(html_dir) or {}
+    if previous.get("encodings") == encodings:
+        previous_files, cache = previous["files"], previous["cache"]
+    else:
+        previous_files, cache = {}, {}
+
+    sidecar_extensions = tuple(SIDECAR_EXTENSIONS.values())
+    all_files = list_files(html_dir)
+    sources = sorted(path for path in all_files if not path.endswith(sidecar_extensions))
+
+    files = {}
+    to_compress = []
+    reused = 0
+    for path in sources:
+        full_path = os.path.join(html_dir, path)
+        size = os.path.getsize(full_path)
+        if not _is_compressible(path, size):
+            continue
+        entry = {"sha1": file_digest(full_path), "size": size}
+        cached = previous_files.get(path)
+        if (cached is not None and cached["sha1"] == entry["sha1"]
+                and all(path + SIDECAR_EXTENSIONS[encoding] in all_files for encoding in cached["sidecars"])):
+            entry["sidecars"] = cached["sidecars"]
+            reused += 1
+        elif entry["sha1"] in cache and _restore_sidecars(cache_dir, entry["sha1"], cache[entry["sha1"]], full_path):
+            entry["sidecars"] = cache[entry["sha1"]]
+            all_files.update(path + SIDECAR_EXTENSIONS[encoding] for encoding in entry["sidecars"])
+            reused += 1
+        else:
+            to_compress.append(path)
+        files[path] = entry
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(
+            _write_sidecars, [os.path.join(html_dir, path) for path in to_compress],
+            [encodings] * len(to_compress), chunksize=16)
+        for path, sizes in zip(to_compress, results):
+            files[path]["sidecars"] = sizes
+            _cache_sidecars(cache_dir, files[path]["sha1"], sizes, os.path.join(html_dir, path))
+            cache[files[path]["sha1"]] = sizes
+
+    # Remove sidecars of files that were removed or are no longer compressed.
+    # Other compressed files (e.g the search index shards) are left untouched.
+    for path in all_files:
+        if path.endswith(sidecar_extensions):
+            source = path.rsplit(".", 1)[0]
+            if source not in all_files and source not in previous_files:
+                continue
+            encoding = [name for name, extension in SIDECAR_EXTENSIONS.items() if path.endswith(extension)][0]
+            if encoding not in files.get(source, {}).get("sidecars", {}):
+                os.remove(os.path.join(html_dir, path))
+
+    # Sidecars of the files of the previous run are kept too: the pages rewritten
+    # once compressed (see refresh_compressed_entries) are rewritten again once
+    # the next build generated them.
+    kept = {entry["sha1"] for entry in list(files.values()) + list(previous_files.values())}
+    cache = {sha1: sidecars for sha1, sidecars in cache.items() if sha1 in kept}
+    _write_compressed_manifest(html_dir, {"version": 1, "encodings": encodings, "files": files, "cache": cache})
+    _prune_cache(cache_dir, cache)
+
+    return len(to_compress), reused
@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+
+import collections
+import errno
+import itertools
+import json
+import os
+import socket
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from .utils import mkdir_p
+
+# Number of finished jobs reported by the "status" action
+FINISHED_JOBS_HISTORY = 100
+
+
+class Job(object):
+    """Invocation of the builder cli with ``argv`` from ``cwd`` for the ref identified by ``key``."""
+
+    def __init__(self, job_id, key, argv, sha=None, cwd=None):
+        self.job_id = job_id
+        self.key = key
+        self.argv = list(argv)
+        self.sha = sha
+        self.cwd = cwd
+        self.state = "queued"
+        self.returncode = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.log_file = None
+
+    def to_dict(self):
+        return {
+            "id": self.job_id,
+            "key": list(self.key),
+            "sha": self.sha,
+            "cwd": self.cwd,
+            "state": self.state,
+            "returncode": self.returncode,
+            "submitted": self.submitted,
+            "started": self.started,
+            "finished": self.finished,
+            "log_file": self.log_file,
+        }
+
+
+class JobQueue(object):
+    """Queue running jobs using a bounded pool of workers.
+
+    At most one job per key (e.g ``(slicer_repo_name, branch_or_tag)``) is
+    running and at most one is pending: submitting a job while another one
+    is pending for the same key supersedes it, the newest submission being
+    the only one worth building. Jobs associated with different keys run
+    in parallel using up to ``max_workers`` workers.
+
+    ``run_job`` is called with the :class:`Job` and returns its exit code.
+    """
+
+    def __init__(self, run_job, max_workers=1):
+        self._run_job = run_job
+        self._max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._pending = collections.OrderedDict()
+        self._running = {}
+        self._finished = collections.deque(maxlen=FINISHED_JOBS_HISTORY)
+
+    def submit(self, key, argv, sha=None, cwd=None):
+        """Queue a job and return ``(job, outcome)``.
+
+        ``outcome`` is ``"queued"``, ``"coalesced"`` if a pending job for the
+        same key was superseded or ``"duplicate"`` if a job for the same
+        key and ``sha`` is already pending or running.
+        """
+        key = tuple(key)
+        with self._lock:
+            for existing in (self._pending.get(key), self._running.get(key)):
+                if existing is not None and sha is not None and existing.sha == sha:
+                    return existing, "duplicate"
+            outcome = "queued"
+            superseded = self._pending.pop(key, None)
+            if superseded is not None:
+                superseded.state = "superseded"
+                superseded.finished = time.time()
+                self._finished.append(superseded)
+                outcome = "coalesced"
+            job = Job(next(self._ids), key, argv, sha, cwd)
+            self._pending[key] = job
+        self._dispatch()
+        return job, outcome
+
+    def _dispatch(self):
+        with self._lock:
+            for key in list(self._pending):
+                if len(self._running) >= self._max_workers:
+                    break
+                if key in self._running:
+                    continue
+                job = self._pending.pop(key)
+                job.state = "running"
+                job.started = time.time()
+                self._running[key] = job
+                self._executor.submit(self._run, job)
+
+    def _run(self, job):
+        try:
+            returncode = self._run_job(job)
+        except Exception as exc_info:  # Keep the worker alive
+            print("Job %s failed: %s" % (job.job_id, exc_info))
+            returncode = -1
+        with self._lock:
+            job.returncode = returncode
+            job.state = "succeeded" if returncode == 0 else "failed"
+            job.finished = time.time()
+            del self._running[job.key]
+            self._finished.append(job)
+        self._dispatch()
+
+    def status(self):
+        with self._lock:
+            return {
+                "running": [job.to_dict() for job in self._running.values()],
+                "pending": [job.to_dict() for job in self._pending.values()],
+                "finished": [job.to_dict() for job in self._finished],
+            }
+
+    def shutdown(self, wait=True):
+        """Drop pending jobs and wait for the running ones to complete."""
+        with self._lock:
+            for job in self._pending.values():
+                job.state = "cancelled"
+                job.finished = time.time()
+                self._finished.append(job)
+            self._pending.clear()
+        self._executor.shutdown(wait=wait)
+
+
+def cli_job_runner(log_dir):
+    """Return a ``run_job`` function executing the builder cli in a subprocess.
+
+    The output of each job is written into ``<log_dir>/job-<id>.log``.
+    """
+    mkdir_p(log_dir)
+
+    def run_job(job):
+        job.log_file = os.path.join(log_dir, "job-%d.log" % job.job_id)
+        with open(job.log_file, "w") as log:
+            return subprocess.call(
+                [sys.executable, "-m", "slicer_apidocs_builder"] + job.argv,
+                stdout=log, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL, cwd=job.cwd)
+
+    return run_job
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            # Connection closed without request (see _remove_stale_socket)
+            return
+        try:
+            request = json.loads(line.decode("utf-8"))
+            response = self.server.handle_request_dict(request)
+        except (ValueError, KeyError, TypeError) as exc_info:
+            response = {"error": "invalid request: %s" % exc_info}
+        self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+
+
+def _remove_stale_socket(socket_path):
+    """Remove ``socket_path`` if it is left by a daemon that is no longer running.
+
+    Raise :class:`OSError` (``EADDRINUSE``) if a daemon is listening on it.
+    """
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(socket_path)
+    except OSError as exc_info:
+        if exc_info.errno == errno.ENOENT:
+            return
+        if exc_info.errno != errno.ECONNREFUSED:
+            raise
+        os.remove(socket_path)
+        return
+    finally:
+        client.close()
+    raise OSError(errno.EADDRINUSE, "Apidocs daemon already listening", socket_path)
+
+
+class DaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Server accepting one JSON request per connection on a unix socket.
+
+    Supported actions are ``submit`` (with ``key``, ``argv`` and optional
+    ``sha`` and ``cwd``), ``status`` and ``shutdown``.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path, queue):
+        self.queue = queue
+        _remove_stale_socket(socket_path)
+        socketserver.UnixStreamServer.__init__(self, socket_path, _RequestHandler)
+
+    def handle_request_dict(self, request):
+        action = request["action"]
+        if action == "submit":
+            job, outcome = self.queue.submit(
+                request["key"], request["argv"], request.get("sha"), request.get("cwd"))
+            return {"job": job.to_dict(), "outcome": outcome}
+        elif action == "status":
+            return self.queue.status()
+        elif action == "shutdown":
+            threading.Thread(target=self.shutdown).start()
+            return {"outcome": "stopping"}
+        return {"error": "unknown action: %s" % action}
+
+
+def serve(socket_path, max_workers=1, log_dir=None):
+    """Run the build daemon listening on ``socket_path`` until it is shut down."""
+    if log_dir is None:
+        log_dir = socket_path + "-logs"
+    queue = JobQueue(cli_job_runner(log_dir), max_workers=max_workers)
+    server = DaemonServer(socket_path, queue)
+    print("\nApidocs daemon listening on %s (workers: %d, logs: %s)" % (socket_path, max_workers, log_dir))
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        queue.shutdown()
+
+
+def send_request(socket_path, request, timeout=30):
+    """Send ``request`` to the daemon listening on ``socket_path`` and return its response."""
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.settimeout(timeout)
+    try:
+        client.connect(socket_path)
+        client.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        with client.makefile("rb") as fp:
+            return json.loads(fp.readline().decode("utf-8"))
+    finally:
+        client.close()
+
+
+def strip_option(argv, option, has_value=True):
+    """Return ``argv`` without ``option`` (and its value)."""
+    stripped = []
+    skip_next = False
+    for arg in argv:
+        if skip_next:
+            skip_next = False
+            continue
+        if arg == option:
+            skip_next = has_value
+            continue
+        if has_value and arg.startswith(option + "="):
+            continue
+        stripped.append(arg)
+    return stripped
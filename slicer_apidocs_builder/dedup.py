@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import json
+import os
+import posixpath
+import re
+import shutil
+
+from .compress import SIDECAR_EXTENSIONS, discard_compressed_entries, refresh_compressed_entries
+from .utils import mkdir_p
+
+# Directory of the publishing repository holding the assets shared by several subdirs
+SHARED_DIR = "_shared"
+
+# Manifest mapping the shared assets referenced by an html tree to their original path.
+# It is published along with the tree so that unused shared assets can be identified.
+SHARED_MANIFEST_FILENAME = "apidocs-shared.json"
+
+# Extensions of the static assets that may be shared. SVG files are excluded
+# because their links are relative to their own location.
+SHARED_EXTENSIONS = (".png", ".gif", ".jpg", ".jpeg", ".ico", ".js", ".css", ".woff", ".woff2", ".ttf", ".eot")
+
+_PAGE_REFERENCE = re.compile(rb'(\s(?:src|href)=")([^"#?:]+)((?:[#?][^"]*)?")')
+
+_SCRIPT_REFERENCE = re.compile(rb"[\w.-]+\.(?:%s)" % b"|".join(
+    re.escape(extension[1:].encode("utf-8")) for extension in SHARED_EXTENSIONS))
+
+_STYLESHEET_RELATIVE_URL = re.compile(rb"url\(\s*['\"]?(?!data:|https?:|/)")
+
+
+def git_blob_id(path):
+    """Return the id of the git blob storing the content of ``path``."""
+    with open(path, "rb") as fp:
+        content = fp.read()
+    return hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+
+
+def shared_asset_path(blob_id, extension):
+    """Return the path of a shared asset relative to the root of the publishing repository."""
+    return "%s/%s/%s%s" % (SHARED_DIR, blob_id[:2], blob_id[2:], extension)
+
+
+def read_shared_manifest(html_dir):
+    try:
+        with open(os.path.join(html_dir, SHARED_MANIFEST_FILENAME)) as fp:
+            return json.load(fp)["files"]
+    except (IOError, OSError, ValueError, KeyError):
+        return {}
+
+
+def _walk(html_dir, extensions):
+    for dirpath, _, filenames in os.walk(html_dir):
+        rel_dir = os.path.relpath(dirpath, html_dir).replace(os.sep, "/")
+        for filename in filenames:
+            if filename.endswith(extensions):
+                yield filename if rel_dir == "." else rel_dir + "/" + filename
+
+
+def _page_references(html_dir, page):
+    """Return ``(references, shared)`` where ``references`` are the asset paths (relative
+    to ``html_dir``) referenced by ``page`` using src or href and ``shared`` are the
+    referenced shared assets."""
+    with open(os.path.join(html_dir, page), "rb") as fp:
+        content = fp.read()
+    page_dir = posixpath.dirname(page)
+    references, shared = set(), set()
+    for match in _PAGE_REFERENCE.finditer(content):
+        value = match.group(2).decode("utf-8", "replace")
+        target = posixpath.normpath(posixpath.join(page_dir, value))
+        if "/%s/" % SHARED_DIR in "/" + value:
+            shared.add(value[value.index(SHARED_DIR + "/"):])
+        elif target.endswith(SHARED_EXTENSIONS) and not target.startswith("../"):
+            references.add(target)
+    return references, shared
+
+
+def _script_names(html_dir):
+    """Return the asset names found in stylesheets and scripts.
+
+    These assets are looked up relative to the stylesheet or built at runtime
+    and can not be moved.
+    """
+    names = set()
+    for path in _walk(html_dir, (".css", ".js")):
+        with open(os.path.join(html_dir, path), "rb") as fp:
+            names.update(name.decode("utf-8") for name in _SCRIPT_REFERENCE.findall(fp.read()))
+    return names
+
+
+def _is_movable(html_dir, path, script_names):
+    if posixpath.basename(path) in script_names:
+        return False
+    if path.endswith(".css"):
+        with open(os.path.join(html_dir, path), "rb") as fp:
+            if _STYLESHEET_RELATIVE_URL.search(fp.read()):
+                return False
+    return True
+
+
+def _rewrite_page(html_dir, page, publish_subdir, moved):
+    page_path = os.path.join(html_dir, page)
+    page_dir = posixpath.dirname(page)
+    published_dir = posixpath.dirname(posixpath.join(publish_subdir, page))
+
+    def _replace(match):
+        target = posixpath.normpath(posixpath.join(page_dir, match.group(2).decode("utf-8", "replace")))
+        if target not in moved:
+            return match.group(0)
+        relative = posixpath.relpath(moved[target], published_dir)
+        return match.group(1) + relative.encode("utf-8") + match.group(3)
+
+    with open(page_path, "rb") as fp:
+        content = fp.read()
+    rewritten = _PAGE_REFERENCE.sub(_replace, content)
+    if rewritten == content:
+        return False
+    with open(page_path, "wb") as fp:
+        fp.write(rewritten)
+    return True
+
+
+def dedup_html_tree(html_dir, publish_subdir, shared_blob_ids, store_dir):
+    """Move the assets of ``html_dir`` whose content is also published elsewhere
+    into the shared content-addressed asset directory.
+
+    ``shared_blob_ids`` is the set of git blob ids of the files published
+    outside of ``publish_subdir``. Only assets referenced from html pages
+    using ``src`` or ``href`` attributes, and not mentioned in stylesheets or
+    scripts, are moved. References are rewritten relative to the location of
+    the pages once published into ``publish_subdir``.
+
+    Moved assets (and their compressed sidecars) are stored into ``store_dir``
+    using their shared path (see :func:`shared_asset_path`) so that they can
+    be copied into the publishing repository by later runs. Sidecars of the
+    rewritten pages are written again (see :func:`refresh_compressed_entries`).
+
+    Return the dictionary mapping each shared asset referenced by the tree
+    to its original path. The mapping is also saved into the tree.
+    """
+    pages, referenced_shared = {}, set()
+    for page in _walk(html_dir, (".html",)):
+        pages[page], shared = _page_references(html_dir, page)
+        referenced_shared.update(shared)
+    candidates = set().union(*pages.values()) if pages else set()
+    candidates = sorted(path for path in candidates if os.path.isfile(os.path.join(html_dir, path)))
+    script_names = _script_names(html_dir) if candidates else set()
+
+    moved = {}
+    for path in candidates:
+        if not _is_movable(html_dir, path, script_names):
+            continue
+        source = os.path.join(html_dir, path)
+        blob_id = git_blob_id(source)
+        if blob_id not in shared_blob_ids:
+            continue
+        shared_path = shared_asset_path(blob_id, posixpath.splitext(path)[1])
+        for extension in [""] + list(SIDECAR_EXTENSIONS.values()):
+            if not os.path.exists(source + extension):
+                continue
+            destination = os.path.join(store_dir, shared_path + extension)
+            mkdir_p(os.path.dirname(destination))
+            shutil.move(source + extension, destination)
+        moved[path] = shared_path
+
+    rewritten = [page for page, references in pages.items()
+                 if references & set(moved) and _rewrite_page(html_dir, page, publish_subdir, moved)]
+    discard_compressed_entries(html_dir, moved)
+    # Sidecars of the rewritten pages would still reference the moved assets
+    refresh_compressed_entries(html_dir, rewritten)
+
+    # Entries of assets shared by an earlier run are kept while still referenced
+    shared = {shared_path: path for shared_path, path in read_shared_manifest(html_dir).items()
+              if shared_path in referenced_shared}
+    shared.update({shared_path: path for path, shared_path in moved.items()})
+    with open(os.path.join(html_dir, SHARED_MANIFEST_FILENAME), "w") as fp:
+        json.dump({"version": 1, "files": shared}, fp, indent=1, sort_keys=True)
+    return shared
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+
+import collections
+import re
+import shlex
+import subprocess
+
+from .utils import execute
+
+# Location of the Doxygen configuration in the Slicer source tree
+DOXYGEN_CONFIG_DIR = "Utilities/Doxygen"
+
+# Doxygen options whose values are paths read while generating the documentation.
+DOXYGEN_PATH_OPTIONS = [
+    "INPUT",
+    "IMAGE_PATH",
+    "EXAMPLE_PATH",
+    "INCLUDE_PATH",
+    "HTML_HEADER",
+    "HTML_FOOTER",
+    "HTML_STYLESHEET",
+    "HTML_EXTRA_STYLESHEET",
+    "HTML_EXTRA_FILES",
+    "LAYOUT_FILE",
+    "USE_MDFILE_AS_MAINPAGE",
+]
+
+# Paths always read: the top-level CMakeLists.txt provides the version
+# and the Doxygen configuration is added as a CMake subdirectory.
+ALWAYS_READ_PATHS = ["CMakeLists.txt", DOXYGEN_CONFIG_DIR]
+
+_SOURCE_DIR_PREFIX = re.compile(r"^(@Slicer_SOURCE_DIR@|\$\{Slicer_SOURCE_DIR\})/?")
+
+
+def parse_doxyfile(text):
+    """Parse a Doxygen configuration and return an ordered dictionary
+    mapping each option to its list of values.
+
+    Line continuations, ``+=`` assignments and quoted values are supported.
+    """
+    config = collections.OrderedDict()
+    logical_line = ""
+    for line in text.splitlines():
+        line = line.strip()
+        if line.endswith("\\"):
+            logical_line += line[:-1] + " "
+            continue
+        logical_line += line
+        line, logical_line = logical_line.strip(), ""
+        if not line or line.startswith("#"):
+            continue
+        match = re.match(r"^([A-Z_][A-Z0-9_]*)\s*(\+?=)\s*(.*)$", line)
+        if match is None:
+            continue
+        option, operator, value = match.groups()
+        try:
+            values = shlex.split(value, comments=False)
+        except ValueError:
+            values = value.split()
+        if operator == "+=":
+            config.setdefault(option, []).extend(values)
+        else:
+            config[option] = values
+    return config
+
+
+def _quote_value(value):
+    if not value or any(char.isspace() for char in value):
+        return '"%s"' % value
+    return value
+
+
+def format_doxyfile(config, include=None):
+    """Return the text of the Doxygen configuration mapping each option of
+    ``config`` to its list of values.
+
+    If ``include`` is specified, the configuration starts by including it so
+    that ``config`` only lists the options to override.
+    """
+    lines = ["@INCLUDE = %s" % _quote_value(include)] if include else []
+    for option, values in config.items():
+        lines.append(("%s = %s" % (option, " ".join(_quote_value(value) for value in values))).rstrip())
+    return "\n".join(lines) + "\n"
+
+
+def source_paths_from_doxyfile(config):
+    """Return the sorted list of paths relative to the Slicer source tree
+    referenced by the path options of a Doxygen configuration template.
+
+    Paths located outside of the source tree (e.g in the build tree) are ignored.
+    """
+    paths = set()
+    for option in DOXYGEN_PATH_OPTIONS:
+        for value in config.get(option, []):
+            path, count = _SOURCE_DIR_PREFIX.subn("", value)
+            if not count:
+                continue
+            path = path.strip("/")
+            if path and "@" not in path and "$" not in path:
+                paths.add(path)
+    return sorted(paths)
+
+
+def documented_input_paths(repo_dir, revision="HEAD"):
+    """Return the paths of the Slicer source tree read when generating the
+    documentation of ``revision``, or None if no Doxygen configuration template
+    is found.
+
+    The configuration templates are read using git so that this works with
+    bare repositories, partial clones and sparse checkouts.
+    """
+    try:
+        names = execute(
+            ["git", "-C", repo_dir, "ls-tree", "--name-only", revision, DOXYGEN_CONFIG_DIR + "/"],
+            capture=True, verbose=False).split()
+    except subprocess.CalledProcessError:
+        return None
+    doxyfiles = [name for name in names if re.match(r".*/Doxyfile[^/]*\.in$", name)]
+    if not doxyfiles:
+        return None
+    paths = set(ALWAYS_READ_PATHS)
+    for doxyfile in doxyfiles:
+        text = execute(
+            ["git", "-C", repo_dir, "show", "%s:%s" % (revision, doxyfile)],
+            capture=True, verbose=False)
+        paths.update(source_paths_from_doxyfile(parse_doxyfile(text)))
+    return sorted(paths)
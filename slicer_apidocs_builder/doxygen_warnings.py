@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+
+import collections
+import json
+import os
+import re
+
+# Index of the warnings written alongside the generated html
+WARNINGS_INDEX_FILENAME = "apidocs-warnings.json"
+
+# Comparison of the index with the one previously published for the same subdir
+WARNINGS_DIFF_FILENAME = "apidocs-warnings-diff.json"
+
+_WARNING_LINE = re.compile(
+    r"(?:(?P<file>[^\s:][^:]*?):(?P<line>[0-9]+):\s*)?(?P<severity>warning|error):\s*(?P<message>.*)$")
+
+# (kind, pattern) used to classify warning messages. First match wins.
+WARNING_KINDS = [
+    ("parameter", re.compile(r"argument '.*' of command @param|parameters? of (member )?.* (is|are) not")),
+    ("undocumented", re.compile(r"is not documented|not documented")),
+    ("unknown-command", re.compile(r"[Ff]ound unknown command")),
+    ("unresolved-reference", re.compile(r"unable to resolve reference|link request .* could not be resolved")),
+    ("unsupported-tag", re.compile(r"[Uu]nsupported xml/html tag")),
+    ("no-matching-member", re.compile(r"no (uniquely )?matching (class )?member found")),
+    ("duplicate", re.compile(r"multiple use of section label|already (defined|documented)")),
+]
+
+
+def classify_warning(message):
+    for kind, pattern in WARNING_KINDS:
+        if pattern.search(message):
+            return kind
+    return "other"
+
+
+class DoxygenWarningCollector(object):
+    """Parse Doxygen output line by line and collect its warnings.
+
+    Instances are meant to be used as ``output_callback`` of a streamed
+    :func:`execute`. File paths are made relative to ``source_dir``.
+    Indented lines following a warning are appended to its message.
+    """
+
+    def __init__(self, source_dir=None):
+        self.source_prefix = os.path.abspath(source_dir).rstrip("/") + "/" if source_dir else None
+        self.warnings = []
+        self._last = None
+
+    def __call__(self, line):
+        line = line.rstrip("\n")
+        if self._last is not None and line[:1].isspace() and line.strip():
+            self._last[3] += " " + line.strip()
+            return
+        self._last = None
+        match = _WARNING_LINE.search(line)
+        if match is None:
+            return
+        path = match.group("file") or ""
+        if self.source_prefix and self.source_prefix in path:
+            path = path[path.index(self.source_prefix) + len(self.source_prefix):]
+        self._last = [path, int(match.group("line") or 0), match.group("severity"), match.group("message").strip()]
+        self.warnings.append(self._last)
+
+    def index(self):
+        """Return the warnings as a dictionary keyed by file.
+
+        Each file maps to a list of ``[line, kind, message]`` sorted by line.
+        """
+        files = collections.defaultdict(list)
+        by_kind = collections.Counter()
+        for path, line, severity, message in self.warnings:
+            kind = classify_warning(message) if severity == "warning" else "error"
+            by_kind[kind] += 1
+            files[path].append([line, kind, message])
+        return {
+            "version": 1,
+            "count": len(self.warnings),
+            "by_kind": dict(sorted(by_kind.items())),
+            "files": {path: sorted(entries) for path, entries in sorted(files.items())},
+        }
+
+
+def write_warning_index(path, index):
+    with open(path, "w") as fp:
+        json.dump(index, fp, separators=(",", ":"), sort_keys=True)
+
+
+def _read_json(path):
+    try:
+        with open(path) as fp:
+            return json.load(fp)
+    except (IOError, OSError, ValueError):
+        return None
+
+
+def read_warning_index(path):
+    """Return the index stored in ``path`` or None if it does not exist."""
+    return _read_json(path)
+
+
+def read_warning_summary(path):
+    """Return the summary (see :func:`diff_warning_indexes`) stored in ``path``
+    or None if it does not exist."""
+    return _read_json(path)
+
+
+def _warning_keys(index):
+    # Line numbers are ignored: they change each time code is added above a warning.
+    return collections.Counter(
+        (path, kind, message)
+        for path, entries in index.get("files", {}).items()
+        for _, kind, message in entries)
+
+
+def diff_warning_indexes(previous, current):
+    """Compare two warning indexes and return a summary dictionary.
+
+    ``new`` and ``fixed`` list ``[file, kind, message]`` entries. If
+    ``previous`` is None, every warning is reported as new.
+    """
+    previous_keys = _warning_keys(previous or {})
+    current_keys = _warning_keys(current)
+    new = sorted((current_keys - previous_keys).elements())
+    fixed = sorted((previous_keys - current_keys).elements())
+    return {
+        "total": current.get("count", 0),
+        "previous_total": previous.get("count", 0) if previous else None,
+        "new_count": len(new),
+        "fixed_count": len(fixed),
+        "new": [list(entry) for entry in new],
+        "fixed": [list(entry) for entry in fixed],
+    }
+
+
+def format_warning_summary(summary):
+    """Return a short description like ``3 new warnings, 1 fixed``."""
+    text = "%d new warning%s" % (summary["new_count"], "" if summary["new_count"] == 1 else "s")
+    if summary["fixed_count"]:
+        text += ", %d fixed" % summary["fixed_count"]
+    return text
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+
+from .doxyfile import documented_input_paths
+from .utils import execute
+
+# Paths (relative to the Slicer source tree) read while generating the
+# documentation: directories listed in the Doxygen INPUT, the Doxygen
+# configuration itself and the top-level CMakeLists.txt providing the version.
+# Used when the paths can not be derived from the Doxygen configuration template.
+DOXYGEN_INPUT_PATHS = [
+    "Applications",
+    "Base",
+    "CMakeLists.txt",
+    "Docs",
+    "Extensions",
+    "Libs",
+    "Modules",
+    "Utilities/Doxygen",
+]
+
+FINGERPRINT_FILENAME = "apidocs-fingerprint.json"
+
+# Fingerprint of the inputs of the last successful CMake configuration
+CONFIGURE_FINGERPRINT_FILENAME = "apidocs-configure.json"
+
+# Paths (relative to the Slicer source tree) read while configuring the apidocs project
+CONFIGURE_INPUT_PATHS = [
+    "Utilities/Doxygen",
+]
+
+
+def _git_object_ids(slicer_repo_dir, revision, paths):
+    """Return a dictionary mapping each of the ``paths`` found in ``revision``
+    to its blob or tree hash."""
+    output = execute(
+        ["git", "-C", slicer_repo_dir, "ls-tree", "--full-tree", revision, "--"] + list(paths),
+        capture=True, verbose=False)
+    object_ids = {}
+    for line in output.splitlines():
+        info, path = line.split("\t", 1)
+        object_ids[path] = info.split()[2]
+    return object_ids
+
+
+def _doxygen_version():
+    doxygen_executable = shutil.which("doxygen")
+    if doxygen_executable is None:
+        return None
+    try:
+        return execute([doxygen_executable, "--version"], capture=True, verbose=False).strip()
+    except subprocess.CalledProcessError:
+        return None
+
+
+def compute_build_fingerprint(slicer_repo_dir, version, apidocs_cmakelists, cmake_args=(),
+                              revision="HEAD", input_paths=None, options=None):
+    """Return ``(fingerprint, inputs)`` identifying a documentation build.
+
+    The fingerprint is a hash of the git object ids of the documented
+    ``input_paths`` (default: paths referenced by the Doxygen configuration
+    template or :data:`DOXYGEN_INPUT_PATHS`), the Slicer ``version``, the
+    apidocs CMake project, the extra ``cmake_args``, the build ``options``
+    affecting the output and the Doxygen version.
+    """
+    if input_paths is None:
+        input_paths = documented_input_paths(slicer_repo_dir, revision) or DOXYGEN_INPUT_PATHS
+    with open(apidocs_cmakelists, "rb") as fp:
+        apidocs_cmakelists_sha1 = hashlib.sha1(fp.read()).hexdigest()
+    inputs = {
+        "sources": _git_object_ids(slicer_repo_dir, revision, input_paths),
+        "version": version,
+        "apidocs_cmakelists": apidocs_cmakelists_sha1,
+        "cmake_args": list(cmake_args),
+        "options": options or {},
+        "doxygen": _doxygen_version(),
+    }
+    fingerprint = hashlib.sha1(json.dumps(inputs, sort_keys=True).encode("utf-8")).hexdigest()
+    return fingerprint, inputs
+
+
+def compute_configure_fingerprint(slicer_repo_dir, version, apidocs_src_dir, apidocs_cmakelists,
+                                  cmake_args=(), revision="HEAD"):
+    """Return ``(fingerprint, inputs)`` identifying the CMake configuration of the apidocs project.
+
+    The fingerprint is a hash of the Slicer source and apidocs source
+    directories, the Slicer ``version``, the apidocs CMake project, the
+    extra ``cmake_args``, the git object ids of :data:`CONFIGURE_INPUT_PATHS`
+    and the location of the tools found by CMake.
+    """
+    with open(apidocs_cmakelists, "rb") as fp:
+        apidocs_cmakelists_sha1 = hashlib.sha1(fp.read()).hexdigest()
+    inputs = {
+        "slicer_repo_dir": os.path.abspath(slicer_repo_dir),
+        "apidocs_src_dir": os.path.abspath(apidocs_src_dir),
+        "sources": _git_object_ids(slicer_repo_dir, revision, CONFIGURE_INPUT_PATHS),
+        "version": version,
+        "apidocs_cmakelists": apidocs_cmakelists_sha1,
+        "cmake_args": list(cmake_args),
+        "tools": {name: shutil.which(name) for name in ["cmake", "doxygen", "dot"]},
+    }
+    fingerprint = hashlib.sha1(json.dumps(inputs, sort_keys=True).encode("utf-8")).hexdigest()
+    return fingerprint, inputs
+
+
+def read_build_fingerprint(apidocs_build_dir, filename=FINGERPRINT_FILENAME):
+    """Return the fingerprint of the last successful build (or configuration) or None."""
+    try:
+        with open(os.path.join(apidocs_build_dir, filename)) as fp:
+            return json.load(fp)["fingerprint"]
+    except (IOError, OSError, ValueError, KeyError):
+        return None
+
+
+def write_build_fingerprint(apidocs_build_dir, fingerprint, inputs, filename=FINGERPRINT_FILENAME):
+    with open(os.path.join(apidocs_build_dir, filename), "w") as fp:
+        json.dump({"fingerprint": fingerprint, "inputs": inputs}, fp, indent=2, sort_keys=True)
+
+
+def clear_build_fingerprint(apidocs_build_dir, filename=FINGERPRINT_FILENAME):
+    path = os.path.join(apidocs_build_dir, filename)
+    if os.path.exists(path):
+        os.remove(path)
@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import http.client
+import json
+import os
+import queue
+import select
+import time
+import urllib.parse
+
+from concurrent.futures import ThreadPoolExecutor
+
+GITHUB_API_URL = os.environ.get("GITHUB_API_URL", "https://api.github.com")
+
+# Maximum duration (in seconds) to wait for the rate limit to be reset
+MAX_RATE_LIMIT_WAIT = 120
+
+# Number of attempts for requests failing because of rate limits or server errors
+REQUEST_ATTEMPTS = 3
+
+_RETRIED_STATUSES = (502, 503, 504)
+
+# Methods whose requests may be sent twice without side effect
+_IDEMPOTENT_METHODS = ("GET", "HEAD")
+
+
+class GitHubAPIError(Exception):
+    """Raised when the GitHub API returns an unexpected status."""
+
+    def __init__(self, status, method, path, message):
+        super(GitHubAPIError, self).__init__("%s %s: %s %s" % (method, path, status, message))
+        self.status = status
+
+
+class _ConnectionPool(object):
+    """Pool of persistent HTTP connections to the host of ``api_url``.
+
+    Connections are kept alive between requests and reused by the worker threads.
+    """
+
+    def __init__(self, api_url, timeout=30):
+        parsed = urllib.parse.urlsplit(api_url)
+        self._connection_class = (
+            http.client.HTTPSConnection if parsed.scheme == "https" else http.client.HTTPConnection)
+        self._netloc = parsed.netloc
+        self._base_path = parsed.path.rstrip("/")
+        self._timeout = timeout
+        self._idle = queue.LifoQueue()
+        self.opened = 0
+
+    def _connection(self):
+        """Return ``(connection, reused)``. Idle connections closed by the server are discarded."""
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                self.opened += 1
+                return self._connection_class(self._netloc, timeout=self._timeout), False
+            # An idle connection is readable only if the server closed it
+            if connection.sock is not None and not select.select([connection.sock], [], [], 0)[0]:
+                return connection, True
+            connection.close()
+
+    def request(self, method, path, body=None, headers=None):
+        """Return ``(status, headers, data)``. Blocking.
+
+        If a reused connection fails, the request is sent again using a new
+        connection, unless it was sent and is not idempotent: a ``POST`` may
+        have been processed by the server (e.g a status would be created twice).
+        """
+        connection, reused = self._connection()
+        sent = False
+        try:
+            connection.request(method, self._base_path + path, body=body, headers=headers or {})
+            sent = True
+            response = connection.getresponse()
+            data = response.read()
+        except (http.client.HTTPException, OSError):
+            connection.close()
+            if not reused or (sent and method not in _IDEMPOTENT_METHODS):
+                raise
+            # The server closed the idle connection, retry with a new one.
+            return self.request(method, path, body, headers)
+        if response.will_close:
+            connection.close()
+        else:
+            self._idle.put(connection)
+        return response.status, {key.lower(): value for key, value in response.getheaders()}, data
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+class GitHubClient(object):
+    """Asynchronous client of the GitHub REST API.
+
+    Requests are sent over a pool of at most ``max_connections`` persistent
+    connections. ``GET`` responses are cached along with their ``ETag`` and
+    revalidated using conditional requests, which do not count against the
+    rate limit. When the rate limit is exhausted, requests wait until it is
+    reset (up to :data:`MAX_RATE_LIMIT_WAIT` seconds).
+    """
+
+    def __init__(self, token, api_url=GITHUB_API_URL, max_connections=4, user_agent="slicer-apidocs-builder"):
+        self._headers = {
+            "Accept": "application/vnd.github+json",
+            "Authorization": "token %s" % token,
+            "User-Agent": user_agent,
+        }
+        self._pool = _ConnectionPool(api_url)
+        self._executor = ThreadPoolExecutor(max_workers=max_connections)
+        self._max_connections = max_connections
+        self._semaphore = None
+        self._etags = {}
+        self._refs = {}
+        self.rate_limit = {}
+        self.requests = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self._pool.close()
+
+    def _update_rate_limit(self, headers):
+        for name in ["limit", "remaining", "reset"]:
+            value = headers.get("x-ratelimit-" + name)
+            if value is not None:
+                self.rate_limit[name] = int(value)
+
+    def _rate_limit_delay(self, status=None, headers=None):
+        """Return the number of seconds to wait before sending the next request."""
+        headers = headers or {}
+        if status in (403, 429) and "retry-after" in headers:
+            return float(headers["retry-after"])
+        if self.rate_limit.get("remaining") == 0 and (status in (None, 403, 429)):
+            return max(0.0, self.rate_limit.get("reset", 0) - time.time())
+        return 0.0
+
+    async def _wait(self, delay, reason):
+        if delay > MAX_RATE_LIMIT_WAIT:
+            raise GitHubAPIError(403, "", "", "%s: retry in %ds" % (reason, delay))
+        if delay > 0:
+            print("\nGitHub API %s: waiting %.1fs" % (reason, delay))
+            await asyncio.sleep(delay)
+
+    async def request(self, method, path, payload=None):
+        """Send a request and return ``(status, data)`` where ``data`` is the decoded JSON body.
+
+        Only ``2xx``, ``304`` (returned as ``200`` with the cached data) and
+        ``404`` statuses are returned, :class:`GitHubAPIError` is raised otherwise.
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._max_connections)
+        headers = dict(self._headers)
+        body = None
+        if payload is not None:
+            body = json.dumps(payload).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+        cached = self._etags.get(path) if method == "GET" else None
+        if cached is not None:
+            headers["If-None-Match"] = cached[0]
+
+        loop = asyncio.get_running_loop()
+        for attempt in range(1, REQUEST_ATTEMPTS + 1):
+            await self._wait(self._rate_limit_delay(), "rate limit exhausted")
+            async with self._semaphore:
+                status, response_headers, data = await loop.run_in_executor(
+                    self._executor, self._pool.request, method, path, body, headers)
+            self.requests += 1
+            self._update_rate_limit(response_headers)
+            if status == 304 and cached is not None:
+                return 200, cached[1]
+            if 200 <= status < 300 or status == 404:
+                result = json.loads(data.decode("utf-8")) if data else None
+                if method == "GET" and status == 200 and "etag" in response_headers:
+                    self._etags[path] = (response_headers["etag"], result)
+                return status, result
+            if attempt == REQUEST_ATTEMPTS:
+                break
+            if status in _RETRIED_STATUSES:
+                await self._wait(2 ** attempt, "server error %d" % status)
+                continue
+            delay = self._rate_limit_delay(status, response_headers)
+            if status in (403, 429) and (delay > 0 or self.rate_limit.get("remaining") == 0):
+                await self._wait(delay, "rate limit exceeded")
+                continue
+            break
+        raise GitHubAPIError(status, method, path, data.decode("utf-8", "replace")[:200])
+
+    async def ref_sha(self, repo_name, ref):
+        """Return the SHA of ``ref`` (e.g ``heads/main`` or ``tags/v5.6.1``) or None if
+        it does not exist. Lookups are cached for the lifetime of the client.
+        """
+        key = (repo_name, ref)
+        if key not in self._refs:
+            self._refs[key] = asyncio.ensure_future(self._ref_sha(repo_name, ref))
+        return await self._refs[key]
+
+    async def _ref_sha(self, repo_name, ref):
+        status, data = await self.request(
+            "GET", "/repos/%s/git/ref/%s" % (repo_name, urllib.parse.quote(ref)))
+        if status == 404 or not isinstance(data, dict):
+            return None
+        return data["object"]["sha"]
+
+    async def create_status(self, repo_name, sha, state, target_url=None, description=None, context=None):
+        """Create a commit status and return its description returned by GitHub."""
+        payload = {"state": state}
+        for name, value in [("target_url", target_url), ("description", description), ("context", context)]:
+            if value is not None:
+                payload[name] = value
+        status, data = await self.request("POST", "/repos/%s/statuses/%s" % (repo_name, sha), payload)
+        if status == 404:
+            raise GitHubAPIError(status, "POST", "/repos/%s/statuses/%s" % (repo_name, sha), "not found")
+        return data
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import sys
+import threading
+import time
+
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None
+
+
+def _rusage(children=False):
+    if resource is None:  # pragma: no cover
+        return 0.0, 0, 0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    max_rss_kb = usage.ru_maxrss
+    if sys.platform == "darwin":
+        max_rss_kb //= 1024
+    # ru_oublock is expressed in 512-byte blocks
+    return usage.ru_utime + usage.ru_stime, max_rss_kb, usage.ru_oublock * 512
+
+
+def _self_bytes_written():
+    """Return bytes written by the current process (including buffered writes) if available."""
+    try:
+        with open("/proc/self/io") as fp:
+            for line in fp:
+                if line.startswith("wchar:"):
+                    return int(line.split()[1])
+    except (IOError, OSError):
+        pass
+    return None
+
+
+def _sample():
+    self_cpu, self_max_rss_kb, self_block_bytes = _rusage()
+    children_cpu, children_max_rss_kb, children_block_bytes = _rusage(children=True)
+    self_bytes = _self_bytes_written()
+    return {
+        "wall": time.perf_counter(),
+        "cpu_self": self_cpu,
+        "cpu_children": children_cpu,
+        "max_rss_self_kb": self_max_rss_kb,
+        "max_rss_children_kb": children_max_rss_kb,
+        "bytes_written_self": self_bytes if self_bytes is not None else self_block_bytes,
+        "bytes_written_children": children_block_bytes,
+    }
+
+
+class RunReport(object):
+    """Collect timing and resource usage of the phases of a run.
+
+    Spans may be nested. Each span records its wall time, the CPU time of the
+    current process and of its waited-for children, the peak RSS observed at
+    the end of the span and the number of bytes written.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.spans = []
+        self._stacks = {}
+        self._bases = {}
+        self._main_thread = threading.get_ident()
+        self._lock = threading.Lock()
+
+    def _current_stack(self):
+        """Return the spans opened by the current thread and the spans enclosing
+        them. Spans opened by other threads are nested into the span currently
+        opened by the main thread."""
+        thread = threading.get_ident()
+        stack = self._stacks.setdefault(thread, [])
+        if thread != self._main_thread and not stack:
+            self._bases[thread] = list(self._stacks.get(self._main_thread, []))
+        return stack, self._bases.get(thread, []) + stack
+
+    @contextmanager
+    def span(self, name, **attributes):
+        stack, parents = self._current_stack()
+        record = {
+            "name": name,
+            "path": "/".join([self.spans[index]["name"] for index in parents] + [name]),
+            "parent": parents[-1] if parents else None,
+            "depth": len(parents),
+            "attributes": attributes,
+            "status": "running",
+        }
+        with self._lock:
+            self.spans.append(record)
+            stack.append(len(self.spans) - 1)
+        start = _sample()
+        try:
+            yield record
+            record["status"] = "ok"
+        except BaseException:
+            record["status"] = "error"
+            raise
+        finally:
+            end = _sample()
+            stack.pop()
+            record.update({
+                "wall_s": round(end["wall"] - start["wall"], 6),
+                "cpu_self_s": round(end["cpu_self"] - start["cpu_self"], 6),
+                "cpu_children_s": round(end["cpu_children"] - start["cpu_children"], 6),
+                "max_rss_self_kb": end["max_rss_self_kb"],
+                "max_rss_children_kb": end["max_rss_children_kb"],
+                "bytes_written_self": end["bytes_written_self"] - start["bytes_written_self"],
+                "bytes_written_children": end["bytes_written_children"] - start["bytes_written_children"],
+            })
+
+    def reset(self):
+        """Forget the recorded spans (e.g in a worker process forked from the main process)."""
+        self.spans = []
+        self._stacks = {}
+        self._bases = {}
+        self._main_thread = threading.get_ident()
+        self._lock = threading.Lock()
+
+    def merge(self, spans):
+        """Add ``spans`` recorded by a worker process (see :func:`call_with_spans`)
+        as descendants of the span currently opened by the calling thread."""
+        _, parents = self._current_stack()
+        with self._lock:
+            offset = len(self.spans)
+            for record in spans:
+                record = dict(record)
+                if record["parent"] is not None:
+                    record["parent"] += offset
+                elif parents:
+                    record["parent"] = parents[-1]
+                if parents:
+                    record["path"] = self.spans[parents[-1]]["path"] + "/" + record["path"]
+                record["depth"] += len(parents)
+                self.spans.append(record)
+
+    def to_dict(self):
+        return {
+            "version": 1,
+            "started": self.started,
+            "argv": sys.argv,
+            "spans": self.spans,
+        }
+
+    def write(self, path):
+        """Write the report as JSON into ``path``."""
+        directory = os.path.dirname(os.path.abspath(path))
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        with open(path, "w") as fp:
+            json.dump(self.to_dict(), fp, indent=2, sort_keys=True)
+
+    def display(self, max_depth=1):
+        """Print the phases of the run. Individual commands are only available in the JSON report."""
+        print("\nApidocs timing report")
+        for record in self.spans:
+            if record["depth"] > max_depth or record["name"] == "execute" or "wall_s" not in record:
+                continue
+            print("  %s* %s %s: %8.2fs (cpu children %.2fs, %s)" % (
+                "  " * record["depth"], record["name"],
+                "." * max(1, 28 - len(record["name"]) - 2 * record["depth"]),
+                record["wall_s"], record["cpu_children_s"], record["status"]))
+
+
+REPORT = RunReport()
+"""Report collecting the spans of the current run."""
+
+
+def span(name, **attributes):
+    """Context manager recording a span named ``name`` into :data:`REPORT`."""
+    return REPORT.span(name, **attributes)
+
+
+def call_with_spans(function, *args, **kwargs):
+    """Call ``function`` in a worker process and return ``(result, spans)``.
+
+    ``spans`` are the spans recorded by the call, to be merged into the report
+    of the main process using :meth:`RunReport.merge`. If the call raises an
+    exception, they are available as its ``spans`` attribute.
+    """
+    REPORT.reset()
+    try:
+        return function(*args, **kwargs), REPORT.spans
+    except Exception as exc_info:
+        exc_info.spans = REPORT.spans
+        raise
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+
+import html
+import json
+import os
+import posixpath
+import re
+
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import unquote
+
+from .compress import SIDECAR_EXTENSIONS
+from .dedup import SHARED_DIR, read_shared_manifest
+from .sync import list_files
+
+# Report of the broken links found in the generated html, written alongside it
+LINK_REPORT_FILENAME = "apidocs-links.json"
+
+# Extensions of the files whose links are checked
+PARSED_EXTENSIONS = (".html", ".svg")
+
+# Extensions of the files reported if nothing links to them
+ORPHAN_EXTENSIONS = (".html", ".png", ".svg", ".gif", ".jpg", ".jpeg")
+
+# Directories whose files are loaded by the Doxygen search engine instead of being linked
+_UNLINKED_DIRS = ("search/", "search-index/")
+
+# Number of broken links displayed by the report
+DISPLAYED_BROKEN_LINKS = 20
+
+_TAG = re.compile(rb"<[A-Za-z][^>]*?\s(?:href|src|xlink:href|id|name)\s*=[^>]*>")
+_LINK = re.compile(rb"""\s(?:href|src|xlink:href)\s*=\s*(?:"([^"]*)"|'([^']*)')""")
+_ANCHOR = re.compile(rb"""\s(?:id|name)\s*=\s*(?:"([^"]*)"|'([^']*)')""")
+_SCHEME = re.compile(r"^[A-Za-z][A-Za-z0-9+.-]*:")
+_SCRIPT_REFERENCE = re.compile(rb"[\w.-]+\.(?:%s)" % b"|".join(
+    re.escape(extension[1:].encode("utf-8")) for extension in ORPHAN_EXTENSIONS))
+
+
+def _parse_page(html_dir, page):
+    """Return ``(links, anchors)`` of ``page``.
+
+    ``links`` is the list of ``(link, resolved)`` tuples associating the
+    unescaped values of the href and src attributes with the target returned
+    by :func:`_resolve`. Links to shared assets are not resolved.
+    """
+    with open(os.path.join(html_dir, page), "rb") as fp:
+        # Attributes are only searched in the tags having one: text is skipped quickly
+        content = b"\n".join(_TAG.findall(fp.read()))
+    page_dir = posixpath.dirname(page)
+    links = []
+    for first, second in _LINK.findall(content):
+        link = html.unescape((first or second).decode("utf-8", "replace"))
+        links.append((link, None if "/%s/" % SHARED_DIR in "/" + link else _resolve(page, page_dir, link)))
+    anchors = [html.unescape((first or second).decode("utf-8", "replace"))
+               for first, second in _ANCHOR.findall(content)]
+    return links, anchors
+
+
+def _script_names(html_dir, path):
+    """Return the names of the files mentioned by a script or a stylesheet."""
+    with open(os.path.join(html_dir, path), "rb") as fp:
+        return [name.decode("utf-8") for name in _SCRIPT_REFERENCE.findall(fp.read())]
+
+
+def _resolve(page, page_dir, link):
+    """Return ``(path, fragment)`` targeted by ``link`` relative to the html tree
+    or None if the link is external or local to ``page``."""
+    if not link or link.startswith(("//", "/")) or _SCHEME.match(link):
+        return None
+    path, _, fragment = link.partition("#")
+    path = unquote(path.split("?", 1)[0])
+    if not path:
+        return (page, fragment) if fragment else None
+    if "/" not in path and path not in (".", ".."):
+        # Most Doxygen links target a page of the same directory
+        return (page_dir + "/" + path if page_dir else path), fragment
+    target = posixpath.normpath(posixpath.join(page_dir, path))
+    if path.endswith("/") or target == ".":
+        target = posixpath.join(target, "index.html") if target != "." else "index.html"
+    return target, fragment
+
+
+def check_html_links(html_dir, max_workers=None):
+    """Check the links of the html and svg files of ``html_dir`` using a pool of processes.
+
+    Pages are parsed in parallel into an index of their links and anchors
+    (``id`` and ``name`` attributes). Links to files missing from the tree,
+    or to anchors missing from their target page, are broken. Links to
+    shared assets (see :func:`dedup_html_tree`) are valid if they are listed
+    in the shared manifest of the tree. External links and links leaving the
+    tree (e.g to other published versions) are not checked.
+
+    Pages and images neither linked by a page nor mentioned by a script or a
+    stylesheet are reported as orphans, except the top-level ``index.html``
+    and the files of the Doxygen search engine.
+
+    Return a dictionary with the number of checked ``pages`` and ``links``,
+    the number of ``unchecked`` links, the list of ``broken`` links
+    (``[page, link, reason]``) and the list of ``orphans``.
+    """
+    sidecar_extensions = tuple(SIDECAR_EXTENSIONS.values())
+    files = {path for path in list_files(html_dir) if not path.endswith(sidecar_extensions)}
+    pages = sorted(path for path in files if path.endswith(PARSED_EXTENSIONS))
+    scripts = sorted(path for path in files if path.endswith((".js", ".css")))
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        parsed = dict(zip(pages, executor.map(_parse_page, [html_dir] * len(pages), pages, chunksize=64)))
+        script_names = set()
+        for names in executor.map(_script_names, [html_dir] * len(scripts), scripts, chunksize=64):
+            script_names.update(names)
+
+    anchors = {page: set(page_anchors) for page, (_, page_anchors) in parsed.items()}
+    shared = read_shared_manifest(html_dir)
+    linked = set()
+    broken = []
+    checked = unchecked = 0
+    for page in pages:
+        for link, resolved in parsed[page][0]:
+            if resolved is None:
+                if "/%s/" % SHARED_DIR in "/" + link:
+                    checked += 1
+                    shared_path = link[link.index(SHARED_DIR + "/"):].split("#", 1)[0].split("?", 1)[0]
+                    if shared_path not in shared:
+                        broken.append([page, link, "missing shared asset"])
+                continue
+            target, fragment = resolved
+            if target == ".." or target.startswith("../"):
+                unchecked += 1
+                continue
+            checked += 1
+            if target not in files:
+                broken.append([page, link, "missing file"])
+                continue
+            if target != page:
+                linked.add(target)
+            if fragment and target in anchors and fragment not in anchors[target]:
+                broken.append([page, link, "missing anchor"])
+
+    orphans = sorted(
+        path for path in files
+        if path.endswith(ORPHAN_EXTENSIONS) and path not in linked and path != "index.html"
+        and not path.startswith(_UNLINKED_DIRS) and "/search/" not in "/" + path
+        and posixpath.basename(path) not in script_names)
+
+    return {
+        "version": 1,
+        "pages": len(pages),
+        "links": checked,
+        "unchecked": unchecked,
+        "broken": broken,
+        "orphans": orphans,
+    }
+
+
+def write_link_report(path, report):
+    with open(path, "w") as fp:
+        json.dump(report, fp, indent=1, sort_keys=True)
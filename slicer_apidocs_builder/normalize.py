@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+import functools
+import os
+import re
+
+from concurrent.futures import ProcessPoolExecutor
+
+# Extensions of the Doxygen generated files that may embed volatile content.
+TEXT_EXTENSIONS = (".html", ".js", ".svg", ".map", ".css")
+
+# (pattern, replacement) applied to every text file. Each pattern matches a
+# fragment changing from one Doxygen run to the next even when the documented
+# sources are identical.
+VOLATILE_PATTERNS = [
+    # Footer timestamp: "Generated on Mon Jan 1 2024 12:00:00 for Slicer by"
+    (re.compile(rb"Generated on [^<>]*? for ([^<>]*?) by"), rb"Generated for \1 by"),
+    # Footer timestamp when PROJECT_NAME is empty: "Generated on Mon Jan 1 2024 12:00:00 by"
+    (re.compile(rb"Generated on [^<>]*? by"), rb"Generated by"),
+]
+
+# Name of anonymous enums, structs and unions (e.g "@123"). Their numbering
+# depends on the order in which every input file was parsed: the numbers are
+# replaced by their order of appearance in each file so that distinct entities
+# keep distinct names. Generated file names (e.g "union@12.html") are excluded.
+ANONYMOUS_NAME_PATTERN = re.compile(rb"(?<![\w@.])@[0-9]+(?!\w|\.\w)")
+
+
+def _iter_text_files(root_dir):
+    for dirpath, _, filenames in os.walk(root_dir):
+        for filename in filenames:
+            if filename.endswith(TEXT_EXTENSIONS):
+                yield os.path.join(dirpath, filename)
+
+
+def normalize_content(content, strip_prefixes=()):
+    """Return ``content`` (bytes) with its volatile fragments stabilized.
+
+    Each of the ``strip_prefixes`` (absolute paths of the source and build
+    directories) is removed so that the output does not depend on the
+    location of the checkout.
+    """
+    for prefix in strip_prefixes:
+        content = content.replace(prefix.rstrip("/").encode("utf-8") + b"/", b"")
+    for pattern, replacement in VOLATILE_PATTERNS:
+        content = pattern.sub(replacement, content)
+    numbers = {}
+    return ANONYMOUS_NAME_PATTERN.sub(
+        lambda match: b"@%d" % numbers.setdefault(match.group(0), len(numbers)), content)
+
+
+def normalize_file(path, strip_prefixes=()):
+    """Normalize ``path`` in place. Return True if the file was modified."""
+    with open(path, "rb") as fp:
+        content = fp.read()
+    normalized = normalize_content(content, strip_prefixes)
+    if normalized == content:
+        return False
+    with open(path, "wb") as fp:
+        fp.write(normalized)
+    return True
+
+
+def normalize_html_tree(html_dir, strip_prefixes=(), max_workers=None):
+    """Normalize all Doxygen generated text files found in ``html_dir``.
+
+    Files are processed in parallel and only rewritten if their content
+    changed. Return the number of modified files.
+    """
+    strip_prefixes = tuple(os.path.abspath(prefix) for prefix in strip_prefixes if prefix)
+    normalize = functools.partial(normalize_file, strip_prefixes=strip_prefixes)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return sum(executor.map(normalize, _iter_text_files(html_dir), chunksize=64))
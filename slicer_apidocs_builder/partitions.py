@@ -0,0 +1,358 @@
+# -*- coding: utf-8 -*-
+
+import collections
+import fnmatch
+import hashlib
+import html
+import json
+import os
+import re
+import shutil
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from .doxyfile import DOXYGEN_CONFIG_DIR, format_doxyfile, parse_doxyfile
+from .doxygen_warnings import DoxygenWarningCollector
+from .fingerprint import _git_object_ids
+from .sync import file_digest, list_files
+from .utils import CommandCancelled, execute, mkdir_p
+
+# Directory of the build tree holding the configuration, tag file, log and
+# fingerprint of each partition
+PARTITIONS_DIRNAME = "apidocs-partitions"
+
+# Manifest written into the html output directory listing the partitions of the last build
+PARTITIONS_MANIFEST_FILENAME = "apidocs-partitions.json"
+
+# Partition of the inputs located outside of the documented components (e.g generated files)
+ROOT_PARTITION = "Slicer"
+
+# Options overridden when only generating the tag file of a partition
+_TAG_ONLY_OPTIONS = collections.OrderedDict([
+    ("GENERATE_HTML", ["NO"]),
+    ("GENERATE_LATEX", ["NO"]),
+    ("GENERATE_XML", ["NO"]),
+    ("HAVE_DOT", ["NO"]),
+    ("QUIET", ["YES"]),
+    ("WARNINGS", ["NO"]),
+    ("WARN_IF_UNDOCUMENTED", ["NO"]),
+])
+
+_INDEX_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<meta http-equiv="Content-Type" content="text/xhtml;charset=UTF-8"/>
+<title>%(title)s</title>
+<link href="%(stylesheet)s" rel="stylesheet" type="text/css"/>
+</head>
+<body>
+<div class="header"><div class="headertitle"><div class="title">%(title)s</div></div></div>
+<div class="contents">
+<ul>
+%(items)s
+</ul>
+</div>
+</body>
+</html>
+"""
+
+
+def configured_doxyfile(build_dir, source_dir):
+    """Return the Doxygen configuration generated by CMake from the Slicer
+    template (e.g ``Utilities/Doxygen/Doxyfile.txt``) or None if not found."""
+    templates = sorted(name for name in os.listdir(os.path.join(source_dir, DOXYGEN_CONFIG_DIR))
+                       if re.match(r"^Doxyfile[^/]*\.in$", name))
+    for template in templates:
+        path = os.path.join(build_dir, DOXYGEN_CONFIG_DIR, template[:-len(".in")])
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def doxygen_executable(build_dir):
+    """Return the Doxygen executable found when configuring ``build_dir``."""
+    try:
+        with open(os.path.join(build_dir, "CMakeCache.txt")) as fp:
+            for line in fp:
+                match = re.match(r"^DOXYGEN_EXECUTABLE:[A-Z]+=(.+)$", line.strip())
+                if match is not None:
+                    return match.group(1)
+    except (IOError, OSError):
+        pass
+    return shutil.which("doxygen")
+
+
+def partition_inputs(inputs, source_dir, depth=1, file_patterns=None, recursive=True):
+    """Group the Doxygen ``inputs`` by component of the Slicer source tree.
+
+    Components are the directories found ``depth`` levels below ``source_dir``
+    (e.g ``Libs`` or ``Modules-Loadable`` for a depth of 2). Inputs above that
+    depth are expanded into their subdirectories, the files matching
+    ``file_patterns`` being associated with the parent component. Inputs
+    located outside of ``source_dir`` are associated with :data:`ROOT_PARTITION`.
+
+    Return an ordered dictionary mapping each partition name to its inputs.
+    """
+    partitions = collections.OrderedDict()
+    source_dir = os.path.abspath(source_dir)
+
+    def _add(components, path):
+        partitions.setdefault("-".join(components[:depth]) or ROOT_PARTITION, []).append(path)
+
+    def _expand(path, components):
+        if not os.path.isdir(path):
+            _add(components[:-1], path)
+        elif len(components) >= depth or not recursive:
+            _add(components, path)
+        else:
+            for entry in sorted(os.listdir(path)):
+                child = os.path.join(path, entry)
+                if entry.startswith("."):
+                    continue
+                if os.path.isdir(child):
+                    _expand(child, components + [entry])
+                elif not file_patterns or any(fnmatch.fnmatch(entry, pattern) for pattern in file_patterns):
+                    _add(components, child)
+
+    for path in inputs:
+        path = os.path.abspath(path)
+        if path != source_dir and not path.startswith(source_dir + os.sep):
+            partitions.setdefault(ROOT_PARTITION, []).append(path)
+            continue
+        relative_path = os.path.relpath(path, source_dir)
+        _expand(path, [] if relative_path == "." else relative_path.split(os.sep))
+    return partitions
+
+
+class Partition(object):
+    """Doxygen run documenting the ``inputs`` of a component into ``<html_output_dir>/<name>``."""
+
+    def __init__(self, name, inputs, work_dir, html_output_dir):
+        self.name = name
+        self.inputs = inputs
+        self.work_dir = os.path.join(work_dir, name)
+        self.html_dir = os.path.join(html_output_dir, name)
+        self.tag_file = os.path.join(self.work_dir, name + ".tag")
+        self.warnings = []
+        self.outcome = None
+
+    def options(self):
+        return collections.OrderedDict([
+            ("INPUT", self.inputs),
+            ("OUTPUT_DIRECTORY", [self.work_dir]),
+            ("HTML_OUTPUT", [self.html_dir]),
+            ("GENERATE_TAGFILE", [self.tag_file]),
+        ])
+
+    def fingerprint(self, source_dir, revision, doxyfile_sha1, doxygen_version):
+        """Return the hash of the git object ids of the inputs found in the source
+        tree, the content of the other inputs and the Doxygen configuration."""
+        source_prefix = os.path.abspath(source_dir) + os.sep
+        source_paths = [os.path.relpath(path, source_dir).replace(os.sep, "/")
+                        for path in self.inputs if path.startswith(source_prefix)]
+        other_files = {}
+        for path in self.inputs:
+            if path.startswith(source_prefix):
+                continue
+            if os.path.isdir(path):
+                other_files.update({path + "/" + name: file_digest(os.path.join(path, name))
+                                    for name in list_files(path)})
+            elif os.path.exists(path):
+                other_files[path] = file_digest(path)
+        inputs = {
+            "sources": _git_object_ids(source_dir, revision, source_paths) if source_paths else {},
+            "other_files": other_files,
+            "options": self.options(),
+            "doxyfile": doxyfile_sha1,
+            "doxygen": doxygen_version,
+        }
+        return hashlib.sha1(json.dumps(inputs, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def _state_file(self):
+        return os.path.join(self.work_dir, "partition.json")
+
+    def read_state(self):
+        """Return the ``(fingerprint, tag_files, warnings)`` of the last successful run.
+
+        ``tag_files`` maps the name of the other partitions to the sha1 of the
+        tag file their html was linked with.
+        """
+        try:
+            with open(self._state_file()) as fp:
+                state = json.load(fp)
+            return state["fingerprint"], state["tag_files"], state["warnings"]
+        except (IOError, OSError, ValueError, KeyError):
+            return None, None, []
+
+    def write_state(self, fingerprint, tag_files):
+        with open(self._state_file(), "w") as fp:
+            json.dump({"fingerprint": fingerprint, "tag_files": tag_files, "warnings": self.warnings}, fp)
+
+    def clear_state(self):
+        if os.path.exists(self._state_file()):
+            os.remove(self._state_file())
+
+    def is_available(self):
+        return os.path.exists(self.tag_file) and os.path.exists(os.path.join(self.html_dir, "index.html"))
+
+
+def read_partitions_manifest(html_output_dir):
+    try:
+        with open(os.path.join(html_output_dir, PARTITIONS_MANIFEST_FILENAME)) as fp:
+            return json.load(fp)["partitions"]
+    except (IOError, OSError, ValueError, KeyError):
+        return None
+
+
+def _run_parallel(function, items, max_workers):
+    """Call ``function(item, cancel_event)`` for each item using a pool of threads.
+
+    The first failure sets ``cancel_event`` so that the other commands are
+    terminated. The exception of the first actual failure is raised once all
+    the calls returned.
+    """
+    cancel_event = threading.Event()
+
+    def _run(item):
+        try:
+            return function(item, cancel_event)
+        except BaseException:
+            cancel_event.set()
+            raise
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(_run, item) for item in items]
+    errors = [future.exception() for future in futures if future.exception() is not None]
+    if errors:
+        raise next((error for error in errors if not isinstance(error, CommandCancelled)), errors[0])
+    return [future.result() for future in futures]
+
+
+def build_partitions(doxyfile, doxygen, source_dir, revision, html_output_dir, work_dir,
+                     depth=1, max_workers=None, timeout=None, force=False):
+    """Document each component of the Doxygen ``INPUT`` of ``doxyfile`` using
+    its own Doxygen run and return the list of partitions.
+
+    Partitions are generated in parallel using up to ``max_workers`` Doxygen
+    processes in two passes: the first one only generates the tag file of
+    each partition, the second one generates its html pages into
+    ``<html_output_dir>/<name>`` linking to the other partitions through
+    their tag files. ``<html_output_dir>/index.html`` links to the main page
+    of each partition.
+
+    The tag file of the partitions whose inputs and configuration are
+    unchanged since the last run is reused (see :meth:`Partition.fingerprint`),
+    unless ``force`` is True. Their html is reused too, unless the tag file of
+    another partition changed: the links to its pages are then regenerated.
+    The html directory of a partition is removed before being generated
+    again so that the pages of removed sources are not left behind.
+    The builds are terminated if they last more than ``timeout`` seconds.
+    """
+    with open(doxyfile, "rb") as fp:
+        doxyfile_content = fp.read()
+    config = parse_doxyfile(doxyfile_content.decode("utf-8", "replace"))
+    config_dir = os.path.dirname(os.path.abspath(doxyfile))
+    inputs = [os.path.join(config_dir, path) for path in config.get("INPUT", [])]
+    partitions = [
+        Partition(name, paths, work_dir, html_output_dir)
+        for name, paths in partition_inputs(
+            inputs, source_dir, depth, config.get("FILE_PATTERNS"),
+            config.get("RECURSIVE", ["NO"]) == ["YES"]).items()]
+    assert partitions, "%s: INPUT is empty" % doxyfile
+
+    # Remove the output of a single Doxygen run or of the partitions no longer documented
+    previous_names = read_partitions_manifest(html_output_dir)
+    if previous_names is None and os.path.isdir(html_output_dir):
+        shutil.rmtree(html_output_dir)
+    for name in set(previous_names or []) - {partition.name for partition in partitions}:
+        shutil.rmtree(os.path.join(html_output_dir, name), ignore_errors=True)
+    mkdir_p(html_output_dir)
+
+    doxygen_version = execute([doxygen, "--version"], capture=True, verbose=False).strip()
+    doxyfile_sha1 = hashlib.sha1(doxyfile_content).hexdigest()
+    stale = []
+    fingerprints = {}
+    previous_tag_files = {}
+    for partition in partitions:
+        mkdir_p(partition.work_dir)
+        fingerprints[partition.name] = partition.fingerprint(source_dir, revision, doxyfile_sha1, doxygen_version)
+        previous_fingerprint, previous_tag_files[partition.name], partition.warnings = partition.read_state()
+        if force or previous_fingerprint != fingerprints[partition.name] or not partition.is_available():
+            partition.clear_state()
+            stale.append(partition)
+
+    deadline = time.monotonic() + timeout if timeout is not None else None
+
+    def _doxygen(partition, options, suffix, cancel_event, output_callback=None):
+        doxyfile_path = os.path.join(partition.work_dir, "Doxyfile-%s.txt" % suffix)
+        with open(doxyfile_path, "w") as fp:
+            fp.write(format_doxyfile(options, include=os.path.abspath(doxyfile)))
+        execute([doxygen, doxyfile_path], streaming=True, quiet=True, cwd=config_dir,
+                output_callback=output_callback, cancel_event=cancel_event,
+                log_file=os.path.join(partition.work_dir, "doc-build-%s.log.gz" % suffix),
+                timeout=None if deadline is None else max(0.0, deadline - time.monotonic()))
+
+    def _generate_tag_file(partition, cancel_event):
+        options = partition.options()
+        options.update(_TAG_ONLY_OPTIONS)
+        _doxygen(partition, options, "tag", cancel_event)
+
+    def _generate_html(partition, cancel_event):
+        options = partition.options()
+        # Tag files are read by the html pass of the other partitions running concurrently
+        options["GENERATE_TAGFILE"] = []
+        options["TAGFILES"] = [
+            "%s=%s" % (other.tag_file, os.path.relpath(other.html_dir, partition.html_dir).replace(os.sep, "/"))
+            for other in partitions if other is not partition]
+        # Pages of removed sources would be published again
+        shutil.rmtree(partition.html_dir, ignore_errors=True)
+        collector = DoxygenWarningCollector(source_dir)
+        started = time.monotonic()
+        _doxygen(partition, options, "html", cancel_event, collector)
+        partition.warnings = collector.warnings
+        partition.outcome = "built in %.1fs" % (time.monotonic() - started)
+        partition.write_state(fingerprints[partition.name], tag_files[partition.name])
+
+    max_workers = max_workers or os.cpu_count() or 1
+    if stale:
+        print("\nGenerating %d of %d Doxygen tag files using %d jobs: %s" % (
+            len(stale), len(partitions), min(max_workers, len(stale)),
+            " ".join(partition.name for partition in stale)))
+        _run_parallel(_generate_tag_file, stale, min(max_workers, len(stale)))
+
+    # The html of a partition links to the others using their tag files
+    tag_digests = {partition.name: file_digest(partition.tag_file) for partition in partitions}
+    tag_files = {partition.name: {name: digest for name, digest in tag_digests.items() if name != partition.name}
+                 for partition in partitions}
+    relinked = [partition for partition in partitions
+                if partition not in stale and previous_tag_files[partition.name] != tag_files[partition.name]]
+    for partition in partitions:
+        if partition not in stale and partition not in relinked:
+            partition.outcome = "reused"
+    if stale or relinked:
+        print("\nGenerating %d of %d Doxygen partitions using %d jobs: %s" % (
+            len(stale) + len(relinked), len(partitions), min(max_workers, len(stale) + len(relinked)),
+            " ".join(partition.name for partition in stale + relinked)))
+        _run_parallel(_generate_html, stale + relinked, min(max_workers, len(stale) + len(relinked)))
+
+    _write_index(html_output_dir, config, partitions)
+    return partitions
+
+
+def _write_index(html_output_dir, config, partitions):
+    """Write the main page linking to the partitions and the manifest listing them."""
+    title = " ".join(config.get("PROJECT_NAME", []) + config.get("PROJECT_NUMBER", []))
+    items = "\n".join(
+        '<li><a class="el" href="%s/index.html">%s</a></li>' % (partition.name, html.escape(partition.name))
+        for partition in partitions)
+    with open(os.path.join(html_output_dir, "index.html"), "w") as fp:
+        fp.write(_INDEX_TEMPLATE % {
+            "title": html.escape(title or "API documentation"),
+            "stylesheet": "%s/doxygen.css" % partitions[0].name,
+            "items": items,
+        })
+    with open(os.path.join(html_output_dir, PARTITIONS_MANIFEST_FILENAME), "w") as fp:
+        json.dump({"version": 1, "partitions": [partition.name for partition in partitions]}, fp, indent=1)
+
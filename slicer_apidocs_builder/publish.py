@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+
+import abc
+import datetime
+import errno
+import json
+import os
+import shutil
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from .instrumentation import span
+from .sync import SyncResult, display_sync_report, file_digest, list_files
+from .utils import file_lock, mkdir_p
+
+# Directory of the site holding the published versions of each subdir
+VERSIONS_DIR = "_versions"
+
+# Content-addressed store of the published files. Versions hardlink to it.
+OBJECTS_DIR = "_objects"
+
+# Manifest mapping each published subdir to its current version directory
+SITE_MANIFEST_FILENAME = "apidocs-site.json"
+
+# Number of versions of each subdir kept by default, including the current one.
+# Readers still browsing the previous version are not affected by a swap.
+DEFAULT_KEEP_VERSIONS = 2
+
+
+class PublishBackend(abc.ABC):
+    """Destination of the generated html trees.
+
+    :meth:`publish` is called with a list of ``(html_output_dir, subdir,
+    slicer_repo_sha_ref)`` tuples and publishes each tree into ``subdir``.
+    """
+
+    name = None
+
+    @abc.abstractmethod
+    def publish(self, publications):
+        """Publish each tree of ``publications``."""
+
+    def is_published(self, subdir, slicer_repo_sha_ref):
+        """Return True if ``subdir`` was last published from ``slicer_repo_sha_ref``,
+        False if not and None if unknown. Only local state is inspected."""
+        return None
+
+
+class FilesystemPublishBackend(PublishBackend):
+    """Publish into a local static site directory served as is (e.g by nginx).
+
+    Each publication is written into a new directory ``_versions/<subdir>/<version>``
+    and ``<site_dir>/<subdir>`` is then atomically switched to it by replacing a
+    symbolic link, so that readers never see a partially written tree. The site
+    manifest (``apidocs-site.json``) is updated atomically as well for hosts or
+    object stores that can not follow symbolic links.
+
+    Files are stored once in the content-addressed ``_objects`` directory and
+    hardlinked into the versions: unchanged files and files identical across
+    subdirs are neither copied nor duplicated on disk. Files are copied if
+    hardlinks are not supported or if ``hardlinks`` is False.
+
+    ``on_publish(html_output_dir, published_dir)`` is called before each tree
+    is published, ``published_dir`` being the directory currently serving the
+    subdir (it may not exist).
+    """
+
+    name = "filesystem"
+
+    def __init__(self, site_dir, keep_versions=DEFAULT_KEEP_VERSIONS, hardlinks=True, on_publish=None):
+        assert keep_versions >= 1
+        self.site_dir = os.path.abspath(site_dir)
+        self.keep_versions = keep_versions
+        self.hardlinks = hardlinks
+        self.on_publish = on_publish
+
+    def _versions_dir(self, subdir):
+        # Nested subdirs (e.g branch "fix/doc") are flattened to keep versions of other subdirs apart
+        return os.path.join(self.site_dir, VERSIONS_DIR, subdir.replace("/", "--"))
+
+    def _new_version_dir(self, subdir, suffix=""):
+        """Return a new version directory. Names sort by creation time."""
+        while True:
+            version_dir = os.path.join(
+                self._versions_dir(subdir), datetime.datetime.now().strftime("%Y%m%d-%H%M%S-%f") + suffix)
+            if not os.path.exists(version_dir) and not os.path.exists(version_dir + ".tmp"):
+                return version_dir
+            time.sleep(0.001)
+
+    def current_version(self, subdir):
+        """Return the version directory currently serving ``subdir`` or None."""
+        path = os.path.join(self.site_dir, subdir)
+        if not os.path.islink(path):
+            return None
+        return os.path.normpath(os.path.join(os.path.dirname(path), os.readlink(path)))
+
+    def is_published(self, subdir, slicer_repo_sha_ref):
+        current = self.current_version(subdir)
+        if current is None:
+            return False
+        try:
+            with open(current + ".json") as fp:
+                return json.load(fp)["sha_ref"] == slicer_repo_sha_ref
+        except (IOError, OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def _read_version_files(self, version_dir):
+        try:
+            with open(version_dir + ".json") as fp:
+                return json.load(fp)["files"]
+        except (IOError, OSError, ValueError, KeyError, TypeError):
+            return {}
+
+    def _store(self, source, digest):
+        """Return the path of the object holding the content of ``source``, adding it if needed."""
+        path = os.path.join(self.site_dir, OBJECTS_DIR, digest[:2], digest[2:])
+        if not os.path.exists(path):
+            mkdir_p(os.path.dirname(path))
+            temporary_path = "%s.tmp-%d" % (path, os.getpid())
+            shutil.copyfile(source, temporary_path)
+            os.replace(temporary_path, path)
+        return path
+
+    def _add_file(self, source, digest, destination):
+        mkdir_p(os.path.dirname(destination))
+        if self.hardlinks:
+            try:
+                os.link(self._store(source, digest), destination)
+                return
+            except OSError as exc_info:
+                if exc_info.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP):
+                    raise
+                print("\nHardlinks are not supported (%s): copying files" % exc_info)
+                self.hardlinks = False
+        shutil.copyfile(source, destination)
+
+    def _switch(self, subdir, version_dir):
+        """Atomically point ``<site_dir>/<subdir>`` to ``version_dir``."""
+        link = os.path.join(self.site_dir, subdir)
+        mkdir_p(os.path.dirname(link))
+        temporary_link = link + ".tmp-link"
+        if os.path.lexists(temporary_link):
+            os.remove(temporary_link)
+        os.symlink(os.path.relpath(version_dir, os.path.dirname(link)), temporary_link)
+        os.replace(temporary_link, link)
+
+    def _migrate_legacy_directory(self, subdir):
+        """Move ``<site_dir>/<subdir>`` published before the site was managed by this
+        backend into a version directory sorting before the versions created next."""
+        path = os.path.join(self.site_dir, subdir)
+        if os.path.isdir(path) and not os.path.islink(path):
+            legacy_dir = self._new_version_dir(subdir, "-legacy")
+            mkdir_p(os.path.dirname(legacy_dir))
+            os.rename(path, legacy_dir)
+            os.symlink(os.path.relpath(legacy_dir, os.path.dirname(path)), path)
+
+    def _write_site_manifest(self, subdirs):
+        path = os.path.join(self.site_dir, SITE_MANIFEST_FILENAME)
+        try:
+            with open(path) as fp:
+                manifest = json.load(fp)
+        except (IOError, OSError, ValueError):
+            manifest = {"version": 1, "subdirs": {}}
+        for subdir, version_dir in subdirs.items():
+            manifest["subdirs"][subdir] = os.path.relpath(version_dir, self.site_dir).replace(os.sep, "/")
+        with open(path + ".tmp", "w") as fp:
+            json.dump(manifest, fp, indent=1, sort_keys=True)
+        os.replace(path + ".tmp", path)
+
+    def _prune(self, subdir):
+        """Remove the oldest versions of ``subdir`` and return the number of removed versions."""
+        versions_dir = self._versions_dir(subdir)
+        current = self.current_version(subdir)
+        versions = sorted(name for name in os.listdir(versions_dir)
+                          if os.path.isdir(os.path.join(versions_dir, name)) and not name.endswith(".tmp"))
+        removed = 0
+        for name in versions[:-self.keep_versions]:
+            version_dir = os.path.join(versions_dir, name)
+            if version_dir == current:
+                continue
+            shutil.rmtree(version_dir)
+            if os.path.exists(version_dir + ".json"):
+                os.remove(version_dir + ".json")
+            removed += 1
+        return removed
+
+    def _prune_objects(self):
+        """Remove the objects no longer hardlinked by any version."""
+        removed = 0
+        for dirpath, _, filenames in os.walk(os.path.join(self.site_dir, OBJECTS_DIR)):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                if os.stat(path).st_nlink == 1:
+                    os.remove(path)
+                    removed += 1
+        return removed
+
+    def publish_tree(self, html_output_dir, subdir, slicer_repo_sha_ref=None):
+        """Publish ``html_output_dir`` as a new version of ``subdir``.
+
+        Return the :class:`SyncResult` describing the changes or None if the
+        published tree is unchanged.
+        """
+        files = sorted(list_files(html_output_dir))
+        with ThreadPoolExecutor() as executor:
+            digests = dict(zip(files, executor.map(
+                lambda path: file_digest(os.path.join(html_output_dir, path)), files)))
+
+        self._migrate_legacy_directory(subdir)
+        current = self.current_version(subdir)
+        previous = self._read_version_files(current) if current else {}
+        if current and previous == digests:
+            return None
+
+        version_dir = self._new_version_dir(subdir)
+        temporary_dir = version_dir + ".tmp"
+        if os.path.exists(temporary_dir):
+            shutil.rmtree(temporary_dir)
+        mkdir_p(temporary_dir)
+        for path in files:
+            self._add_file(os.path.join(html_output_dir, path), digests[path], os.path.join(temporary_dir, path))
+        with open(version_dir + ".json", "w") as fp:
+            json.dump({"version": 1, "sha_ref": slicer_repo_sha_ref, "created": time.time(), "files": digests},
+                      fp, indent=1, sort_keys=True)
+        os.rename(temporary_dir, version_dir)
+        self._switch(subdir, version_dir)
+        self._write_site_manifest({subdir: version_dir})
+
+        return SyncResult(
+            sorted(set(digests) - set(previous)),
+            sorted(path for path in digests if path in previous and previous[path] != digests[path]),
+            sorted(set(previous) - set(digests)))
+
+    def publish(self, publications):
+        mkdir_p(self.site_dir)
+        with file_lock(self.site_dir + ".lock"):
+            pruned = 0
+            for html_output_dir, subdir, slicer_repo_sha_ref in publications:
+                if not os.path.exists(html_output_dir):
+                    continue
+                if self.on_publish is not None:
+                    self.on_publish(html_output_dir, os.path.join(self.site_dir, subdir))
+                with span("publish-version", subdir=subdir):
+                    result = self.publish_tree(html_output_dir, subdir, slicer_repo_sha_ref)
+                if result is None:
+                    print("\nNo new changes to publish for %s" % subdir)
+                    continue
+                print("\n%s -> %s (%s)" % (html_output_dir, os.path.join(self.site_dir, subdir),
+                                           self.current_version(subdir)))
+                display_sync_report(result)
+                pruned += self._prune(subdir)
+            if pruned:
+                with span("publish-prune"):
+                    removed = self._prune_objects()
+                print("\nPruned %d versions and %d unused files" % (pruned, removed))
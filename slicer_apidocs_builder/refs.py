@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+
+import collections
+import json
+import os
+import re
+import subprocess
+
+from .utils import execute, file_lock
+
+
+def extract_slicer_xy_version_from_lines(lines):
+    """Extract <major>.<minor> version from the lines of Slicer top-level CMakeLists.txt"""
+    expressions = {part: re.compile(r"set\(Slicer_VERSION_%s \"([0-9]+)\"\)" % part.upper())
+                   for part in ["major", "minor"]}
+    parts = {}
+    for line in lines:
+        for part, expression in expressions.items():
+            m = expression.match(line.strip())
+            if m is not None:
+                parts[part] = m.group(1)
+        if len(parts) == len(expressions):
+            break
+    return "{major}.{minor}".format(**parts) if len(parts) == len(expressions) else None
+
+
+def extract_apidocs_version_from_tag(slicer_repo_tag):
+    return "v" + ".".join(slicer_repo_tag.lstrip("v").split(".")[:2])
+
+
+class ResolvedRef(collections.namedtuple("ResolvedRef", ["name", "kind", "sha", "subdir", "version"])):
+    """Facts about a documented Slicer branch or tag, resolved once per run.
+
+    * ``name``: branch or tag name (e.g ``main`` or ``v5.6.1``)
+    * ``kind``: ``"tag"`` or ``"branch"``
+    * ``sha``: full SHA of the documented commit
+    * ``subdir``: publishing subdirectory (e.g ``main`` or ``v5.6``)
+    * ``version``: Slicer ``<major>.<minor>`` version or None if unknown
+    """
+    __slots__ = ()
+
+    @property
+    def is_tag(self):
+        return self.kind == "tag"
+
+    def sha_ref(self, repo_name):
+        """Return ``<repo_name>@<tag>`` or ``<repo_name>@<short_sha>``."""
+        return "%s@%s" % (repo_name, self.name if self.is_tag else self.sha[:8])
+
+
+def make_resolved_ref(name, is_tag, sha, version):
+    return ResolvedRef(
+        name=name,
+        kind="tag" if is_tag else "branch",
+        sha=sha,
+        subdir=extract_apidocs_version_from_tag(name) if is_tag else name,
+        version=version,
+    )
+
+
+class GitCatFile(object):
+    """Persistent ``git cat-file --batch`` process.
+
+    Each lookup is a round trip over the pipes of a single process instead
+    of spawning one git process per question.
+    """
+
+    def __init__(self, repo_dir):
+        self._process = subprocess.Popen(
+            ["git", "-C", repo_dir, "cat-file", "--batch"],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self._process.poll() is None:
+            self._process.stdin.close()
+            self._process.wait()
+
+    def _lookup(self, object_name):
+        self._process.stdin.write(object_name.encode("utf-8") + b"\n")
+        self._process.stdin.flush()
+        header = self._process.stdout.readline().decode("utf-8").split()
+        if len(header) != 3:
+            # "<object_name> missing" or "<object_name> ambiguous"
+            return None
+        sha, object_type, size = header
+        content = self._process.stdout.read(int(size))
+        self._process.stdout.read(1)  # Trailing newline
+        return sha, object_type, content
+
+    def sha(self, object_name):
+        """Return the SHA of ``object_name`` or None if it does not exist."""
+        result = self._lookup(object_name)
+        return result[0] if result else None
+
+    def read(self, object_name):
+        """Return the content (bytes) of ``object_name`` or None if it does not exist."""
+        result = self._lookup(object_name)
+        return result[2] if result else None
+
+
+def resolve_slicer_ref(repo_dir, branch_or_tag, revision="HEAD", cat_file=None):
+    """Return the :class:`ResolvedRef` associated with ``branch_or_tag``
+    checked out as ``revision`` in ``repo_dir``.
+
+    All lookups are done using a single ``git cat-file`` process.
+    """
+    if cat_file is None:
+        with GitCatFile(repo_dir) as cat_file:
+            return resolve_slicer_ref(repo_dir, branch_or_tag, revision, cat_file)
+    is_tag = cat_file.sha("refs/tags/%s^{commit}" % branch_or_tag) is not None
+    sha = cat_file.sha(revision + "^{commit}")
+    cmakelists = cat_file.read(revision + ":CMakeLists.txt")
+    version = None
+    if cmakelists is not None:
+        version = extract_slicer_xy_version_from_lines(
+            cmakelists.decode("utf-8", "replace").splitlines())
+    return make_resolved_ref(branch_or_tag, is_tag, sha, version)
+
+
+class RefCache(object):
+    """Metadata of documented commits persisted as JSON in ``path``.
+
+    Entries are keyed by commit SHA: the Slicer version of each commit is
+    stored along with the kind and publishing subdirectory of the refs
+    found to point to it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._commits = self._read()
+
+    def _read(self):
+        try:
+            with open(self.path) as fp:
+                return json.load(fp)["commits"]
+        except (IOError, OSError, ValueError, KeyError):
+            return {}
+
+    def version(self, sha):
+        """Return the cached Slicer version of ``sha`` or None."""
+        return self._commits.get(sha, {}).get("version")
+
+    def put(self, ref):
+        """Store ``ref``. Entries concurrently added by other processes are preserved."""
+        if not ref.sha:
+            return
+        with file_lock(self.path + ".lock"):
+            self._commits = self._read()
+            commit = self._commits.setdefault(ref.sha, {"version": None, "refs": {}})
+            commit["version"] = ref.version or commit["version"]
+            commit["refs"][ref.name] = {"kind": ref.kind, "subdir": ref.subdir}
+            temporary_path = self.path + ".tmp"
+            with open(temporary_path, "w") as fp:
+                json.dump({"version": 1, "commits": self._commits}, fp, indent=1, sort_keys=True)
+            os.replace(temporary_path, self.path)
+
+
+def ls_remote_ref(repo_url, branch_or_tag):
+    """Return ``(sha, is_tag)`` of ``branch_or_tag`` in the remote repository or ``(None, False)``.
+
+    The commit of annotated tags is returned.
+    """
+    output = execute(
+        ["git", "ls-remote", repo_url, "refs/heads/" + branch_or_tag,
+         "refs/tags/" + branch_or_tag, "refs/tags/%s^{}" % branch_or_tag],
+        capture=True, verbose=False)
+    shas = {}
+    for line in output.splitlines():
+        if "\t" not in line:
+            # Message printed on stderr (e.g "warning: redirecting to ...")
+            continue
+        sha, ref = line.split("\t", 1)
+        shas[ref] = sha
+    tag_ref = "refs/tags/" + branch_or_tag
+    if tag_ref in shas:
+        return shas.get(tag_ref + "^{}", shas[tag_ref]), True
+    return shas.get("refs/heads/" + branch_or_tag), False
+
+
+def lookup_slicer_ref(branch_or_tag, cache, mirror_dir=None, repo_url=None):
+    """Return the :class:`ResolvedRef` of ``branch_or_tag`` without a checkout, or None
+    if the ref is not found.
+
+    The ref is resolved using ``git ls-remote`` on ``repo_url``. The bare
+    ``mirror_dir`` is not fetched and may be outdated: the ref is only looked
+    up in it if ``repo_url`` is not specified. The Slicer version is read from
+    ``cache`` or from the mirror if it has the commit. Results are stored into
+    ``cache``.
+    """
+    cat_file = GitCatFile(mirror_dir) if mirror_dir and os.path.isdir(mirror_dir) else None
+    try:
+        if repo_url:
+            sha, is_tag = ls_remote_ref(repo_url, branch_or_tag)
+        elif cat_file is not None:
+            tag_sha = cat_file.sha("refs/tags/%s^{commit}" % branch_or_tag)
+            sha, is_tag = tag_sha or cat_file.sha("refs/heads/%s^{commit}" % branch_or_tag), tag_sha is not None
+        else:
+            return None
+        if sha is None:
+            return None
+        version = cache.version(sha)
+        if version is None and cat_file is not None:
+            cmakelists = cat_file.read(sha + ":CMakeLists.txt")
+            if cmakelists is not None:
+                version = extract_slicer_xy_version_from_lines(
+                    cmakelists.decode("utf-8", "replace").splitlines())
+    finally:
+        if cat_file is not None:
+            cat_file.close()
+    ref = make_resolved_ref(branch_or_tag, is_tag, sha, version)
+    cache.put(ref)
+    return ref
@@ -0,0 +1,88 @@
+// Client of the search index written by slicer_apidocs_builder.search_index.
+//
+// The shards of a query are the ones whose prefix starts with the key of the
+// query or is a prefix of it. Queries shorter than the prefixes of a split
+// shard (e.g "v" when "v" is split into "va", "vb", ...) load all the shards
+// below it.
+
+var ApidocsSearch = (function () {
+  "use strict";
+
+  function ApidocsSearch(baseUrl) {
+    this.baseUrl = baseUrl;
+    this.index = null;
+    this.shards = {};
+  }
+
+  ApidocsSearch.prototype.loadIndex = function () {
+    if (!this.index) {
+      this.index = fetch(this.baseUrl + "index.json").then(function (response) {
+        if (!response.ok) {
+          throw new Error("Failed to load search index: " + response.status);
+        }
+        return response.json();
+      });
+    }
+    return this.index;
+  };
+
+  ApidocsSearch.prototype.key = function (query, maxPrefixLength) {
+    return query.toLowerCase().slice(0, maxPrefixLength).replace(/[^a-z0-9]/g, "_");
+  };
+
+  ApidocsSearch.prototype.shardPrefixes = function (index, query) {
+    var key = this.key(query, index.max_prefix_length);
+    if (!key) {
+      return [];
+    }
+    return Object.keys(index.shards).filter(function (prefix) {
+      return key.indexOf(prefix) === 0 || prefix.indexOf(key) === 0;
+    });
+  };
+
+  ApidocsSearch.prototype.loadShard = function (file) {
+    if (!this.shards[file]) {
+      this.shards[file] = fetch(this.baseUrl + file).then(function (response) {
+        if (!response.ok) {
+          throw new Error("Failed to load " + file + ": " + response.status);
+        }
+        return response.arrayBuffer();
+      }).then(function (buffer) {
+        var bytes = new Uint8Array(buffer);
+        // Servers sending the shard with "Content-Encoding: gzip" already decompressed it
+        if (bytes[0] !== 0x1f || bytes[1] !== 0x8b) {
+          return JSON.parse(new TextDecoder().decode(bytes));
+        }
+        var stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream("gzip"));
+        return new Response(stream).json();
+      });
+    }
+    return this.shards[file];
+  };
+
+  // Resolve to the sorted [name, url, kind, scope] entries whose name starts with query
+  ApidocsSearch.prototype.search = function (query) {
+    var self = this;
+    var lowered = query.toLowerCase();
+    return this.loadIndex().then(function (index) {
+      return Promise.all(self.shardPrefixes(index, query).map(function (prefix) {
+        return self.loadShard(index.shards[prefix].file);
+      }));
+    }).then(function (shards) {
+      var entries = [];
+      shards.forEach(function (shard) {
+        shard.forEach(function (entry) {
+          if (entry[0].toLowerCase().indexOf(lowered) === 0) {
+            entries.push(entry);
+          }
+        });
+      });
+      return entries.sort(function (first, second) {
+        var a = first[0].toLowerCase(), b = second[0].toLowerCase();
+        return a < b ? -1 : a > b ? 1 : (first[1] < second[1] ? -1 : first[1] > second[1] ? 1 : 0);
+      });
+    });
+  };
+
+  return ApidocsSearch;
+})();
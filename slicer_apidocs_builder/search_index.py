@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+
+import collections
+import gzip
+import hashlib
+import html
+import io
+import json
+import os
+import posixpath
+import re
+import shutil
+
+from .sync import file_digest, list_files
+
+# Directory of the html tree holding the search index
+SEARCH_INDEX_DIR = "search-index"
+
+# Description of the shards: the shard of a query is the one associated
+# with the longest prefix of the lowercased query.
+SEARCH_INDEX_FILENAME = "index.json"
+
+# Client files copied into the search index directory: a loader looking up
+# the shards of a query and a search page using it.
+SEARCH_CLIENT_FILES = {"search.js": "search_index.js", "search.html": "search_index.html"}
+
+# Maximum number of entries of a shard. Larger shards are split using longer prefixes.
+MAX_SHARD_ENTRIES = 2000
+
+# Maximum length of the prefix associated with a shard
+MAX_PREFIX_LENGTH = 6
+
+# Suffix of the page titles associated with each kind of entry
+_TITLE_KINDS = [
+    (" Class Reference", "class"),
+    (" Class Template Reference", "class"),
+    (" Struct Reference", "struct"),
+    (" Union Reference", "union"),
+    (" Namespace Reference", "namespace"),
+    (" File Reference", "file"),
+    (" Interface Reference", "interface"),
+]
+
+# Appended to the scripts of the Doxygen search box: pressing Enter in the search
+# field opens the search page with the query. The search page is located using the
+# path of the Doxygen search directory set on each page, the script itself may be
+# moved (see dedup_html_tree).
+_SEARCH_BOX_HOOK_MARKER = "/* slicer-apidocs-builder search index */"
+_SEARCH_BOX_HOOK = _SEARCH_BOX_HOOK_MARKER + """
+(function () {
+  function hook() {
+    var field = document.getElementById("MSearchField");
+    if (!field || !window.searchBox || !window.searchBox.resultsPath) {
+      return;
+    }
+    field.addEventListener("keydown", function (event) {
+      if (event.keyCode !== 13 || !field.value) {
+        return;
+      }
+      event.preventDefault();
+      event.stopPropagation();
+      var searchDir = window.searchBox.resultsPath.replace(/\\/?$/, "/");
+      window.location.href = searchDir + "%s?q=" + encodeURIComponent(field.value);
+    }, true);
+  }
+  if (document.readyState === "loading") {
+    document.addEventListener("DOMContentLoaded", hook);
+  } else {
+    hook();
+  }
+})();
+"""
+
+_TITLE = re.compile(r'<div class="title">(.*?)</div>', re.S)
+_HTML_TITLE = re.compile(r"<title>(?:[^<:]*: )?(.*?)</title>", re.S)
+_MEMBER = re.compile(
+    r'<h2 class="memtitle">(?:<span class="permalink"><a href="#([^"]*)">.*?</a></span>)?(.*?)</h2>', re.S)
+_TAG = re.compile(r"<[^>]+>")
+
+
+def _text(fragment):
+    return " ".join(html.unescape(_TAG.sub("", fragment)).split())
+
+
+def page_entries(content, page):
+    """Return the search entries ``[name, url, kind, scope]`` of a page.
+
+    Entries are the documented compound (class, file, ...) or page and its members.
+    """
+    match = _TITLE.search(content) or _HTML_TITLE.search(content)
+    title = _text(match.group(1)) if match else ""
+    kind = "page"
+    for suffix, title_kind in _TITLE_KINDS:
+        if title.endswith(suffix):
+            title, kind = title[:-len(suffix)], title_kind
+            break
+    entries = []
+    if title:
+        entries.append([title, page, kind, ""])
+    for anchor, member in _MEMBER.findall(content):
+        name = _text(member).lstrip("◆ ").split("(")[0].strip()
+        if name:
+            entries.append([name, page + ("#" + anchor if anchor else ""), "member", title])
+    return entries
+
+
+def _shard_char(char):
+    return char if char.isalnum() and char.isascii() else "_"
+
+
+def _key(name):
+    return "".join(_shard_char(char) for char in name.lower()[:MAX_PREFIX_LENGTH])
+
+
+def shard_entries(entries, max_entries=MAX_SHARD_ENTRIES):
+    """Group ``entries`` by prefix of their lowercased name.
+
+    Prefixes start with one character and are extended while a shard has
+    more than ``max_entries`` entries. Return a dictionary mapping each
+    prefix to its sorted entries.
+    """
+    shards = {}
+    pending = [("", sorted(entries, key=lambda entry: (entry[0].lower(), entry[1])))]
+    while pending:
+        prefix, group = pending.pop()
+        by_prefix = collections.OrderedDict()
+        for entry in group:
+            key = _key(entry[0])
+            by_prefix.setdefault(key[:len(prefix) + 1], []).append(entry)
+        for sub_prefix, sub_group in by_prefix.items():
+            if len(sub_group) > max_entries and len(sub_prefix) == len(prefix) + 1 < MAX_PREFIX_LENGTH:
+                pending.append((sub_prefix, sub_group))
+            else:
+                shards[sub_prefix] = sub_group
+    return shards
+
+
+def shard_prefixes(shards, query):
+    """Return the prefixes of the ``shards`` holding the entries whose name starts with ``query``.
+
+    These are the prefixes which are a prefix of the key of the query or start
+    with it: a query shorter than the prefixes of a split shard (e.g ``v``
+    when ``v`` is split into ``va``, ``vb``, ...) is looked up into all the
+    shards below it. ``search.js`` implements the same lookup.
+    """
+    key = _key(query)
+    if not key:
+        return []
+    return sorted(prefix for prefix in shards if key.startswith(prefix) or prefix.startswith(key))
+
+
+def _install_search_client(html_dir, index_dir, files):
+    """Copy the search client into ``index_dir`` and hook it into the Doxygen
+    search boxes, whose scripts are found among ``files``."""
+    client_dir = os.path.dirname(os.path.abspath(__file__))
+    for filename, source in SEARCH_CLIENT_FILES.items():
+        shutil.copyfile(os.path.join(client_dir, source), os.path.join(index_dir, filename))
+    for path in files:
+        if path != "search/search.js" and not path.endswith("/search/search.js"):
+            continue
+        with open(os.path.join(html_dir, path), encoding="utf-8", errors="replace") as fp:
+            if _SEARCH_BOX_HOOK_MARKER in fp.read():
+                continue
+        search_page = posixpath.relpath(SEARCH_INDEX_DIR + "/search.html", posixpath.dirname(path))
+        with open(os.path.join(html_dir, path), "a", encoding="utf-8") as fp:
+            fp.write("\n" + _SEARCH_BOX_HOOK % search_page)
+
+
+def _gzip_json(data):
+    buffer = io.BytesIO()
+    with gzip.GzipFile(filename="", mode="wb", fileobj=buffer, compresslevel=9, mtime=0) as fp:
+        fp.write(json.dumps(data, separators=(",", ":"), sort_keys=True).encode("utf-8"))
+    return buffer.getvalue()
+
+
+def _read_cache(cache_file):
+    try:
+        with gzip.open(cache_file, "rt") as fp:
+            cache = json.load(fp)
+    except (IOError, OSError, ValueError, EOFError):
+        return {}, {}
+    return cache.get("pages", {}), cache.get("shards", {})
+
+
+def build_search_index(html_dir, cache_file, max_entries=MAX_SHARD_ENTRIES):
+    """Write a search index of ``html_dir`` into ``<html_dir>/search-index``.
+
+    Each shard ``shard-<prefix>.json.gz`` is a gzipped JSON list of
+    ``[name, url, kind, scope]`` entries, ``url`` being relative to ``html_dir``.
+    ``index.json`` maps each prefix to its shard file and number of entries
+    (see :func:`shard_prefixes` for the lookup of the shards of a query).
+
+    The search client (``search.js`` and ``search.html``) is copied along
+    with the shards. Pressing Enter in the Doxygen search box opens
+    ``search.html`` with the query.
+
+    The entries of each page and the digest of each shard are saved into
+    ``cache_file`` (outside of the html tree) so that only the pages whose
+    content changed are parsed and only the modified shards are written by
+    the next run.
+
+    Return ``(parsed_pages, written_shards)``.
+    """
+    previous_pages, previous_shards = _read_cache(cache_file)
+    index_dir = os.path.join(html_dir, SEARCH_INDEX_DIR)
+    if not os.path.isdir(index_dir):
+        os.makedirs(index_dir)
+        previous_shards = {}
+
+    files = sorted(list_files(html_dir))
+    pages = {}
+    parsed = 0
+    for page in files:
+        # Skip the pages of the Doxygen search engine, including the ones of partitioned builds
+        if not page.endswith(".html") or "/search/" in "/" + page or page.startswith(SEARCH_INDEX_DIR + "/"):
+            continue
+        digest = file_digest(os.path.join(html_dir, page))
+        cached = previous_pages.get(page)
+        if cached is not None and cached[0] == digest:
+            pages[page] = cached
+            continue
+        with open(os.path.join(html_dir, page), encoding="utf-8", errors="replace") as fp:
+            pages[page] = [digest, page_entries(fp.read(), page)]
+        parsed += 1
+
+    shards = shard_entries([entry for _, entries in pages.values() for entry in entries], max_entries)
+
+    shard_digests = {}
+    written = 0
+    for prefix, entries in shards.items():
+        content = _gzip_json(entries)
+        shard_digests[prefix] = hashlib.sha1(content).hexdigest()
+        shard_file = os.path.join(index_dir, "shard-%s.json.gz" % prefix)
+        if previous_shards.get(prefix) == shard_digests[prefix] and os.path.exists(shard_file):
+            continue
+        with open(shard_file, "wb") as fp:
+            fp.write(content)
+        written += 1
+    for filename in os.listdir(index_dir):
+        if filename.startswith("shard-") and filename[len("shard-"):-len(".json.gz")] not in shards:
+            os.remove(os.path.join(index_dir, filename))
+
+    with open(os.path.join(index_dir, SEARCH_INDEX_FILENAME), "w") as fp:
+        json.dump({
+            "version": 1,
+            "max_prefix_length": MAX_PREFIX_LENGTH,
+            "shards": {prefix: {"file": "shard-%s.json.gz" % prefix, "count": len(entries)}
+                       for prefix, entries in shards.items()},
+        }, fp, indent=1, sort_keys=True)
+
+    _install_search_client(html_dir, index_dir, files)
+
+    with gzip.open(cache_file, "wt") as fp:
+        json.dump({"version": 1, "pages": pages, "shards": shard_digests}, fp, separators=(",", ":"))
+
+    return parsed, written
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+
+import collections
+import hashlib
+import os
+import shutil
+
+from concurrent.futures import ThreadPoolExecutor
+
+from .utils import mkdir_p
+
+SyncResult = collections.namedtuple("SyncResult", ["added", "changed", "deleted"])
+"""Relative paths (``/`` separated) of the files touched by :func:`sync_tree`."""
+
+
+def file_digest(path, block_size=1 << 20):
+    """Return the hexadecimal SHA-1 digest of the content of ``path``."""
+    digest = hashlib.sha1()
+    with open(path, "rb") as fp:
+        for chunk in iter(lambda: fp.read(block_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def list_files(root_dir):
+    """Return the set of files found below ``root_dir``.
+
+    Paths are relative to ``root_dir`` and always use ``/`` as separator.
+    """
+    files = set()
+    if not os.path.isdir(root_dir):
+        return files
+    for dirpath, _, filenames in os.walk(root_dir):
+        rel_dir = os.path.relpath(dirpath, root_dir).replace(os.sep, "/")
+        prefix = "" if rel_dir == "." else rel_dir + "/"
+        files.update(prefix + filename for filename in filenames)
+    return files
+
+
+def _same_content(src_path, dst_path):
+    if os.path.isdir(dst_path):
+        return False
+    if os.path.getsize(src_path) != os.path.getsize(dst_path):
+        return False
+    return file_digest(src_path) == file_digest(dst_path)
+
+
+def _remove_empty_parents(root_dir, rel_path):
+    parent = os.path.dirname(rel_path)
+    while parent:
+        directory = os.path.join(root_dir, parent)
+        if os.listdir(directory):
+            break
+        os.rmdir(directory)
+        parent = os.path.dirname(parent)
+
+
+def sync_tree(src_dir, dst_dir, max_workers=None):
+    """Update ``dst_dir`` so that its content matches ``src_dir``.
+
+    Files are compared by size and content hash, only the ones that
+    actually differ are copied or removed. Files of ``dst_dir`` having the
+    same content as their ``src_dir`` counterpart are left untouched.
+
+    Return a :class:`SyncResult`.
+    """
+    src_files = list_files(src_dir)
+    dst_files = list_files(dst_dir)
+
+    added = sorted(src_files - dst_files)
+    deleted = sorted(dst_files - src_files)
+
+    common = sorted(src_files & dst_files)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        same = executor.map(
+            lambda path: _same_content(os.path.join(src_dir, path), os.path.join(dst_dir, path)),
+            common)
+        changed = [path for path, is_same in zip(common, same) if not is_same]
+
+    for path in deleted:
+        os.remove(os.path.join(dst_dir, path))
+        _remove_empty_parents(dst_dir, path)
+
+    for path in added + changed:
+        dst_path = os.path.join(dst_dir, path)
+        mkdir_p(os.path.dirname(dst_path))
+        shutil.copyfile(os.path.join(src_dir, path), dst_path)
+        shutil.copymode(os.path.join(src_dir, path), dst_path)
+
+    return SyncResult(added, changed, deleted)
+
+
+def display_sync_report(result):
+    print("\nApidocs sync report")
+    print("  * added .......................: %d" % len(result.added))
+    print("  * changed .....................: %d" % len(result.changed))
+    print("  * deleted .....................: %d" % len(result.deleted))
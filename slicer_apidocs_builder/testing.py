@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+"""Offline stand-ins for Doxygen, dot and the GitHub API used by the tests and
+the benchmark (see :mod:`slicer_apidocs_builder.benchmark`).
+
+Only the standard library is used so that the module can be run as the
+``doxygen`` and ``dot`` executables written by :func:`fake_doxygen` and
+:func:`fake_dot`.
+"""
+
+import contextlib
+import http.server
+import json
+import os
+import shlex
+import stat
+import sys
+import threading
+import time
+
+# Files of the Slicer source tree adding the Doxygen build to the ``doc`` target
+# of the apidocs CMake project. Inputs are the headers of Base, Libs and Modules.
+SLICER_DOXYGEN_FILES = {
+    "Utilities/Doxygen/CMakeLists.txt": """\
+configure_file(Doxyfile.txt.in ${CMAKE_CURRENT_BINARY_DIR}/Doxyfile.txt)
+add_custom_target(doc-doxygen
+  COMMAND ${DOXYGEN_EXECUTABLE} ${CMAKE_CURRENT_BINARY_DIR}/Doxyfile.txt
+  WORKING_DIRECTORY ${CMAKE_CURRENT_BINARY_DIR}
+  )
+add_dependencies(doc doc-doxygen)
+""",
+    "Utilities/Doxygen/Doxyfile.txt.in": """\
+PROJECT_NAME = Slicer
+PROJECT_NUMBER = @Slicer_VERSION@
+OUTPUT_DIRECTORY = @Slicer_BINARY_DIR@/Utilities/Doxygen
+INPUT = @Slicer_SOURCE_DIR@/Base \\
+        @Slicer_SOURCE_DIR@/Libs \\
+        @Slicer_SOURCE_DIR@/Modules
+RECURSIVE = YES
+FILE_PATTERNS = *.h
+""",
+}
+
+# Version reported by the fake Doxygen unless the environment variable of the same name is set
+FAKE_DOXYGEN_VERSION = "1.9.8"
+
+# Number of classes of the tag files linked from each class page
+_LINKS_PER_PAGE = 5
+
+
+def _write_executable(directory, name, tool):
+    path = os.path.join(str(directory), name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as fp:
+        fp.write('#!/bin/sh\nexec "%s" "%s" %s "$@"\n' % (sys.executable, os.path.abspath(__file__), tool))
+    os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return path
+
+
+def fake_doxygen(directory):
+    """Write a ``doxygen`` executable into ``directory`` and return its path.
+
+    Each ``<name>.h`` input documents the class ``name``: the tag file lists
+    the classes, ``index.html`` links to their page and each class page links
+    to classes of the ``TAGFILES``. Pages end with a timestamp and every tenth
+    header is reported as undocumented.
+    """
+    return _write_executable(directory, "doxygen", "doxygen")
+
+
+def fake_dot(directory):
+    """Write a ``dot`` executable only reporting its version into ``directory`` and return its path."""
+    return _write_executable(directory, "dot", "dot")
+
+
+def _parse_doxyfile(path, config):
+    with open(path) as fp:
+        text = fp.read().replace("\\\n", " ")
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("@INCLUDE"):
+            _parse_doxyfile(shlex.split(line.split("=", 1)[1])[0], config)
+        elif "+=" in line:
+            option, value = line.split("+=", 1)
+            config.setdefault(option.strip(), []).extend(shlex.split(value))
+        elif "=" in line:
+            option, value = line.split("=", 1)
+            config[option.strip()] = shlex.split(value)
+    return config
+
+
+def _doxygen(args):
+    version = os.environ.get("FAKE_DOXYGEN_VERSION", FAKE_DOXYGEN_VERSION)
+    if args == ["--version"]:
+        print(version)
+        return 0
+    if "-g" in args:
+        # Configuration template generated by FindDoxygen
+        with open(args[-1], "w") as fp:
+            fp.write("PROJECT_NAME = Stub\n")
+        return 0
+    config = _parse_doxyfile(args[0], {})
+    headers = []
+    for path in config.get("INPUT", []):
+        if os.path.isfile(path):
+            headers.append(path)
+        for dirpath, _, filenames in sorted(os.walk(path)):
+            headers.extend(os.path.join(dirpath, name) for name in sorted(filenames))
+    headers = [header for header in headers if header.endswith(".h")]
+    names = [os.path.basename(header)[:-2] for header in headers]
+    links = []
+    for spec in config.get("TAGFILES", []):
+        tag_file, location = spec.split("=", 1)
+        with open(tag_file) as fp:
+            links.extend((name, "%s/class%s.html" % (location, name)) for name in fp.read().split())
+    footer = "<hr/>Generated on %s for Slicer by doxygen %s" % (time.ctime(), version)
+
+    if config.get("GENERATE_HTML", ["YES"]) != ["NO"]:
+        output_dir = config.get("OUTPUT_DIRECTORY", ["."])[0]
+        html_dir = os.path.join(output_dir, config.get("HTML_OUTPUT", ["html"])[0])
+        os.makedirs(html_dir, exist_ok=True)
+        with open(os.path.join(html_dir, "doxygen.css"), "w") as fp:
+            fp.write("body { font: 400 14px/22px Roboto, sans-serif; }\n" * 200)
+        with open(os.path.join(html_dir, "jquery.js"), "w") as fp:
+            fp.write("/* jquery */ function f(a) { return a; }\n" * 2000)
+        with open(os.path.join(html_dir, "index.html"), "w") as fp:
+            fp.write('<html><head><title>Slicer: Main Page</title></head><body>%s%s</body></html>' % (
+                "".join('<a class="el" href="class%s.html">%s</a>' % (name, name) for name in names), footer))
+        for index, (header, name) in enumerate(zip(headers, names)):
+            members = "".join(
+                '<h2 class="memtitle"><span class="permalink"><a href="#a%d">&#9670;&nbsp;</a></span>'
+                'Method%d()</h2><div class="memdoc">Documentation of %s::Method%d</div>' % (
+                    number, number, name, number)
+                for number in range(5))
+            related = "".join('<a class="el" href="%s">%s</a>' % (link, other)
+                              for other, link in links[index:index + _LINKS_PER_PAGE])
+            with open(os.path.join(html_dir, "class%s.html" % name), "w") as fp:
+                fp.write('<html><head><title>Slicer: %s Class Reference</title>'
+                         '<link href="doxygen.css" rel="stylesheet" type="text/css"/>'
+                         '<script type="text/javascript" src="jquery.js"></script></head><body>'
+                         '<div class="title">%s Class Reference</div>%s%s%s</body></html>' % (
+                             name, name, members, related, footer))
+            if index % 10 == 0 and config.get("WARNINGS", ["YES"]) != ["NO"]:
+                print("%s:1: warning: Member Method0() of class %s is not documented." % (header, name))
+
+    if config.get("GENERATE_TAGFILE"):
+        with open(config["GENERATE_TAGFILE"][0], "w") as fp:
+            fp.write("\n".join(names))
+    return 0
+
+
+def _dot(args):
+    sys.stderr.write("dot - graphviz version 2.43.0 (0)\n")
+    return 0
+
+
+class _GitHubHandler(http.server.BaseHTTPRequestHandler):
+    """Subset of the GitHub API: ref lookups (with ETags) and status creation.
+
+    Responses queued into ``server.responses`` as ``(status, data, headers, close)``
+    tuples are returned first. If ``close`` is True, the connection is closed
+    after the response without notifying the client. ``None`` closes the
+    connection without response.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super(_GitHubHandler, self).setup()
+        self.server.connections += 1
+
+    def _reply(self, status, data=None, headers=None, close=False):
+        body = json.dumps(data).encode("utf-8") if data is not None else b""
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.close_connection = close
+
+    def _handle(self, method):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.server.requests.append((method, self.path, dict(self.headers)))
+        if self.server.responses:
+            response = self.server.responses.pop(0)
+            if response is None:
+                self.close_connection = True
+            else:
+                self._reply(*response)
+            return
+        parts = self.path.split("/")
+        # /repos/<owner>/<name>/git/ref/<heads|tags>/<name>
+        if method == "GET" and parts[4:6] == ["git", "ref"]:
+            sha = self.server.refs.get("/".join(parts[6:]))
+            if sha is None:
+                self._reply(404, {"message": "Not Found"})
+            elif self.headers.get("If-None-Match") == '"%s"' % sha:
+                self._reply(304)
+            else:
+                self._reply(200, {"object": {"sha": sha}}, {"ETag": '"%s"' % sha})
+        # /repos/<owner>/<name>/statuses/<sha>
+        elif method == "POST" and parts[4] == "statuses":
+            self.server.statuses.append(("/".join(parts[2:4]), parts[5], json.loads(body.decode("utf-8"))))
+            self._reply(201, {"state": json.loads(body.decode("utf-8"))["state"]})
+        else:
+            self._reply(404, {"message": "Not Found"})
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def log_message(self, *args):
+        pass
+
+
+@contextlib.contextmanager
+def fake_github(refs=None):
+    """Serve the fake GitHub API on localhost and yield the server.
+
+    ``refs`` maps refs (e.g ``heads/main``) to their SHA. The server records
+    its ``requests``, the created ``statuses`` and the number of ``connections``.
+    """
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _GitHubHandler)
+    server.daemon_threads = True
+    server.refs = dict(refs or {})
+    server.requests, server.statuses, server.responses = [], [], []
+    server.connections = 0
+    server.url = "http://127.0.0.1:%d" % server.server_address[1]
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    sys.exit({"doxygen": _doxygen, "dot": _dot}[sys.argv[1]](sys.argv[2:]))
@@ -1,11 +1,22 @@
 
+import collections
 import errno
+import gzip
 import os
 import shlex
+import signal
 import subprocess
+import sys
+import threading
+import time
 
 from contextlib import contextmanager
 
+from .instrumentation import span
+
+# Number of output lines kept by default when streaming command output
+DEFAULT_TAIL_LINES = 200
+
 
 def mkdir_p(path):
     """Ensure directory ``path`` exists. If needed, parent directories
@@ -45,12 +56,181 @@ def working_dir(directory=None, make_directory=False):
     os.chdir(old_cwd)
 
 
-def execute(cmd, capture=False, verbose=True):
+class CommandCancelled(subprocess.SubprocessError):
+    """Raised when a command streamed by :func:`execute` is cancelled."""
+
+    def __init__(self, cmd, output=None):
+        self.cmd = cmd
+        self.output = output
+        self.returncode = -1
+
+    def __str__(self):
+        return "Command '%s' was cancelled" % (self.cmd,)
+
+
+def _terminate(process, grace_period=5):
+    """Terminate ``process`` and the processes it started (e.g make and doxygen)."""
+    if process.poll() is not None:
+        return
+    try:
+        if os.name == "posix":
+            os.killpg(process.pid, signal.SIGTERM)
+        else:  # pragma: no cover
+            process.terminate()
+        process.wait(timeout=grace_period)
+    except subprocess.TimeoutExpired:
+        if os.name == "posix":
+            os.killpg(process.pid, signal.SIGKILL)
+        else:  # pragma: no cover
+            process.kill()
+        process.wait()
+    except OSError:
+        pass
+
+
+def _execute_streaming(args, output_callback=None, log_file=None, tail_lines=DEFAULT_TAIL_LINES,
+                       timeout=None, cancel_event=None, quiet=False, cwd=None):
+    """Run ``args`` and process its combined stdout and stderr line by line.
+
+    Each line is printed unless ``quiet`` is True, passed to ``output_callback``,
+    written to the gzip compressed ``log_file`` and kept in a ring
+    buffer of ``tail_lines`` lines used as output of the exception raised on
+    failure. Memory use does not depend on the volume of output.
+
+    The command is terminated if it runs longer than ``timeout`` seconds or if
+    the ``cancel_event`` (:class:`threading.Event`) is set. It is run from ``cwd``
+    if specified, allowing concurrent commands to use different directories.
+    """
+    tail = collections.deque(maxlen=tail_lines)
+    log_fp = gzip.open(log_file, "wt", encoding="utf-8") if log_file else None
+    process = subprocess.Popen(
+        args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+        universal_newlines=True, errors="replace", bufsize=1, cwd=cwd,
+        start_new_session=(os.name == "posix"))
+
+    stopped = threading.Event()
+    reasons = []
+
+    def _watchdog():
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not stopped.wait(0.1):
+            if cancel_event is not None and cancel_event.is_set():
+                reasons.append("cancelled")
+            elif deadline is not None and time.monotonic() >= deadline:
+                reasons.append("timeout")
+            else:
+                continue
+            _terminate(process)
+            return
+
+    watchdog = None
+    if timeout is not None or cancel_event is not None:
+        watchdog = threading.Thread(target=_watchdog, name="execute-watchdog")
+        watchdog.daemon = True
+        watchdog.start()
+
+    try:
+        for line in process.stdout:
+            tail.append(line)
+            if log_fp is not None:
+                log_fp.write(line)
+            if output_callback is not None:
+                output_callback(line)
+            if not quiet:
+                sys.stdout.write(line)
+        returncode = process.wait()
+    except BaseException:
+        _terminate(process)
+        raise
+    finally:
+        stopped.set()
+        if watchdog is not None:
+            watchdog.join()
+        process.stdout.close()
+        if log_fp is not None:
+            log_fp.close()
+
+    output = "".join(tail)
+    if "timeout" in reasons:
+        raise subprocess.TimeoutExpired(args, timeout, output=output)
+    if "cancelled" in reasons:
+        raise CommandCancelled(args, output=output)
+    if returncode:
+        raise subprocess.CalledProcessError(returncode, args, output=output)
+    return returncode
+
+
+def execute(cmd, capture=False, verbose=True, streaming=False, **streaming_kwargs):
+    """Execute ``cmd`` and raise :class:`subprocess.CalledProcessError` on failure.
+
+    If ``capture`` is True, the combined stdout and stderr is returned as text.
+
+    If ``streaming`` is True, the output is processed line by line with a bounded
+    memory use. See :func:`_execute_streaming` for the supported ``streaming_kwargs``
+    (``output_callback``, ``log_file``, ``tail_lines``, ``timeout``, ``cancel_event``,
+    ``quiet`` and ``cwd``).
+    """
     if verbose:
         print("\n> %s\n" % cmd)
-    check_func = subprocess.check_call
-    extra_kwargs = {}
-    if capture:
-        check_func = subprocess.check_output
-        extra_kwargs = {"stderr": subprocess.STDOUT}
-    return check_func(cmd if isinstance(cmd, list) else shlex.split(cmd), **extra_kwargs)
+    args = cmd if isinstance(cmd, list) else shlex.split(cmd)
+    with span("execute", cmd=" ".join(args)[:200]):
+        if streaming:
+            assert not capture
+            sys.stdout.flush()
+            return _execute_streaming(args, **streaming_kwargs)
+        check_func = subprocess.check_call
+        extra_kwargs = {}
+        if capture:
+            check_func = subprocess.check_output
+            extra_kwargs = {"stderr": subprocess.STDOUT, "universal_newlines": True}
+        return check_func(args, **extra_kwargs)
+
+
+@contextmanager
+def file_lock(path):
+    """Context manager holding an exclusive lock on ``path`` (created if needed).
+
+    The lock is released when the process exits, including when it crashes.
+    Locking is a no-op on platforms without :mod:`fcntl`.
+    """
+    try:
+        import fcntl
+    except ImportError:  # pragma: no cover
+        yield
+        return
+    mkdir_p(os.path.dirname(os.path.abspath(path)))
+    with open(path, "a") as fp:
+        try:
+            fcntl.flock(fp.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except (IOError, OSError):
+            print("\nWaiting for lock %s" % path)
+            fcntl.flock(fp.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fp.fileno(), fcntl.LOCK_UN)
+
+
+@contextmanager
+def try_file_lock(path):
+    """Context manager attempting to hold an exclusive lock on ``path`` without waiting.
+
+    Yield True if the lock is held, False if it is already held (e.g by
+    another process, see :func:`file_lock`).
+    """
+    try:
+        import fcntl
+    except ImportError:  # pragma: no cover
+        yield True
+        return
+    mkdir_p(os.path.dirname(os.path.abspath(path)))
+    with open(path, "a") as fp:
+        try:
+            fcntl.flock(fp.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except (IOError, OSError):
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(fp.fileno(), fcntl.LOCK_UN)
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+
+import os
+
+import pytest
+
+from slicer_apidocs_builder.testing import fake_doxygen, fake_dot
+
+
+@pytest.fixture(autouse=True)
+def git_environment(monkeypatch, tmp_path):
+    """Run git with a fixed identity and without reading the user configuration."""
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setenv("GIT_CONFIG_NOSYSTEM", "1")
+    for role in ("AUTHOR", "COMMITTER"):
+        monkeypatch.setenv("GIT_%s_NAME" % role, "Slicer Bot")
+        monkeypatch.setenv("GIT_%s_EMAIL" % role, "slicerbot@example.com")
+    monkeypatch.setenv("GIT_CONFIG_COUNT", "1")
+    monkeypatch.setenv("GIT_CONFIG_KEY_0", "init.defaultBranch")
+    monkeypatch.setenv("GIT_CONFIG_VALUE_0", "main")
+
+
+@pytest.fixture
+def fake_tools(monkeypatch, tmp_path):
+    """Put the fake doxygen and dot executables first in the PATH and return their directory."""
+    bin_dir = str(tmp_path / "bin")
+    fake_doxygen(bin_dir)
+    fake_dot(bin_dir)
+    monkeypatch.setenv("PATH", bin_dir + os.pathsep + os.environ["PATH"])
+    return bin_dir
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+import os
+import subprocess
+
+
+def git(*args, cwd=None, env=None):
+    """Run git and return its stripped output."""
+    return subprocess.check_output(
+        ["git"] + list(args), cwd=cwd, env=dict(os.environ, **(env or {})),
+        universal_newlines=True, stderr=subprocess.STDOUT).strip()
+
+
+def write_files(root, files):
+    """Write ``files``, a dictionary mapping paths relative to ``root`` to their content."""
+    for path, content in files.items():
+        full_path = os.path.join(str(root), path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, "wb" if isinstance(content, bytes) else "w") as fp:
+            fp.write(content)
+
+
+def read_file(path):
+    with open(str(path), "rb") as fp:
+        return fp.read()
+
+
+def commit(repo_dir, message, files=None, removed=(), date=None):
+    """Commit ``files`` (see :func:`write_files`) and the removal of ``removed`` into ``repo_dir``.
+
+    ``date`` is the author and committer date (e.g ``@1600000000 +0000``). Return the commit SHA.
+    """
+    write_files(repo_dir, files or {})
+    for path in removed:
+        git("rm", "-r", "-q", path, cwd=repo_dir)
+    git("add", "-A", cwd=repo_dir)
+    env = {"GIT_AUTHOR_DATE": date, "GIT_COMMITTER_DATE": date} if date else None
+    git("commit", "-q", "--allow-empty", "-m", message, cwd=repo_dir, env=env)
+    return git("rev-parse", "HEAD", cwd=repo_dir)
+
+
+def init_repo(repo_dir, branch="main"):
+    git("init", "-q", "-b", branch, str(repo_dir))
+    return str(repo_dir)
+
+
+def make_remote(tmp_path, name, branches, date=None):
+    """Create the bare repository ``<tmp_path>/<name>.git`` whose branches are
+    initialized from ``branches``, a dictionary mapping each branch name to the
+    files of its single commit. Return ``(remote_dir, work_dir)``: ``work_dir``
+    is a clone used to push further commits."""
+    remote_dir = str(tmp_path / ("%s.git" % name))
+    git("init", "-q", "--bare", remote_dir)
+    work_dir = str(tmp_path / ("%s-work" % name))
+    git("init", "-q", work_dir)
+    git("remote", "add", "origin", remote_dir, cwd=work_dir)
+    for branch, files in branches.items():
+        git("checkout", "-q", "--orphan", branch, cwd=work_dir)
+        git("rm", "-r", "-q", "--cached", "--ignore-unmatch", ".", cwd=work_dir)
+        git("clean", "-fdxq", cwd=work_dir)
+        commit(work_dir, "Initial %s" % branch, files, date=date)
+        git("push", "-q", "origin", branch, cwd=work_dir)
+    return remote_dir, work_dir
+
+
+def remote_files(remote_dir, branch):
+    """Return the paths of the files of ``branch`` of ``remote_dir``."""
+    output = git("ls-tree", "-r", "--name-only", branch, cwd=remote_dir)
+    return set(output.splitlines()) if output else set()
+
+
+def remote_file(remote_dir, branch, path):
+    return git("show", "%s:%s" % (branch, path), cwd=remote_dir)
+
+
+def slicer_files(major=5, minor=7, **files):
+    """Return the files of a minimal Slicer source tree (see :func:`write_files`)."""
+    result = {
+        "CMakeLists.txt": 'project(Slicer)\nset(Slicer_VERSION_MAJOR "%d")\nset(Slicer_VERSION_MINOR "%d")\n' % (
+            major, minor),
+        "Base/Logic/vtkSlicerLogic.h": "class vtkSlicerLogic;\n",
+        "Testing/Data/large.bin": "data\n",
+    }
+    result.update(files)
+    return result
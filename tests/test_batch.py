@@ -0,0 +1,66 @@
+import os
+import tempfile
+
+import slicer_apidocs_builder
+from slicer_apidocs_builder import GitPublishBackend, _apidocs_batch
+from slicer_apidocs_builder.testing import SLICER_DOXYGEN_FILES
+
+from helpers import git, make_remote, remote_files, slicer_files
+
+
+def test_batch_shares_the_mirror_and_the_publish_checkout(tmp_path, fake_tools, monkeypatch):
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    sources = slicer_files(**SLICER_DOXYGEN_FILES)
+    slicer_remote_dir, _ = make_remote(tmp_path, "Slicer", {
+        "main": sources,
+        "broken": dict(sources, **{"Utilities/Doxygen/CMakeLists.txt": 'message(FATAL_ERROR "Broken")\n'}),
+        "feature": dict(sources, **{"Libs/MRML/vtkMRMLFeature.h": "class vtkMRMLFeature;\n"}),
+    })
+    publish_remote_dir, _ = make_remote(tmp_path, "apidocs", {"gh-pages": {"index.html": "top"}})
+    mirror_updates = []
+    update_mirror = slicer_apidocs_builder._update_mirror
+
+    def _counting_update_mirror(*args, **kwargs):
+        mirror_updates.append(args)
+        update_mirror(*args, **kwargs)
+
+    monkeypatch.setattr(slicer_apidocs_builder, "_update_mirror", _counting_update_mirror)
+    backend = GitPublishBackend(
+        publish_github_repo_dir=str(tmp_path / "apidocs"),
+        publish_github_repo_url="file://" + publish_remote_dir,
+        publish_github_repo_name="Slicer/apidocs.slicer.org",
+        publish_github_repo_branch="gh-pages",
+        publish_github_user_name="Slicer Bot",
+        publish_github_user_email="slicerbot@example.com",
+        publish_github_skip_auth=True,
+    )
+
+    failed_refs = _apidocs_batch(
+        slicer_repo_name="Slicer/Slicer",
+        slicer_repo_refs=["main", "broken", "feature"],
+        slicer_repo_clone_url=slicer_remote_dir,
+        batch_jobs=2,
+        publish_backend=backend,
+    )
+
+    # The failure of a ref does not prevent the other ones from being published
+    assert failed_refs == ["broken"]
+    files = remote_files(publish_remote_dir, "gh-pages")
+    assert {"main/classvtkSlicerLogic.html", "feature/classvtkMRMLFeature.html"} <= files
+    assert not [path for path in files if path.startswith("broken/")]
+
+    # A single commit published from a single checkout
+    assert git("rev-list", "--count", "gh-pages", cwd=publish_remote_dir) == "2"
+    message = git("log", "-1", "--format=%B", "gh-pages", cwd=publish_remote_dir)
+    for branch in ("main", "feature"):
+        sha = git("rev-parse", branch, cwd=slicer_remote_dir)
+        assert "Slicer/Slicer@%s" % sha[:8] in message
+    assert sorted(name for name in os.listdir(str(tmp_path)) if name.startswith("apidocs")) == [
+        "apidocs", "apidocs-work", "apidocs.git", "apidocs.lock"]
+
+    # The worktrees of all the refs share the mirror fetched once
+    assert len(mirror_updates) == 1
+    mirror_dir = str(tmp_path / "Slicer-Slicer.git")
+    worktrees = git("worktree", "list", "--porcelain", cwd=mirror_dir)
+    for branch in ("main", "broken", "feature"):
+        assert "worktree %s" % (tmp_path / ("Slicer-Slicer-%s" % branch)) in worktrees
@@ -0,0 +1,77 @@
+import os
+
+from slicer_apidocs_builder import _apidocs_build_doxygen, _default_apidocs_directories
+from slicer_apidocs_builder.compress import compress_html_tree
+from slicer_apidocs_builder.normalize import normalize_html_tree
+from slicer_apidocs_builder.refs import resolve_slicer_ref
+from slicer_apidocs_builder.testing import SLICER_DOXYGEN_FILES
+
+from helpers import commit, init_repo, slicer_files
+
+
+def _sources(tmp_path, **files):
+    repo_dir = init_repo(tmp_path / "Slicer")
+    commit(repo_dir, "Initial", slicer_files(**dict(SLICER_DOXYGEN_FILES, **files)))
+    return repo_dir
+
+
+def _build(tmp_path, repo_dir, **kwargs):
+    apidocs_src_dir, apidocs_build_dir, html_output_dir = _default_apidocs_directories(str(tmp_path), "Slicer")
+    return _apidocs_build_doxygen(
+        html_output_dir=html_output_dir,
+        apidocs_src_dir=apidocs_src_dir,
+        apidocs_build_dir=apidocs_build_dir,
+        slicer_repo_dir=repo_dir,
+        slicer_ref=resolve_slicer_ref(repo_dir, "main"),
+        **kwargs
+    )
+
+
+def _html_output_dir(tmp_path):
+    return _default_apidocs_directories(str(tmp_path), "Slicer")[2]
+
+
+def test_rebuild_removes_pages_of_removed_sources(tmp_path, fake_tools):
+    repo_dir = _sources(tmp_path, **{"Libs/MRML/vtkMRMLScene.h": "class vtkMRMLScene;\n"})
+    html_output_dir = _html_output_dir(tmp_path)
+    assert _build(tmp_path, repo_dir)
+    normalize_html_tree(html_output_dir, max_workers=1)
+    compressed, _ = compress_html_tree(html_output_dir, ["gzip"], max_workers=1)
+    assert os.path.exists(os.path.join(html_output_dir, "classvtkMRMLScene.html.gz"))
+
+    commit(repo_dir, "Remove class", removed=["Libs/MRML/vtkMRMLScene.h"])
+    assert _build(tmp_path, repo_dir)
+
+    assert os.path.exists(os.path.join(html_output_dir, "classvtkSlicerLogic.html"))
+    assert not os.path.exists(os.path.join(html_output_dir, "classvtkMRMLScene.html"))
+    # Sidecars of the unchanged pages are copied from the cache kept out of the html directory
+    normalize_html_tree(html_output_dir, max_workers=1)
+    assert compress_html_tree(html_output_dir, ["gzip"], max_workers=1) == (0, compressed - 1)
+    assert os.path.exists(os.path.join(html_output_dir, "classvtkSlicerLogic.html.gz"))
+    assert not os.path.exists(os.path.join(html_output_dir, "classvtkMRMLScene.html.gz"))
+
+
+def test_build_is_skipped_while_the_fingerprint_is_unchanged(tmp_path, fake_tools, monkeypatch):
+    repo_dir = _sources(tmp_path)
+    index = os.path.join(_html_output_dir(tmp_path), "index.html")
+    assert _build(tmp_path, repo_dir)
+    os.utime(index, (0, 0))
+
+    # Files outside of the Doxygen inputs are not documented
+    commit(repo_dir, "Update data", {"Testing/Data/large.bin": "other data\n"})
+    assert not _build(tmp_path, repo_dir)
+    assert os.path.getmtime(index) == 0
+
+    doxyfile = "Utilities/Doxygen/Doxyfile.txt.in"
+    commit(repo_dir, "Update Doxygen configuration", {doxyfile: SLICER_DOXYGEN_FILES[doxyfile] + "QUIET = YES\n"})
+    assert _build(tmp_path, repo_dir)
+    assert os.path.getmtime(index) != 0
+    assert not _build(tmp_path, repo_dir)
+
+    commit(repo_dir, "Update class", {"Base/Logic/vtkSlicerLogic.h": "class vtkSlicerLogic {};\n"})
+    assert _build(tmp_path, repo_dir)
+    os.utime(index, (0, 0))
+
+    monkeypatch.setenv("FAKE_DOXYGEN_VERSION", "1.10.0")
+    assert _build(tmp_path, repo_dir)
+    assert os.path.getmtime(index) != 0
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+
+import os
+
+import pytest
+
+from slicer_apidocs_builder import _apidocs_checkout_slicer
+
+from helpers import commit, git, init_repo, make_remote, read_file, slicer_files
+
+
+@pytest.fixture
+def slicer_remote(tmp_path):
+    remote_dir, work_dir = make_remote(tmp_path, "Slicer", {"main": slicer_files()})
+    git("checkout", "-q", "main", cwd=work_dir)
+    git("tag", "-a", "-m", "Slicer 5.6.1", "v5.6.1", cwd=work_dir)
+    git("push", "-q", "origin", "v5.6.1", cwd=work_dir)
+    return remote_dir, work_dir
+
+
+def _checkout(tmp_path, remote_dir, branch_or_tag, name, mirror=True, **kwargs):
+    return _apidocs_checkout_slicer(
+        slicer_repo_clone_url="file://" + remote_dir,
+        slicer_repo_dir=str(tmp_path / name),
+        slicer_repo_branch_or_tag=branch_or_tag,
+        slicer_repo_mirror_dir=str(tmp_path / "mirror.git") if mirror else None,
+        **kwargs)
+
+
+def test_checkout_worktree_of_mirror(tmp_path, slicer_remote):
+    remote_dir, work_dir = slicer_remote
+    slicer_ref = _checkout(tmp_path, remote_dir, "main", "Slicer-main")
+
+    assert slicer_ref.kind == "branch"
+    assert slicer_ref.sha == git("rev-parse", "main", cwd=remote_dir)
+    assert slicer_ref.subdir == "main"
+    assert slicer_ref.version == "5.7"
+    common_dir = git("rev-parse", "--git-common-dir", cwd=str(tmp_path / "Slicer-main"))
+    assert os.path.realpath(common_dir) == os.path.realpath(str(tmp_path / "mirror.git"))
+    assert git("rev-parse", "--is-bare-repository", cwd=str(tmp_path / "mirror.git")) == "true"
+
+
+def test_checkout_worktree_is_updated(tmp_path, slicer_remote):
+    remote_dir, work_dir = slicer_remote
+    _checkout(tmp_path, remote_dir, "main", "Slicer-main")
+    sha = commit(work_dir, "Update", {"Base/Logic/vtkSlicerLogic.h": "class vtkSlicerLogic {};\n"})
+    git("push", "-q", "origin", "main", cwd=work_dir)
+
+    slicer_ref = _checkout(tmp_path, remote_dir, "main", "Slicer-main")
+
+    assert slicer_ref.sha == sha
+    assert read_file(tmp_path / "Slicer-main" / "Base/Logic/vtkSlicerLogic.h") == b"class vtkSlicerLogic {};\n"
+
+
+def test_checkout_worktrees_share_the_mirror(tmp_path, slicer_remote):
+    remote_dir, work_dir = slicer_remote
+    commit(work_dir, "Next release", slicer_files(minor=8))
+    git("push", "-q", "origin", "main", cwd=work_dir)
+
+    main_ref = _checkout(tmp_path, remote_dir, "main", "Slicer-main")
+    tag_ref = _checkout(tmp_path, remote_dir, "v5.6.1", "Slicer-v5.6.1", skip_mirror_update=True)
+
+    assert (main_ref.version, tag_ref.version) == ("5.8", "5.7")
+    assert tag_ref.kind == "tag"
+    assert tag_ref.subdir == "v5.6"
+    assert tag_ref.sha == git("rev-parse", "v5.6.1^{commit}", cwd=remote_dir)
+    worktrees = git("worktree", "list", "--porcelain", cwd=str(tmp_path / "mirror.git"))
+    assert worktrees.count("worktree ") == 3
+
+
+def test_checkout_sparse_worktree(tmp_path, slicer_remote):
+    remote_dir, _ = slicer_remote
+    _checkout(tmp_path, remote_dir, "main", "Slicer-main", slicer_repo_sparse=True)
+
+    assert os.path.exists(str(tmp_path / "Slicer-main" / "Base/Logic/vtkSlicerLogic.h"))
+    assert not os.path.exists(str(tmp_path / "Slicer-main" / "Testing"))
+
+
+def test_checkout_clone(tmp_path, slicer_remote):
+    remote_dir, work_dir = slicer_remote
+    slicer_ref = _checkout(tmp_path, remote_dir, "main", "Slicer-main", mirror=False)
+    assert slicer_ref.sha == git("rev-parse", "main", cwd=remote_dir)
+    sha = commit(work_dir, "Update")
+    git("push", "-q", "origin", "main", cwd=work_dir)
+
+    assert _checkout(tmp_path, remote_dir, "main", "Slicer-main", mirror=False).sha == sha
+    assert not os.path.exists(str(tmp_path / "mirror.git"))
+
+
+@pytest.mark.parametrize("mirror", [True, False])
+def test_checkout_refuses_directory_of_enclosing_repository(tmp_path, slicer_remote, mirror):
+    remote_dir, _ = slicer_remote
+    outer_dir = init_repo(tmp_path / "outer")
+    head = commit(outer_dir, "Outer", {"Slicer-main/notes.txt": "notes\n"})
+
+    with pytest.raises(AssertionError, match="is not a git checkout"):
+        _checkout(tmp_path / "outer", remote_dir, "main", "Slicer-main", mirror=mirror)
+
+    assert git("rev-parse", "HEAD", cwd=outer_dir) == head
+    assert git("status", "--porcelain", cwd=outer_dir) == ""
@@ -0,0 +1,45 @@
+import gzip
+import os
+
+from helpers import write_files
+
+from slicer_apidocs_builder.compress import compress_html_tree, read_compressed_manifest
+
+PADDING = "<p>%s</p>\n" % ("Documentation " * 64)
+
+
+def _pages(*names):
+    return {name: "<html><body><h1>%s</h1>%s</body></html>\n" % (name, PADDING) for name in names}
+
+
+def test_unchanged_files_are_not_recompressed(tmp_path):
+    html_dir = str(tmp_path / "html")
+    write_files(html_dir, _pages("index.html", "classes.html", "search.js"))
+    assert compress_html_tree(html_dir, ["gzip"], max_workers=1) == (3, 0)
+    sidecar = os.path.join(html_dir, "classes.html.gz")
+    os.utime(sidecar, (0, 0))
+
+    write_files(html_dir, {"index.html": "<html><body>Updated%s</body></html>\n" % PADDING})
+    assert compress_html_tree(html_dir, ["gzip"], max_workers=1) == (1, 2)
+
+    assert os.stat(sidecar).st_mtime == 0
+    with open(os.path.join(html_dir, "index.html"), "rb") as fp, \
+            gzip.open(os.path.join(html_dir, "index.html.gz")) as compressed:
+        assert compressed.read() == fp.read()
+    assert compress_html_tree(html_dir, ["gzip"], max_workers=1) == (0, 3)
+
+
+def test_sidecars_of_removed_files_are_deleted(tmp_path):
+    html_dir = str(tmp_path / "html")
+    write_files(html_dir, _pages("index.html", "removed.html", "shrunk.html"))
+    # Compressed by another step (e.g the search index shards): left untouched
+    write_files(html_dir, {"search/shard.json.gz": b"shard"})
+    compress_html_tree(html_dir, ["gzip"], max_workers=1)
+
+    os.remove(os.path.join(html_dir, "removed.html"))
+    write_files(html_dir, {"shrunk.html": "<html></html>\n"})
+    assert compress_html_tree(html_dir, ["gzip"], max_workers=1) == (0, 1)
+
+    assert sorted(name for name in os.listdir(html_dir) if name.endswith(".gz")) == ["index.html.gz"]
+    assert os.path.exists(os.path.join(html_dir, "search/shard.json.gz"))
+    assert sorted(read_compressed_manifest(html_dir)["files"]) == ["index.html"]
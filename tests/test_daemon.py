@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+
+import errno
+import os
+import socket
+import threading
+
+import pytest
+
+from slicer_apidocs_builder.daemon import DaemonServer, JobQueue, send_request, strip_option
+
+
+class _BlockingRunner(object):
+    """``run_job`` function blocking each job until it is released."""
+
+    def __init__(self):
+        self.started = []
+        self._events = {}
+        self._lock = threading.Lock()
+
+    def _event(self, job_id):
+        with self._lock:
+            return self._events.setdefault(job_id, threading.Event())
+
+    def __call__(self, job):
+        self.started.append(job.job_id)
+        assert self._event(job.job_id).wait(10)
+        return int(job.argv[0]) if job.argv else 0
+
+    def release(self, job):
+        self._event(job.job_id).set()
+
+    def release_all(self):
+        for job_id in self.started:
+            self._event(job_id).set()
+
+
+@pytest.fixture
+def runner():
+    return _BlockingRunner()
+
+
+def _states(queue):
+    status = queue.status()
+    return {name: [(job["id"], job["state"]) for job in jobs] for name, jobs in status.items()}
+
+
+def _wait_finished(queue, count):
+    for _ in range(1000):
+        if len(queue.status()["finished"]) >= count:
+            return
+        threading.Event().wait(0.01)
+    raise AssertionError("jobs did not finish: %s" % queue.status())
+
+
+def test_jobs_of_the_same_key_are_coalesced(runner):
+    queue = JobQueue(runner, max_workers=2)
+    running, outcome = queue.submit(["Slicer/Slicer", "main"], [], sha="a")
+    assert outcome == "queued"
+    superseded, outcome = queue.submit(["Slicer/Slicer", "main"], [], sha="b")
+    assert outcome == "queued"
+    latest, outcome = queue.submit(["Slicer/Slicer", "main"], [], sha="c")
+    assert outcome == "coalesced"
+
+    assert _states(queue) == {
+        "running": [(running.job_id, "running")],
+        "pending": [(latest.job_id, "queued")],
+        "finished": [(superseded.job_id, "superseded")],
+    }
+
+    runner.release(running)
+    runner.release(latest)
+    _wait_finished(queue, 3)
+    queue.shutdown()
+    assert runner.started == [running.job_id, latest.job_id]
+    assert [(job["id"], job["state"]) for job in queue.status()["finished"]] == [
+        (superseded.job_id, "superseded"), (running.job_id, "succeeded"), (latest.job_id, "succeeded")]
+
+
+def test_duplicate_jobs_are_not_queued(runner):
+    queue = JobQueue(runner, max_workers=1)
+    running, _ = queue.submit(["Slicer/Slicer", "main"], [], sha="a")
+    job, outcome = queue.submit(["Slicer/Slicer", "main"], [], sha="a")
+    assert (job, outcome) == (running, "duplicate")
+    pending, _ = queue.submit(["Slicer/Slicer", "main"], [], sha="b")
+    job, outcome = queue.submit(["Slicer/Slicer", "main"], [], sha="b")
+    assert (job, outcome) == (pending, "duplicate")
+    # Without SHA, jobs are never considered duplicates
+    _, outcome = queue.submit(["Slicer/Slicer", "main"], [])
+    assert outcome == "coalesced"
+
+    runner.release(running)
+    queue.shutdown(wait=False)
+
+
+def test_jobs_of_different_keys_run_in_parallel(runner):
+    queue = JobQueue(runner, max_workers=2)
+    first, _ = queue.submit(["Slicer/Slicer", "main"], ["0"])
+    second, _ = queue.submit(["Slicer/Slicer", "v5.6.1"], ["3"])
+    third, _ = queue.submit(["Slicer/Slicer", "fix"], ["0"])
+
+    assert [job["id"] for job in queue.status()["running"]] == [first.job_id, second.job_id]
+    assert [job["id"] for job in queue.status()["pending"]] == [third.job_id]
+
+    for job in [second, third, first]:
+        runner.release(job)
+    _wait_finished(queue, 3)
+    queue.shutdown()
+    finished = {job["id"]: (job["state"], job["returncode"]) for job in queue.status()["finished"]}
+    assert finished == {first.job_id: ("succeeded", 0), second.job_id: ("failed", 3), third.job_id: ("succeeded", 0)}
+
+
+def test_shutdown_cancels_pending_jobs(runner):
+    queue = JobQueue(runner, max_workers=1)
+    running, _ = queue.submit(["Slicer/Slicer", "main"], [])
+    pending, _ = queue.submit(["Slicer/Slicer", "v5.6.1"], [])
+
+    queue.shutdown(wait=False)
+    runner.release(running)
+    _wait_finished(queue, 2)
+
+    assert _states(queue) == {
+        "running": [],
+        "pending": [],
+        "finished": [(pending.job_id, "cancelled"), (running.job_id, "succeeded")],
+    }
+    assert queue.status()["finished"][0]["finished"] is not None
+    assert runner.started == [running.job_id]
+
+
+@pytest.fixture
+def socket_path(tmp_path):
+    return str(tmp_path / "daemon.sock")
+
+
+@pytest.fixture
+def server(runner, socket_path):
+    queue = JobQueue(runner, max_workers=1)
+    server = DaemonServer(socket_path, queue)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    runner.release_all()
+    queue.shutdown()
+
+
+def test_socket_protocol(server, socket_path):
+    request = {"action": "submit", "key": ["Slicer/Slicer", "main"], "argv": ["--skip-publish"],
+               "sha": "a", "cwd": "/tmp"}
+    response = send_request(socket_path, request)
+    assert response["outcome"] == "queued"
+    assert (response["job"]["key"], response["job"]["sha"], response["job"]["cwd"]) == (
+        ["Slicer/Slicer", "main"], "a", "/tmp")
+    assert send_request(socket_path, request)["outcome"] == "duplicate"
+
+    status = send_request(socket_path, {"action": "status"})
+    assert [job["id"] for job in status["running"]] == [response["job"]["id"]]
+
+    assert "unknown action" in send_request(socket_path, {"action": "restart"})["error"]
+    assert "invalid request" in send_request(socket_path, {"key": []})["error"]
+
+
+def test_socket_of_running_daemon_is_not_taken_over(server, socket_path):
+    with pytest.raises(OSError) as exc_info:
+        DaemonServer(socket_path, JobQueue(lambda job: 0))
+    assert exc_info.value.errno == errno.EADDRINUSE
+    assert send_request(socket_path, {"action": "status"})["running"] == []
+
+
+def test_stale_socket_is_replaced(runner, socket_path):
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(socket_path)
+    stale.close()
+    assert os.path.exists(socket_path)
+
+    queue = JobQueue(runner)
+    server = DaemonServer(socket_path, queue)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        assert send_request(socket_path, {"action": "shutdown"}) == {"outcome": "stopping"}
+        thread.join(10)
+        assert not thread.is_alive()
+    finally:
+        server.server_close()
+        queue.shutdown()
+
+
+def test_strip_option():
+    argv = ["--daemon-submit", "--daemon-sha", "abc", "--daemon-socket=/tmp/s", "--slicer-repo-branch", "main"]
+    argv = strip_option(argv, "--daemon-submit", has_value=False)
+    argv = strip_option(strip_option(argv, "--daemon-sha"), "--daemon-socket")
+    assert argv == ["--slicer-repo-branch", "main"]
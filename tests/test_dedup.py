@@ -0,0 +1,63 @@
+import gzip
+import json
+import os
+
+from helpers import read_file, write_files
+
+from slicer_apidocs_builder.compress import (
+    COMPRESSED_MANIFEST_FILENAME, compress_html_tree, compressed_cache_dir, read_compressed_manifest)
+from slicer_apidocs_builder.dedup import dedup_html_tree, git_blob_id, shared_asset_path
+from slicer_apidocs_builder.sync import file_digest
+
+PADDING = "<p>%s</p>\n" % ("Documentation " * 64)
+
+
+def _page(*assets):
+    return "<html><head>%s</head><body>%s</body></html>\n" % (
+        "".join('<img src="%s"/>' % asset for asset in assets), PADDING)
+
+
+def test_dedup_refreshes_sidecars_of_rewritten_pages(tmp_path):
+    html_dir = str(tmp_path / "html")
+    store_dir = str(tmp_path / "store")
+    write_files(html_dir, {
+        "index.html": _page("doxygen.png"),
+        "classes/vtkSlicerLogic.html": _page("../doxygen.png", "../local.png"),
+        "unrelated.html": _page("local.png"),
+        "doxygen.png": "shared image",
+        "local.png": "local image",
+    })
+    compress_html_tree(html_dir, ["gzip"], max_workers=1)
+    shared_blob_id = git_blob_id(os.path.join(html_dir, "doxygen.png"))
+
+    shared = dedup_html_tree(html_dir, "main", {shared_blob_id}, store_dir)
+
+    shared_path = shared_asset_path(shared_blob_id, ".png")
+    assert shared == {shared_path: "doxygen.png"}
+    assert os.path.exists(os.path.join(store_dir, shared_path))
+    assert b"../%s" % shared_path.encode() in read_file(os.path.join(html_dir, "index.html"))
+    assert b"../../%s" % shared_path.encode() in read_file(os.path.join(html_dir, "classes/vtkSlicerLogic.html"))
+
+    manifest = read_compressed_manifest(html_dir)
+    for page in ("index.html", "classes/vtkSlicerLogic.html", "unrelated.html"):
+        path = os.path.join(html_dir, page)
+        with open(path, "rb") as fp, gzip.open(path + ".gz") as compressed:
+            assert compressed.read() == fp.read()
+        assert manifest["files"][page]["sha1"] == file_digest(path)
+        assert manifest["files"][page]["size"] == os.path.getsize(path)
+
+    # Next compression of the tree has nothing left to do
+    assert compress_html_tree(html_dir, ["gzip"], max_workers=1) == (0, 3)
+
+
+def test_dedup_of_uncompressed_tree(tmp_path):
+    html_dir = str(tmp_path / "html")
+    write_files(html_dir, {"index.html": _page("doxygen.png"), "doxygen.png": "shared image"})
+    shared_blob_id = git_blob_id(os.path.join(html_dir, "doxygen.png"))
+
+    dedup_html_tree(html_dir, "main", {shared_blob_id}, str(tmp_path / "store"))
+
+    assert not os.path.exists(os.path.join(compressed_cache_dir(html_dir), COMPRESSED_MANIFEST_FILENAME))
+    assert not os.path.exists(os.path.join(html_dir, "index.html.gz"))
+    with open(os.path.join(html_dir, "apidocs-shared.json")) as fp:
+        assert list(json.load(fp)["files"].values()) == ["doxygen.png"]
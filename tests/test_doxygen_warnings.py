@@ -0,0 +1,66 @@
+from slicer_apidocs_builder.doxygen_warnings import (
+    DoxygenWarningCollector, diff_warning_indexes, format_warning_summary)
+
+OUTPUT = """\
+Generating docs for compound vtkMRMLNode...
+/work/Slicer/Libs/MRML/vtkMRMLNode.h:120: warning: The following parameter of vtkMRMLNode::SetName is not documented:
+  parameter 'name'
+/work/Slicer/Libs/MRML/vtkMRMLNode.h:200: warning: Member Copy() of class vtkMRMLNode is not documented.
+
+  Not a continuation of the previous warning
+/usr/include/vtkObject.h:10: warning: Found unknown command '\\vtkTypeMacro'
+warning: Tag file '/work/Slicer-build/vtk.tag' does not exist or is not a file. Skipping it...
+/work/Slicer/Modules/Loadable/Markups/qSlicerMarkupsModule.h:5: error: Unexpected end of file
+"""
+
+
+def _collect(output=OUTPUT):
+    collector = DoxygenWarningCollector("/work/Slicer/")
+    for line in output.splitlines(True):
+        collector(line)
+    return collector
+
+
+def test_collector_joins_continuation_lines_and_normalizes_paths():
+    assert _collect().warnings == [
+        ["Libs/MRML/vtkMRMLNode.h", 120, "warning",
+         "The following parameter of vtkMRMLNode::SetName is not documented: parameter 'name'"],
+        ["Libs/MRML/vtkMRMLNode.h", 200, "warning",
+         "Member Copy() of class vtkMRMLNode is not documented."],
+        ["/usr/include/vtkObject.h", 10, "warning", "Found unknown command '\\vtkTypeMacro'"],
+        ["", 0, "warning", "Tag file '/work/Slicer-build/vtk.tag' does not exist or is not a file. Skipping it..."],
+        ["Modules/Loadable/Markups/qSlicerMarkupsModule.h", 5, "error", "Unexpected end of file"],
+    ]
+
+
+def test_index_groups_warnings_by_file_and_kind():
+    index = _collect().index()
+
+    assert index["count"] == 5
+    assert index["by_kind"] == {"error": 1, "other": 1, "parameter": 1, "undocumented": 1, "unknown-command": 1}
+    assert [entry[:2] for entry in index["files"]["Libs/MRML/vtkMRMLNode.h"]] == [
+        [120, "parameter"], [200, "undocumented"]]
+
+
+def test_diff_reports_new_and_fixed_warnings_ignoring_line_numbers():
+    previous = _collect().index()
+    current = _collect(OUTPUT.replace(":200: ", ":210: ").replace(
+        "/usr/include/vtkObject.h:10: warning: Found unknown command '\\vtkTypeMacro'",
+        "/work/Slicer/Base/QTGUI/qSlicerApplication.h:42: warning: unable to resolve reference to 'qSlicerIO'")).index()
+
+    summary = diff_warning_indexes(previous, current)
+
+    assert (summary["total"], summary["previous_total"]) == (5, 5)
+    assert summary["new"] == [
+        ["Base/QTGUI/qSlicerApplication.h", "unresolved-reference", "unable to resolve reference to 'qSlicerIO'"]]
+    assert summary["fixed"] == [
+        ["/usr/include/vtkObject.h", "unknown-command", "Found unknown command '\\vtkTypeMacro'"]]
+    assert format_warning_summary(summary) == "1 new warning, 1 fixed"
+
+
+def test_diff_without_previous_index_reports_every_warning_as_new():
+    summary = diff_warning_indexes(None, _collect().index())
+
+    assert summary["previous_total"] is None
+    assert (summary["new_count"], summary["fixed_count"]) == (5, 0)
+    assert format_warning_summary(summary) == "5 new warnings"
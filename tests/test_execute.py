@@ -0,0 +1,93 @@
+import gzip
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from slicer_apidocs_builder.utils import CommandCancelled, execute
+
+# Print numbered lines, start a grandchild sleeping in the same session, save
+# both pids then sleep.
+SLEEPER = """
+import subprocess, sys, time
+for number in range(%(lines)d):
+    print("line %%d" %% number, flush=True)
+grandchild = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"])
+with open(sys.argv[1], "w") as fp:
+    fp.write("%%d %%d" %% (grandchild.pid, __import__("os").getpid()))
+print("ready", flush=True)
+time.sleep(60)
+"""
+
+
+def _is_running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    # Zombies are not running
+    with open("/proc/%d/stat" % pid) as fp:
+        return fp.read().rsplit(")", 1)[1].split()[0] != "Z"
+
+
+def _sleeper(tmp_path, lines=50):
+    pid_file = str(tmp_path / "pids")
+    return [sys.executable, "-c", SLEEPER % {"lines": lines}, pid_file], pid_file
+
+
+def _assert_terminated(pid_file):
+    with open(pid_file) as fp:
+        pids = [int(pid) for pid in fp.read().split()]
+    deadline = time.monotonic() + 5
+    while any(_is_running(pid) for pid in pids) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not any(_is_running(pid) for pid in pids)
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc"), reason="requires /proc")
+def test_execute_terminates_the_command_and_its_children_on_timeout(tmp_path):
+    args, pid_file = _sleeper(tmp_path)
+    started = time.monotonic()
+
+    with pytest.raises(subprocess.TimeoutExpired) as exc_info:
+        execute(args, streaming=True, quiet=True, tail_lines=3, timeout=1)
+
+    assert time.monotonic() - started < 30
+    assert exc_info.value.output == "line 48\nline 49\nready\n"
+    _assert_terminated(pid_file)
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc"), reason="requires /proc")
+def test_execute_terminates_the_command_when_cancelled(tmp_path):
+    args, pid_file = _sleeper(tmp_path, lines=1)
+    cancel_event = threading.Event()
+
+    def _cancel_when_ready(line):
+        if line == "ready\n":
+            cancel_event.set()
+
+    with pytest.raises(CommandCancelled) as exc_info:
+        execute(args, streaming=True, quiet=True, output_callback=_cancel_when_ready, cancel_event=cancel_event)
+
+    assert exc_info.value.output == "line 0\nready\n"
+    _assert_terminated(pid_file)
+
+
+def test_execute_logs_the_whole_output_and_raises_with_its_tail(tmp_path):
+    log_file = str(tmp_path / "build.log.gz")
+    lines = []
+    script = "import sys\nfor number in range(1000):\n    print('line %d' % number)\nsys.exit(3)\n"
+
+    with pytest.raises(subprocess.CalledProcessError) as exc_info:
+        execute([sys.executable, "-c", script], streaming=True, quiet=True,
+                output_callback=lines.append, log_file=log_file, tail_lines=2)
+
+    expected = ["line %d\n" % number for number in range(1000)]
+    assert exc_info.value.returncode == 3
+    assert exc_info.value.output == "line 998\nline 999\n"
+    assert lines == expected
+    with gzip.open(log_file, "rt") as fp:
+        assert fp.read() == "".join(expected)
@@ -0,0 +1,127 @@
+import json
+
+import pytest
+
+import slicer_apidocs_builder
+from slicer_apidocs_builder import _apidocs_gc
+
+from helpers import commit, git, make_remote, remote_file, remote_files, slicer_files
+
+OLD_DATE = "@1600000000 +0000"
+
+INDEX = (
+    '<ul><li><a href="main/">main</a></li><li><a href="gone/">gone</a></li>'
+    '<li><a href="v5.6/index.html">v5.6</a></li></ul>\n'
+    '<p><a href="old/doc/">old</a> <a href="recent/">recent</a></p>\n'
+)
+
+
+def _shared_manifest(*shared_paths):
+    return json.dumps({"version": 1, "files": {path: "doxygen.png" for path in shared_paths}})
+
+
+@pytest.fixture
+def remotes(tmp_path):
+    """Return ``(slicer_remote_dir, publish_remote_dir, publish_work_dir)``.
+
+    All the subdirs are published by a commit older than the retention window.
+    """
+    slicer_remote_dir, _ = make_remote(tmp_path, "Slicer", {"main": slicer_files(), "feature": slicer_files()})
+    publish_remote_dir, publish_work_dir = make_remote(tmp_path, "apidocs", {"gh-pages": {
+        "index.html": INDEX,
+        "main/index.html": "main",
+        "main/apidocs-shared.json": _shared_manifest("_shared/aa/used.png"),
+        "feature/index.html": "feature",
+        "v5.6/index.html": "v5.6",
+        "gone/index.html": "gone",
+        "gone/apidocs-shared.json": _shared_manifest("_shared/bb/unused.png"),
+        "old/doc/index.html": "old/doc",
+        "recent/index.html": "recent",
+        "_shared/aa/used.png": "used",
+        "_shared/bb/unused.png": "unused",
+        "_shared/bb/unused.png.gz": "unused",
+    }}, date=OLD_DATE)
+    return slicer_remote_dir, publish_remote_dir, publish_work_dir
+
+
+def _gc(tmp_path, remotes, **kwargs):
+    slicer_remote_dir, publish_remote_dir, _ = remotes
+    return _apidocs_gc(
+        slicer_repo_url=slicer_remote_dir,
+        publish_github_repo_dir=str(tmp_path / "apidocs"),
+        publish_github_repo_url="file://" + publish_remote_dir,
+        publish_github_repo_name="Slicer/apidocs.slicer.org",
+        publish_github_repo_branch="gh-pages",
+        publish_github_user_name="Slicer Bot",
+        publish_github_user_email="slicerbot@example.com",
+        publish_github_skip_auth=True,
+        **kwargs
+    )
+
+
+def _update_recent(remotes):
+    _, _, publish_work_dir = remotes
+    commit(publish_work_dir, "Update recent", {"recent/index.html": "recent 2"})
+    git("push", "-q", "origin", "gh-pages", cwd=publish_work_dir)
+
+
+def test_gc_removes_stale_subdirs(tmp_path, remotes):
+    _update_recent(remotes)
+
+    assert _gc(tmp_path, remotes, keep_days=30, prune_shared_assets=True) == ["gone", "old/doc"]
+
+    publish_remote_dir = remotes[1]
+    assert remote_files(publish_remote_dir, "gh-pages") == {
+        "index.html",
+        "main/index.html", "main/apidocs-shared.json",
+        "feature/index.html",
+        "v5.6/index.html",
+        "recent/index.html",
+        "_shared/aa/used.png",
+    }
+    # Only the list item linking to the removed subdir is removed. The line
+    # also linking to a kept subdir is left as is.
+    assert remote_file(publish_remote_dir, "gh-pages", "index.html") == (
+        '<ul><li><a href="main/">main</a></li><li><a href="v5.6/index.html">v5.6</a></li></ul>\n'
+        '<p><a href="old/doc/">old</a> <a href="recent/">recent</a></p>')
+
+
+def test_gc_dry_run_when_no_commit_is_in_the_retention_window(tmp_path, remotes):
+    publish_remote_dir = remotes[1]
+    tip = git("rev-parse", "gh-pages", cwd=publish_remote_dir)
+
+    assert _gc(tmp_path, remotes, keep_days=30, dry_run=True) == ["gone", "old/doc", "recent"]
+    assert git("rev-parse", "gh-pages", cwd=publish_remote_dir) == tip
+
+
+def test_gc_without_retention_window(tmp_path, remotes):
+    _update_recent(remotes)
+
+    assert _gc(tmp_path, remotes, keep_days=0) == ["gone", "old/doc", "recent"]
+    # Shared assets are only pruned if requested
+    assert "_shared/bb/unused.png" in remote_files(remotes[1], "gh-pages")
+
+
+def test_gc_collects_again_when_the_push_is_rejected(tmp_path, remotes, monkeypatch):
+    _, publish_remote_dir, publish_work_dir = remotes
+    git_push = slicer_apidocs_builder._git_push
+    pushes = []
+
+    def _concurrent_git_push(*args, **kwargs):
+        if not pushes:
+            # Another publisher updates the branch first
+            commit(publish_work_dir, "Publish other", {"other/index.html": "other"})
+            git("push", "-q", "origin", "gh-pages", cwd=publish_work_dir)
+        pushes.append(args)
+        git_push(*args, **kwargs)
+
+    monkeypatch.setattr(slicer_apidocs_builder, "_git_push", _concurrent_git_push)
+    monkeypatch.setattr(slicer_apidocs_builder, "PUSH_RETRY_DELAY", 0)
+
+    assert _gc(tmp_path, remotes, keep_days=30) == ["gone", "old/doc", "recent"]
+
+    assert len(pushes) == 2
+    files = remote_files(publish_remote_dir, "gh-pages")
+    assert "other/index.html" in files
+    assert not {"gone/index.html", "old/doc/index.html", "recent/index.html"} & files
+    assert git("log", "-1", "--format=%s", "gh-pages~1", cwd=publish_remote_dir) == "Publish other"
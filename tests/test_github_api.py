@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import http.client
+import time
+
+import pytest
+
+from slicer_apidocs_builder import github_api
+from slicer_apidocs_builder.github_api import GitHubAPIError, GitHubClient
+from slicer_apidocs_builder.testing import fake_github
+
+SHA = "a" * 40
+
+
+@pytest.fixture
+def delays(monkeypatch):
+    """Record the delays waited by the client instead of sleeping."""
+    recorded = []
+
+    async def _sleep(delay):
+        recorded.append(delay)
+
+    monkeypatch.setattr(github_api.asyncio, "sleep", _sleep)
+    return recorded
+
+
+def _run(server, coroutine_function, max_connections=4):
+    async def _main(client):
+        return await coroutine_function(client)
+
+    with GitHubClient("secret", server.url, max_connections=max_connections) as client:
+        return asyncio.run(_main(client)), client
+
+
+def test_ref_lookup():
+    with fake_github({"heads/main": SHA}) as server:
+        async def _lookups(client):
+            return await asyncio.gather(
+                client.ref_sha("Slicer/Slicer", "heads/main"),
+                client.ref_sha("Slicer/Slicer", "heads/main"),
+                client.ref_sha("Slicer/Slicer", "tags/v5.6.1"))
+        (main, cached, missing), client = _run(server, _lookups)
+
+    assert (main, cached, missing) == (SHA, SHA, None)
+    assert sorted(path for _, path, _ in server.requests) == [
+        "/repos/Slicer/Slicer/git/ref/heads/main", "/repos/Slicer/Slicer/git/ref/tags/v5.6.1"]
+    assert server.requests[0][2]["Authorization"] == "token secret"
+
+
+def test_conditional_requests_reuse_cached_responses():
+    with fake_github({"heads/main": SHA}) as server:
+        async def _requests(client):
+            return [await client.request("GET", "/repos/Slicer/Slicer/git/ref/heads/main") for _ in range(2)]
+        responses, client = _run(server, _requests)
+
+    assert responses == [(200, {"object": {"sha": SHA}})] * 2
+    assert server.requests[1][2]["If-None-Match"] == '"%s"' % SHA
+
+
+def test_status_creation_uses_persistent_connections():
+    with fake_github() as server:
+        async def _statuses(client):
+            for index in range(3):
+                await client.create_status(
+                    "Slicer/Slicer", SHA, "pending", target_url="http://apidocs.slicer.org",
+                    description="API documentation is being generated", context="slicer/apidocs")
+        _, client = _run(server, _statuses, max_connections=1)
+
+    assert len(server.statuses) == 3
+    assert server.statuses[0] == ("Slicer/Slicer", SHA, {
+        "state": "pending", "target_url": "http://apidocs.slicer.org",
+        "description": "API documentation is being generated", "context": "slicer/apidocs"})
+    assert server.connections == 1
+    assert client.requests == 3
+
+
+def test_rate_limit_waits(delays):
+    with fake_github({"heads/main": SHA}) as server:
+        reset = int(time.time()) + 30
+        server.responses = [
+            (403, {"message": "secondary rate limit"}, {"Retry-After": "5"}),
+            (200, {"object": {"sha": SHA}}, {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": str(reset),
+                                             "X-RateLimit-Limit": "5000"}),
+        ]
+
+        async def _lookups(client):
+            first = await client.ref_sha("Slicer/Slicer", "heads/main")
+            second = await client.ref_sha("Slicer/Slicer", "heads/fix")
+            return first, second
+        shas, client = _run(server, _lookups)
+
+    assert shas == (SHA, None)
+    assert len(server.requests) == 3
+    # Retry-After, then the reset of the exhausted rate limit
+    assert delays[0] == 5.0
+    assert 25 <= delays[1] <= 30
+    assert client.rate_limit["limit"] == 5000
+
+
+def test_rate_limit_wait_too_long(delays):
+    with fake_github() as server:
+        server.responses = [(429, {"message": "rate limit"}, {"Retry-After": "3600"})]
+        with pytest.raises(GitHubAPIError, match="rate limit exceeded"):
+            _run(server, lambda client: client.ref_sha("Slicer/Slicer", "heads/main"))
+    assert delays == []
+
+
+def test_server_errors_are_retried(delays):
+    with fake_github({"heads/main": SHA}) as server:
+        server.responses = [(502, {"message": "Bad Gateway"}), (503, {"message": "Unavailable"})]
+        sha, _ = _run(server, lambda client: client.ref_sha("Slicer/Slicer", "heads/main"))
+    assert sha == SHA
+    assert delays == [2, 4]
+
+
+def test_error_mapping(delays):
+    with fake_github() as server:
+        server.responses = [(422, {"message": "Validation Failed"})]
+        with pytest.raises(GitHubAPIError) as exc_info:
+            _run(server, lambda client: client.create_status("Slicer/Slicer", SHA, "unknown"))
+        assert exc_info.value.status == 422
+        assert "Validation Failed" in str(exc_info.value)
+
+        server.responses = [(404, {"message": "Not Found"})]
+        with pytest.raises(GitHubAPIError) as exc_info:
+            _run(server, lambda client: client.create_status("Slicer/Private", SHA, "success"))
+        assert exc_info.value.status == 404
+
+        server.responses = [(500, {"message": "Internal Server Error"})] * 3
+        with pytest.raises(GitHubAPIError) as exc_info:
+            _run(server, lambda client: client.ref_sha("Slicer/Slicer", "heads/main"))
+        assert exc_info.value.status == 500
+    assert len(server.requests) == 3
+    assert delays == []
+
+
+def test_idle_connection_closed_by_the_server_is_replaced():
+    with fake_github({"heads/main": SHA}) as server:
+        server.responses = [(200, {"object": {"sha": SHA}}, None, True)]
+
+        async def _requests(client):
+            await client.ref_sha("Slicer/Slicer", "heads/main")
+            await asyncio.sleep(0.1)
+            await client.create_status("Slicer/Slicer", SHA, "success")
+        _run(server, _requests, max_connections=1)
+
+    assert len(server.statuses) == 1
+    assert server.connections == 2
+
+
+def test_post_is_not_sent_twice_over_a_reused_connection():
+    with fake_github({"heads/main": SHA}) as server:
+        async def _requests(client):
+            await client.ref_sha("Slicer/Slicer", "heads/main")
+            # The server closes the connection once the status is received
+            server.responses = [None]
+            await client.create_status("Slicer/Slicer", SHA, "success")
+        with pytest.raises((http.client.HTTPException, OSError)):
+            _run(server, _requests, max_connections=1)
+
+    assert [method for method, _, _ in server.requests] == ["GET", "POST"]
+
+
+def test_get_is_sent_again_over_a_new_connection():
+    with fake_github({"heads/main": SHA, "heads/fix": SHA}) as server:
+        async def _requests(client):
+            await client.ref_sha("Slicer/Slicer", "heads/main")
+            server.responses = [None]
+            return await client.ref_sha("Slicer/Slicer", "heads/fix")
+        sha, _ = _run(server, _requests, max_connections=1)
+
+    assert sha == SHA
+    assert [path.rsplit("/", 1)[1] for _, path, _ in server.requests] == ["main", "fix", "fix"]
+    assert server.connections == 2
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+
+import subprocess
+
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from slicer_apidocs_builder.instrumentation import REPORT, RunReport, call_with_spans, span
+
+
+@pytest.fixture(autouse=True)
+def empty_report():
+    REPORT.reset()
+    yield
+    REPORT.reset()
+
+
+def _worker(name, fail=False):
+    with span("worker", ref=name):
+        with span("step"):
+            if fail:
+                raise subprocess.CalledProcessError(2, ["false"])
+    return name.upper()
+
+
+def test_worker_spans_are_merged_under_the_current_span():
+    with ProcessPoolExecutor(max_workers=2) as executor, span("batch"):
+        futures = [executor.submit(call_with_spans, _worker, name) for name in ["main", "v5.6.1"]]
+        for future in futures:
+            result, spans = future.result()
+            REPORT.merge(spans)
+        assert result == "V5.6.1"
+
+    paths = [(record["path"], record["depth"], record["status"]) for record in REPORT.spans]
+    assert paths == [
+        ("batch", 0, "ok"),
+        ("batch/worker", 1, "ok"), ("batch/worker/step", 2, "ok"),
+        ("batch/worker", 1, "ok"), ("batch/worker/step", 2, "ok"),
+    ]
+    assert [REPORT.spans[record["parent"]]["name"] for record in REPORT.spans[1:]] == [
+        "batch", "worker", "batch", "worker"]
+    assert REPORT.spans[3]["parent"] == 0 and REPORT.spans[4]["parent"] == 3
+    assert REPORT.spans[3]["attributes"] == {"ref": "v5.6.1"}
+    assert all("wall_s" in record for record in REPORT.spans)
+
+
+def test_worker_spans_are_attached_to_exceptions():
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        future = executor.submit(call_with_spans, _worker, "main", fail=True)
+        with pytest.raises(subprocess.CalledProcessError) as exc_info:
+            future.result()
+    REPORT.merge(exc_info.value.spans)
+
+    assert [(record["path"], record["status"]) for record in REPORT.spans] == [
+        ("worker", "error"), ("worker/step", "error")]
+
+
+def test_merge_without_open_span():
+    report = RunReport()
+    with report.span("phase"):
+        pass
+    report.merge([{"name": "worker", "path": "worker", "parent": None, "depth": 0, "attributes": {},
+                   "status": "ok"}])
+    assert report.spans[1]["parent"] is None
+    assert report.spans[1]["path"] == "worker"
@@ -0,0 +1,35 @@
+import json
+
+from helpers import write_files
+
+from slicer_apidocs_builder.linkcheck import check_html_links
+
+
+def test_broken_links_and_anchors_are_reported(tmp_path):
+    html_dir = str(tmp_path / "html")
+    write_files(html_dir, {
+        "index.html": "".join([
+            '<html><body><img src="../_shared/ab/cdef.png"/>',
+            '<a href="classes/vtkSlicerLogic.html#member">member</a>',
+            '<a href="classes/vtkSlicerLogic.html#missing">missing anchor</a>',
+            '<a href="missing.html">missing file</a>',
+            '<img src="../_shared/ff/0000.png"/>',
+            '<a href="https://slicer.org">external</a>',
+            '<a href="../v5.6/index.html">other version</a>',
+            '</body></html>\n']),
+        "classes/vtkSlicerLogic.html": '<html><body><a id="member"></a><a href="../index.html#top">top</a>'
+                                       '</body></html>\n',
+        "orphan.png": "image",
+        "apidocs-shared.json": json.dumps({"version": 1, "files": {"_shared/ab/cdef.png": "doxygen.png"}}),
+    })
+
+    report = check_html_links(html_dir, max_workers=1)
+
+    assert report["broken"] == [
+        ["classes/vtkSlicerLogic.html", "../index.html#top", "missing anchor"],
+        ["index.html", "classes/vtkSlicerLogic.html#missing", "missing anchor"],
+        ["index.html", "missing.html", "missing file"],
+        ["index.html", "../_shared/ff/0000.png", "missing shared asset"],
+    ]
+    assert (report["pages"], report["links"], report["unchecked"]) == (2, 6, 1)
+    assert report["orphans"] == ["orphan.png"]
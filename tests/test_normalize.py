@@ -0,0 +1,48 @@
+from slicer_apidocs_builder.normalize import normalize_content, normalize_html_tree
+
+from helpers import read_file, write_files
+
+PAGE = """<div class="memproto">enum vtkMRMLNode::@%(first)d</div>
+<div class="memproto">union vtkMRMLNode::@%(second)d</div>
+<p>Values of <a class="el" href="unionvtkMRMLNode@%(second)d.html">@%(second)d</a> and @%(first)d.</p>
+<p>Contact slicer@example.org, see %(source_dir)s/Libs/MRML/vtkMRMLNode.h</p>
+<hr/>Generated on %(date)s for Slicer by doxygen 1.9.8
+"""
+
+NORMALIZED_PAGE = b"""<div class="memproto">enum vtkMRMLNode::@0</div>
+<div class="memproto">union vtkMRMLNode::@1</div>
+<p>Values of <a class="el" href="unionvtkMRMLNode@%(second)d.html">@1</a> and @0.</p>
+<p>Contact slicer@example.org, see Libs/MRML/vtkMRMLNode.h</p>
+<hr/>Generated for Slicer by doxygen 1.9.8
+"""
+
+
+def _page(first, second, date="Mon Jan 1 2024 12:00:00"):
+    return PAGE % {"first": first, "second": second, "date": date, "source_dir": "/work/Slicer"}
+
+
+def test_normalize_keeps_anonymous_entities_distinct():
+    normalized = normalize_content(_page(12, 7).encode(), strip_prefixes=["/work/Slicer"])
+
+    assert normalized == NORMALIZED_PAGE % {b"second": 7}
+    assert normalize_content(normalized) == normalized
+
+
+def test_normalize_output_does_not_depend_on_the_anonymous_numbering_or_date():
+    first = normalize_content(_page(12, 7).encode())
+    second = normalize_content(_page(3, 40, date="Tue Feb 2 2024 08:30:00").encode())
+
+    assert first.replace(b"@7.html", b"@40.html") == second
+
+
+def test_normalize_html_tree_rewrites_modified_files_only(tmp_path):
+    html_dir = str(tmp_path / "html")
+    write_files(html_dir, {
+        "classvtkMRMLNode.html": _page(12, 7),
+        "normalized.html": (NORMALIZED_PAGE % {b"second": 7}).decode(),
+        "image.png": "@12",
+    })
+
+    assert normalize_html_tree(html_dir, strip_prefixes=["/work/Slicer"], max_workers=1) == 1
+    assert read_file(tmp_path / "html/classvtkMRMLNode.html") == NORMALIZED_PAGE % {b"second": 7}
+    assert read_file(tmp_path / "html/image.png") == b"@12"
@@ -0,0 +1,51 @@
+import os
+
+from slicer_apidocs_builder.partitions import build_partitions
+from slicer_apidocs_builder.testing import fake_doxygen
+
+from helpers import commit, init_repo, read_file
+
+
+def _build(tmp_path, source_dir, revision):
+    doxyfile = str(tmp_path / "build" / "Doxyfile.txt")
+    os.makedirs(os.path.dirname(doxyfile), exist_ok=True)
+    with open(doxyfile, "w") as fp:
+        fp.write("INPUT = %s/Libs %s/Modules\nRECURSIVE = YES\nFILE_PATTERNS = *.h\n" % (source_dir, source_dir))
+    partitions = build_partitions(
+        doxyfile, fake_doxygen(tmp_path), source_dir, revision, str(tmp_path / "html"),
+        str(tmp_path / "build" / "partitions"), max_workers=2)
+    return {partition.name: partition.outcome.split(" in ")[0] for partition in partitions}
+
+
+def test_html_of_partitions_is_regenerated_when_a_tag_file_changes(tmp_path):
+    source_dir = init_repo(tmp_path / "Slicer")
+    revision = commit(source_dir, "Initial", {
+        "Libs/MRML/vtkMRMLNode.h": "class vtkMRMLNode;\n",
+        "Modules/Markups/vtkMarkupsLogic.h": "class vtkMarkupsLogic;\n",
+    })
+    assert _build(tmp_path, source_dir, revision) == {"Libs": "built", "Modules": "built"}
+    assert _build(tmp_path, source_dir, revision) == {"Libs": "reused", "Modules": "reused"}
+
+    # New class: the pages of Modules link to it
+    revision = commit(source_dir, "Add class", {"Libs/MRML/vtkMRMLScene.h": "class vtkMRMLScene;\n"})
+    assert _build(tmp_path, source_dir, revision) == {"Libs": "built", "Modules": "built"}
+    assert b"../Libs/classvtkMRMLScene.html" in read_file(tmp_path / "html/Modules/classvtkMarkupsLogic.html")
+
+    # Tag file of Libs is unchanged
+    revision = commit(source_dir, "Update class", {"Libs/MRML/vtkMRMLScene.h": "class vtkMRMLScene {};\n"})
+    assert _build(tmp_path, source_dir, revision) == {"Libs": "built", "Modules": "reused"}
+
+
+def test_html_of_a_rebuilt_partition_only_holds_the_pages_of_its_sources(tmp_path):
+    source_dir = init_repo(tmp_path / "Slicer")
+    revision = commit(source_dir, "Initial", {
+        "Libs/MRML/vtkMRMLNode.h": "class vtkMRMLNode;\n",
+        "Libs/MRML/vtkMRMLScene.h": "class vtkMRMLScene;\n",
+        "Modules/Markups/vtkMarkupsLogic.h": "class vtkMarkupsLogic;\n",
+    })
+    _build(tmp_path, source_dir, revision)
+
+    revision = commit(source_dir, "Remove class", removed=["Libs/MRML/vtkMRMLScene.h"])
+    assert _build(tmp_path, source_dir, revision) == {"Libs": "built", "Modules": "built"}
+    assert not os.path.exists(str(tmp_path / "html/Libs/classvtkMRMLScene.html"))
+    assert os.path.exists(str(tmp_path / "html/Libs/classvtkMRMLNode.html"))
@@ -0,0 +1,74 @@
+import os
+import tempfile
+
+import pytest
+
+import slicer_apidocs_builder
+from slicer_apidocs_builder import _apidocs_plan_ref, _is_noop_plan
+from slicer_apidocs_builder.fingerprint import compute_build_fingerprint, write_build_fingerprint
+from slicer_apidocs_builder.publish import FilesystemPublishBackend
+
+from helpers import commit, git, make_remote, slicer_files, write_files
+
+APIDOCS_CMAKELISTS = os.path.join(os.path.dirname(os.path.abspath(slicer_apidocs_builder.__file__)),
+                                  "CMakeLists.txt")
+
+
+@pytest.fixture
+def built(tmp_path, monkeypatch):
+    """Return the keyword arguments of _apidocs_plan_ref for the documentation of the
+    main branch of a remote built and published from its mirror."""
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    remote_dir, work_dir = make_remote(tmp_path, "Slicer", {"main": slicer_files()})
+    mirror_dir = str(tmp_path / "Slicer-Slicer.git")
+    git("clone", "-q", "--mirror", remote_dir, mirror_dir)
+    sha = git("rev-parse", "main", cwd=remote_dir)
+
+    build_dir = str(tmp_path / "Slicer-Slicer-main-build")
+    html_dir = build_dir + "/Utilities/Doxygen/html"
+    write_files(html_dir, {"index.html": "main"})
+    write_build_fingerprint(build_dir, *compute_build_fingerprint(
+        mirror_dir, "5.7", APIDOCS_CMAKELISTS, revision=sha, options={"doxygen_partition_depth": None}))
+    backend = FilesystemPublishBackend(str(tmp_path / "site"))
+    backend.publish([(html_dir, "main", "Slicer/Slicer@%s" % sha[:8])])
+
+    return work_dir, dict(
+        slicer_repo_name="Slicer/Slicer",
+        slicer_repo_branch_or_tag="main",
+        slicer_repo_clone_url=remote_dir,
+        slicer_repo_dir=str(tmp_path / "Slicer-Slicer-main"),
+        slicer_repo_mirror_dir=mirror_dir,
+        apidocs_build_dir=build_dir,
+        html_output_dir=html_dir,
+        publish_backend=backend,
+    )
+
+
+def test_plan_of_published_ref_is_a_noop(built):
+    _, kwargs = built
+    plan = _apidocs_plan_ref(**kwargs)
+    assert (plan["build"]["action"], plan["publish"]["action"]) == ("reuse", "no-op")
+    assert _is_noop_plan(plan)
+
+
+def test_plan_is_not_a_noop_if_the_mirror_is_outdated(built):
+    work_dir, kwargs = built
+    sha = commit(work_dir, "Update", {"README.md": "Updated\n"})
+    git("push", "-q", "origin", "main", cwd=work_dir)
+
+    plan = _apidocs_plan_ref(**kwargs)
+
+    assert plan["sha"] == sha
+    assert plan["build"]["action"] is None
+    assert plan["build"]["reason"].startswith("mirror is outdated")
+    assert not _is_noop_plan(plan)
+
+
+def test_plan_of_unreachable_remote_is_unknown(built, tmp_path):
+    _, kwargs = built
+    kwargs["slicer_repo_clone_url"] = str(tmp_path / "missing.git")
+
+    plan = _apidocs_plan_ref(**kwargs)
+
+    assert plan["build"]["action"] is None and plan["publish"]["action"] is None
+    assert not _is_noop_plan(plan)
@@ -0,0 +1,132 @@
+import json
+import os
+
+import pytest
+
+from slicer_apidocs_builder.publish import (
+    OBJECTS_DIR, SITE_MANIFEST_FILENAME, VERSIONS_DIR, FilesystemPublishBackend, PublishBackend)
+
+from helpers import read_file, write_files
+
+
+def _tree(tmp_path, name, files):
+    html_dir = str(tmp_path / name)
+    write_files(html_dir, files)
+    return html_dir
+
+
+def _versions(site_dir, subdir):
+    versions_dir = os.path.join(site_dir, VERSIONS_DIR, subdir)
+    return sorted(name for name in os.listdir(versions_dir) if os.path.isdir(os.path.join(versions_dir, name)))
+
+
+def _objects(site_dir):
+    return sorted(name for _, _, names in os.walk(os.path.join(site_dir, OBJECTS_DIR)) for name in names)
+
+
+def test_publish_switches_the_subdir_once_the_version_is_written(tmp_path, monkeypatch):
+    site_dir = str(tmp_path / "site")
+    backend = FilesystemPublishBackend(site_dir)
+    first = _tree(tmp_path, "first", {"index.html": "first", "removed.html": "removed"})
+    backend.publish([(first, "main", "Slicer@aaaaaaaa")])
+    first_version = backend.current_version("main")
+
+    switched = []
+
+    def _switch(subdir, version_dir):
+        # Readers still see the complete previous version
+        assert read_file(os.path.join(site_dir, "main", "index.html")) == b"first"
+        assert read_file(os.path.join(version_dir, "index.html")) == b"second"
+        original_switch(subdir, version_dir)
+        switched.append(version_dir)
+
+    original_switch = backend._switch
+    monkeypatch.setattr(backend, "_switch", _switch)
+    second = _tree(tmp_path, "second", {"index.html": "second", "added.html": "added"})
+    result = backend.publish_tree(second, "main", "Slicer@bbbbbbbb")
+
+    assert tuple(result) == (["added.html"], ["index.html"], ["removed.html"])
+    assert os.path.islink(os.path.join(site_dir, "main"))
+    assert switched == [backend.current_version("main")]
+    assert read_file(os.path.join(site_dir, "main", "index.html")) == b"second"
+    assert not os.path.lexists(os.path.join(site_dir, "main.tmp-link"))
+    assert os.path.isdir(first_version)
+    with open(os.path.join(site_dir, SITE_MANIFEST_FILENAME)) as fp:
+        assert json.load(fp)["subdirs"] == {
+            "main": os.path.relpath(backend.current_version("main"), site_dir)}
+    assert backend.is_published("main", "Slicer@bbbbbbbb") is True
+    assert backend.is_published("main", "Slicer@aaaaaaaa") is False
+    assert backend.is_published("v5.6", "Slicer@aaaaaaaa") is False
+
+
+def test_publish_hardlinks_files_shared_by_versions_and_subdirs(tmp_path):
+    site_dir = str(tmp_path / "site")
+    backend = FilesystemPublishBackend(site_dir)
+    backend.publish([
+        (_tree(tmp_path, "main", {"index.html": "main", "doxygen.css": "style"}), "main", None),
+        (_tree(tmp_path, "v5.6", {"index.html": "v5.6", "css/doxygen.css": "style"}), "v5.6", None),
+    ])
+    backend.publish([(_tree(tmp_path, "main-2", {"index.html": "main 2", "doxygen.css": "style"}), "main", None)])
+
+    stylesheets = [os.path.join(site_dir, VERSIONS_DIR, "main", version, "doxygen.css")
+                   for version in _versions(site_dir, "main")]
+    stylesheets.append(os.path.join(site_dir, "v5.6", "css", "doxygen.css"))
+    assert len({os.stat(path).st_ino for path in stylesheets}) == 1
+    # Stored once in the objects directory, along with each index.html
+    assert os.stat(stylesheets[0]).st_nlink == 4
+    assert len(_objects(site_dir)) == 4
+
+
+def test_publish_of_identical_tree_is_a_noop(tmp_path):
+    site_dir = str(tmp_path / "site")
+    backend = FilesystemPublishBackend(site_dir)
+    html_dir = _tree(tmp_path, "html", {"index.html": "main"})
+    backend.publish([(html_dir, "main", "Slicer@aaaaaaaa")])
+    version = backend.current_version("main")
+
+    assert backend.publish_tree(html_dir, "main", "Slicer@aaaaaaaa") is None
+    assert backend.current_version("main") == version
+    assert _versions(site_dir, "main") == [os.path.basename(version)]
+
+
+def test_publish_prunes_old_versions_and_unused_objects(tmp_path):
+    site_dir = str(tmp_path / "site")
+    backend = FilesystemPublishBackend(site_dir, keep_versions=2)
+    for number in range(3):
+        backend.publish([(_tree(tmp_path, "html-%d" % number, {
+            "index.html": "version %d" % number, "doxygen.css": "style"}), "main", None)])
+        if number == 0:
+            first_version = backend.current_version("main")
+
+    versions = _versions(site_dir, "main")
+    assert len(versions) == 2
+    assert os.path.basename(backend.current_version("main")) == versions[-1]
+    assert not os.path.exists(first_version) and not os.path.exists(first_version + ".json")
+    # Objects of the removed version only are removed
+    assert len(_objects(site_dir)) == 3
+
+
+def test_publish_migrates_directory_published_before_the_backend(tmp_path):
+    site_dir = str(tmp_path / "site")
+    write_files(site_dir, {"main/index.html": "legacy"})
+    backend = FilesystemPublishBackend(site_dir, keep_versions=2)
+
+    backend.publish([(_tree(tmp_path, "first", {"index.html": "first"}), "main", None)])
+    legacy_versions = [name for name in _versions(site_dir, "main") if name.endswith("-legacy")]
+    assert len(legacy_versions) == 1
+    assert read_file(os.path.join(site_dir, VERSIONS_DIR, "main", legacy_versions[0], "index.html")) == b"legacy"
+    assert read_file(os.path.join(site_dir, "main", "index.html")) == b"first"
+    first_version = backend.current_version("main")
+
+    # The legacy directory is the oldest version
+    backend.publish([(_tree(tmp_path, "second", {"index.html": "second"}), "main", None)])
+    assert _versions(site_dir, "main") == sorted(
+        [os.path.basename(first_version), os.path.basename(backend.current_version("main"))])
+
+
+def test_publish_backend_requires_publish():
+    class IncompleteBackend(PublishBackend):
+        pass
+
+    with pytest.raises(TypeError):
+        IncompleteBackend()
@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+
+import os
+import subprocess
+
+import pytest
+
+import slicer_apidocs_builder
+from slicer_apidocs_builder import GitPublishBackend, _apidocs_publish_doxygen
+
+from helpers import commit, git, make_remote, remote_file, remote_files, write_files
+
+
+def _publish(tmp_path, remote_dir, html_dir, subdir="main", sha_ref="Slicer@0123456789", **kwargs):
+    _apidocs_publish_doxygen(
+        html_output_dir=str(html_dir),
+        publish_github_repo_dir=str(tmp_path / "apidocs"),
+        publish_github_repo_url=remote_dir,
+        publish_github_repo_name="Slicer/apidocs.slicer.org",
+        publish_github_repo_branch="gh-pages",
+        publish_github_user_name="Slicer Bot",
+        publish_github_user_email="slicerbot@example.com",
+        publish_github_skip_auth=True,
+        publish_github_subdir=subdir,
+        slicer_repo_sha_ref=sha_ref,
+        **kwargs
+    )
+
+
+def _concurrent_publisher(monkeypatch, work_dir, updates):
+    """Commit and push each of ``updates`` from ``work_dir`` before the matching push
+    attempt of the publication. Return the list of push attempts."""
+    git_push = slicer_apidocs_builder._git_push
+    pushes = []
+
+    def _git_push(*args, **kwargs):
+        if len(pushes) < len(updates):
+            commit(work_dir, "Publish other %d" % len(pushes), updates[len(pushes)])
+            git("push", "-q", "origin", "gh-pages", cwd=work_dir)
+        pushes.append(args)
+        git_push(*args, **kwargs)
+
+    monkeypatch.setattr(slicer_apidocs_builder, "_git_push", _git_push)
+    monkeypatch.setattr(slicer_apidocs_builder, "PUSH_RETRY_DELAY", 0)
+    return pushes
+
+
+def test_publish_syncs_changed_files(tmp_path):
+    remote_dir, _ = make_remote(tmp_path, "apidocs", {"gh-pages": {
+        "index.html": "top", "main/index.html": "old", "main/removed.html": "removed"}})
+    html_dir = tmp_path / "html"
+    write_files(html_dir, {"index.html": "new", "added.html": "added"})
+
+    _publish(tmp_path, remote_dir, html_dir)
+
+    assert remote_files(remote_dir, "gh-pages") == {"index.html", "main/index.html", "main/added.html"}
+    assert remote_file(remote_dir, "gh-pages", "main/index.html") == "new"
+    assert "Slicer@0123456789" in git("log", "-1", "--format=%B", "gh-pages", cwd=remote_dir)
+
+
+def test_publish_ignores_files_left_by_an_interrupted_run(tmp_path):
+    remote_dir, _ = make_remote(tmp_path, "apidocs", {"gh-pages": {"main/index.html": "old"}})
+    html_dir = tmp_path / "html"
+    write_files(html_dir, {"index.html": "new", "page.html": "page"})
+    _publish(tmp_path, remote_dir, tmp_path / "missing")
+
+    # Untracked files identical to the generated ones or absent from them
+    write_files(tmp_path / "apidocs", {"main/page.html": "page", "main/leftover.html": "leftover"})
+    _publish(tmp_path, remote_dir, html_dir)
+
+    assert remote_files(remote_dir, "gh-pages") == {"main/index.html", "main/page.html"}
+    assert not os.path.exists(str(tmp_path / "apidocs" / "main" / "leftover.html"))
+
+
+def test_rejected_push_is_rebased_on_the_remote_branch(tmp_path, monkeypatch):
+    remote_dir, work_dir = make_remote(tmp_path, "apidocs", {"gh-pages": {"main/index.html": "old"}})
+    html_dir = tmp_path / "html"
+    write_files(html_dir, {"index.html": "new"})
+    pushes = _concurrent_publisher(monkeypatch, work_dir, [{"other/index.html": "other"}])
+
+    _publish(tmp_path, remote_dir, html_dir)
+
+    assert len(pushes) == 2
+    assert remote_files(remote_dir, "gh-pages") == {"main/index.html", "other/index.html"}
+    assert remote_file(remote_dir, "gh-pages", "main/index.html") == "new"
+    assert git("log", "--format=%s", "gh-pages", cwd=remote_dir).splitlines() == [
+        "Slicer apidocs update for Slicer@0123456789", "Publish other 0", "Initial gh-pages"]
+
+
+def test_rejected_push_replays_the_published_subdir_on_the_remote_branch(tmp_path, monkeypatch):
+    remote_dir, work_dir = make_remote(tmp_path, "apidocs", {"gh-pages": {"main/index.html": "old"}})
+    html_dir = tmp_path / "html"
+    write_files(html_dir, {"index.html": "new", "added.html": "added"})
+    # The rebase conflicts: the publication of main is restored on top of the remote branch
+    pushes = _concurrent_publisher(monkeypatch, work_dir, [{
+        "main/index.html": "concurrent", "main/stale.html": "stale", "other/index.html": "other"}])
+
+    _publish(tmp_path, remote_dir, html_dir)
+
+    assert len(pushes) == 2
+    assert remote_files(remote_dir, "gh-pages") == {"main/index.html", "main/added.html", "other/index.html"}
+    assert remote_file(remote_dir, "gh-pages", "main/index.html") == "new"
+    assert git("log", "-1", "--format=%s", "gh-pages~1", cwd=remote_dir) == "Publish other 0"
+    assert git("status", "--porcelain", cwd=str(tmp_path / "apidocs")) == ""
+
+
+def test_push_fails_once_the_attempts_are_exhausted(tmp_path, monkeypatch):
+    remote_dir, work_dir = make_remote(tmp_path, "apidocs", {"gh-pages": {"main/index.html": "old"}})
+    html_dir = tmp_path / "html"
+    write_files(html_dir, {"index.html": "new"})
+    pushes = _concurrent_publisher(monkeypatch, work_dir, [
+        {"main/index.html": "concurrent %d" % number} for number in range(3)])
+
+    with pytest.raises(subprocess.CalledProcessError):
+        _publish(tmp_path, remote_dir, html_dir, publish_github_push_attempts=2)
+
+    assert len(pushes) == 2
+    assert git("log", "-1", "--format=%s", "gh-pages", cwd=remote_dir) == "Publish other 1"
+    assert remote_file(remote_dir, "gh-pages", "main/index.html") == "concurrent 1"
+
+
+def _make_remote_history(tmp_path, count):
+    """Return ``(remote_dir, work_dir)`` whose gh-pages branch has ``count`` commits."""
+    remote_dir, work_dir = make_remote(tmp_path, "apidocs", {"gh-pages": {"main/index.html": "update 0"}})
+    for number in range(1, count):
+        commit(work_dir, "Publish other %d" % number, {"main/index.html": "update %d" % number})
+    git("push", "-q", "origin", "gh-pages", cwd=work_dir)
+    return remote_dir, work_dir
+
+
+def test_history_is_squashed_into_a_root_commit(tmp_path):
+    remote_dir, _ = _make_remote_history(tmp_path, 4)
+    html_dir = tmp_path / "html"
+    write_files(html_dir, {"index.html": "new"})
+
+    _publish(tmp_path, remote_dir, html_dir, publish_github_max_history=2)
+
+    messages = git("log", "--format=%B%x00", "gh-pages", cwd=remote_dir).split("\0")
+    assert [message.strip().splitlines()[0] for message in messages if message.strip()] == [
+        "Slicer apidocs update for Slicer@0123456789", "Publish other 3", "Slicer apidocs history squashed"]
+    # The root commit has no parent and the content of the first kept commit
+    root = git("rev-list", "--max-parents=0", "gh-pages", cwd=remote_dir)
+    assert root == git("rev-parse", "gh-pages~2", cwd=remote_dir)
+    assert git("rev-parse", "%s^{tree}" % root, cwd=remote_dir) == git(
+        "rev-parse", "gh-pages~1^{tree}", cwd=remote_dir)
+    assert remote_file(remote_dir, "gh-pages", "main/index.html") == "new"
+    # The local checkout follows the rewritten branch
+    assert git("rev-parse", "HEAD", cwd=str(tmp_path / "apidocs")) == git("rev-parse", "gh-pages", cwd=remote_dir)
+
+
+def test_history_is_not_squashed_if_the_lease_is_rejected(tmp_path, monkeypatch):
+    remote_dir, work_dir = _make_remote_history(tmp_path, 4)
+    html_dir = tmp_path / "html"
+    write_files(html_dir, {"index.html": "new"})
+    git_push = slicer_apidocs_builder._git_push
+
+    def _git_push(*args, **kwargs):
+        if kwargs.get("force_with_lease"):
+            # Another publisher updates the branch before the rewritten history is pushed
+            git("fetch", "-q", "origin", "gh-pages", cwd=work_dir)
+            git("reset", "-q", "--hard", "origin/gh-pages", cwd=work_dir)
+            commit(work_dir, "Publish other", {"other/index.html": "other"})
+            git("push", "-q", "origin", "gh-pages", cwd=work_dir)
+        git_push(*args, **kwargs)
+
+    monkeypatch.setattr(slicer_apidocs_builder, "_git_push", _git_push)
+
+    _publish(tmp_path, remote_dir, html_dir, publish_github_max_history=2)
+
+    assert git("rev-list", "--count", "gh-pages", cwd=remote_dir) == "6"
+    assert git("log", "-2", "--format=%s", "gh-pages", cwd=remote_dir).splitlines() == [
+        "Publish other", "Slicer apidocs update for Slicer@0123456789"]
+
+
+def _is_published(repo_dir, subdir, sha_ref):
+    backend = GitPublishBackend(publish_github_repo_dir=repo_dir, publish_github_repo_branch="gh-pages")
+    return backend.is_published(subdir, sha_ref)
+
+
+def test_is_published_from_a_shallow_checkout(tmp_path):
+    remote_dir, work_dir = make_remote(tmp_path, "apidocs", {"gh-pages": {"main/index.html": "old"}})
+    html_dir = tmp_path / "html"
+    write_files(html_dir, {"index.html": "new"})
+    _publish(tmp_path, remote_dir, html_dir, sha_ref="Slicer@main")
+    git("pull", "-q", "--ff-only", "origin", "gh-pages", cwd=work_dir)
+    commit(work_dir, "Publish other", {"other/index.html": "other"})
+    git("push", "-q", "origin", "gh-pages", cwd=work_dir)
+
+    full_dir = str(tmp_path / "full")
+    git("clone", "-q", "--branch", "gh-pages", remote_dir, full_dir)
+    assert _is_published(full_dir, "main", "Slicer@main") is True
+    assert _is_published(full_dir, "main", "Slicer@other") is False
+
+    # The last update of main is beyond the shallow boundary which appears to update every subdir
+    shallow_dir = str(tmp_path / "shallow")
+    git("clone", "-q", "--branch", "gh-pages", "--depth", "1", "file://" + remote_dir, shallow_dir)
+    assert os.path.exists(os.path.join(shallow_dir, ".git", "shallow"))
+    assert _is_published(shallow_dir, "main", "Slicer@main") is None
+    assert _is_published(shallow_dir, "main", "Slicer@other") is None
+
+    # The shallow boundary lists the published ref
+    _publish(tmp_path, remote_dir, html_dir, subdir="other", sha_ref="Slicer@other")
+    git("fetch", "-q", "--depth", "1", "origin", "gh-pages", cwd=shallow_dir)
+    assert _is_published(shallow_dir, "other", "Slicer@other") is True
+
+
+def test_is_published_after_squashing_the_history(tmp_path):
+    remote_dir, work_dir = _make_remote_history(tmp_path, 4)
+    commit(work_dir, "Publish other", {"other/index.html": "other"})
+    git("push", "-q", "origin", "gh-pages", cwd=work_dir)
+    html_dir = tmp_path / "html"
+    write_files(html_dir, {"index.html": "new"})
+    _publish(tmp_path, remote_dir, html_dir, subdir="other", publish_github_max_history=2)
+
+    # The squashed root commit is the last commit appearing to update main
+    full_dir = str(tmp_path / "full")
+    git("clone", "-q", "--branch", "gh-pages", remote_dir, full_dir)
+    assert git("log", "-1", "--format=%s", "gh-pages", "--", "main", cwd=full_dir) == \
+        slicer_apidocs_builder.HISTORY_SQUASHED_SUBJECT
+    assert _is_published(full_dir, "main", "Slicer@0123456789") is None
+    assert _is_published(full_dir, "other", "Slicer@0123456789") is True
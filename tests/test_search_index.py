@@ -0,0 +1,67 @@
+import gzip
+import json
+import os
+
+import pytest
+
+from helpers import write_files
+
+from slicer_apidocs_builder.search_index import SEARCH_INDEX_DIR, build_search_index, shard_prefixes
+
+NAMES = ["v", "vtkMRMLNode", "vtkMRMLScene", "vtkSlicerLogic", "vtkSlicerApplication",
+         "VolumeRendering", "qSlicerWidget", "Markups"]
+
+
+def _page(name):
+    return ('<html><head><title>Slicer: %s Class Reference</title></head>'
+            '<body><div class="title">%s Class Reference</div></body></html>\n' % (name, name))
+
+
+def _search(html_dir, query):
+    """Look up ``query`` the way search.js does."""
+    index_dir = os.path.join(html_dir, SEARCH_INDEX_DIR)
+    with open(os.path.join(index_dir, "index.json")) as fp:
+        shards = json.load(fp)["shards"]
+    entries = []
+    for prefix in shard_prefixes(shards, query):
+        with gzip.open(os.path.join(index_dir, shards[prefix]["file"]), "rt") as fp:
+            entries.extend(entry[0] for entry in json.load(fp) if entry[0].lower().startswith(query.lower()))
+    return sorted(entries)
+
+
+@pytest.fixture
+def html_dir(tmp_path):
+    html_dir = str(tmp_path / "html")
+    write_files(html_dir, {"class%d.html" % number: _page(name) for number, name in enumerate(NAMES)})
+    write_files(html_dir, {"search/search.js": "function SearchBox() {}\n", "search/all_0.html": _page("x")})
+    return html_dir
+
+
+@pytest.mark.parametrize("query", ["v", "V", "vtk", "vtkm", "vtkMRMLS", "vtkSlicerApplication", "q", "z", ""])
+def test_lookup_finds_all_entries_starting_with_query(html_dir, tmp_path, query):
+    build_search_index(html_dir, str(tmp_path / "cache.json.gz"), max_entries=2)
+    expected = sorted(name for name in NAMES if query and name.lower().startswith(query.lower()))
+    assert _search(html_dir, query) == expected
+
+
+def test_short_query_loads_the_shards_below_split_prefix():
+    shards = {"v": {}, "vt": {}, "vo": {}, "q": {}}
+    assert shard_prefixes(shards, "v") == ["v", "vo", "vt"]
+    assert shard_prefixes(shards, "vtk") == ["v", "vt"]
+    assert shard_prefixes(shards, "?") == []
+
+
+def test_search_client_is_installed_and_hooked_once(html_dir, tmp_path):
+    cache_file = str(tmp_path / "cache.json.gz")
+    assert build_search_index(html_dir, cache_file) == (len(NAMES), 3)
+
+    index_dir = os.path.join(html_dir, SEARCH_INDEX_DIR)
+    assert {"search.js", "search.html", "index.json"} <= set(os.listdir(index_dir))
+    with open(os.path.join(html_dir, "search/search.js")) as fp:
+        hooked = fp.read()
+    assert '"../search-index/search.html?q="' in hooked
+
+    # Unchanged pages are not parsed again and the hook is not duplicated
+    assert build_search_index(html_dir, cache_file) == (0, 0)
+    with open(os.path.join(html_dir, "search/search.js")) as fp:
+        assert fp.read() == hooked
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+from slicer_apidocs_builder import _apidocs_status_updates, _status_update_parameters
+from slicer_apidocs_builder.refs import RefCache
+from slicer_apidocs_builder.testing import fake_github
+
+from helpers import commit, git, init_repo, make_remote, slicer_files
+
+NEW_SHA = "b" * 40
+
+
+def _update(tmp_path, server, state, slicer_repo_dir, branch_or_tag, revision=None):
+    update = _status_update_parameters(
+        state, str(tmp_path), "Slicer-Slicer-%s" % branch_or_tag, slicer_repo_dir, branch_or_tag,
+        status_update_revision=revision,
+        status_update_repo_name="Slicer/Slicer",
+        status_update_target_url="http://apidocs.slicer.org",
+    )
+    _apidocs_status_updates(state, [update], "token", server.url)
+
+
+def test_status_of_branch_is_resolved_using_the_api(tmp_path):
+    # Checkout of the previous run: the branch was updated since
+    slicer_repo_dir = init_repo(tmp_path / "Slicer-main")
+    commit(slicer_repo_dir, "Initial", slicer_files())
+
+    with fake_github({"heads/main": NEW_SHA}) as server:
+        _update(tmp_path, server, "pending", slicer_repo_dir, "main", revision="main")
+
+    assert [(repo, sha, payload["state"]) for repo, sha, payload in server.statuses] == [
+        ("Slicer/Slicer", NEW_SHA, "pending")]
+
+
+def test_status_of_tag_uses_the_checkout(tmp_path):
+    slicer_repo_dir = init_repo(tmp_path / "Slicer-v5.6.1")
+    sha = commit(slicer_repo_dir, "Initial", slicer_files(minor=6))
+    git("tag", "-a", "-m", "Slicer 5.6.1", "v5.6.1", cwd=slicer_repo_dir)
+
+    with fake_github() as server:
+        _update(tmp_path, server, "success", slicer_repo_dir, "v5.6.1", revision="v5.6.1")
+
+    assert [(sha_, payload["target_url"]) for _, sha_, payload in server.statuses] == [
+        (sha, "http://apidocs.slicer.org/v5.6")]
+    assert [method for method, _, _ in server.requests] == ["POST"]
+
+
+def test_status_without_checkout_resolves_the_ref_using_the_remote(tmp_path):
+    remote_dir, work_dir = make_remote(tmp_path, "Slicer", {"main": slicer_files()})
+    mirror_dir = str(tmp_path / "Slicer-mirror.git")
+    git("clone", "-q", "--mirror", remote_dir, mirror_dir)
+    # Tagged after the last fetch of the mirror
+    sha = commit(work_dir, "Release", slicer_files(minor=8))
+    git("tag", "-a", "-m", "Slicer 5.8.0", "v5.8.0", cwd=work_dir)
+    git("push", "-q", "origin", "main", "v5.8.0", cwd=work_dir)
+
+    update = _status_update_parameters(
+        "success", str(tmp_path), "Slicer-Slicer-v5.8.0", str(tmp_path / "Slicer-v5.8.0"), "v5.8.0",
+        status_update_repo_name="Slicer/Slicer",
+        status_update_target_url="http://apidocs.slicer.org",
+        ref_cache=RefCache(str(tmp_path / "refs.json")),
+        slicer_repo_mirror_dir=mirror_dir,
+        slicer_repo_clone_url=remote_dir,
+    )
+    # The version is unknown: the commit is missing from the mirror
+    assert (update["slicer_ref"].kind, update["slicer_ref"].sha, update["slicer_ref"].version) == (
+        "tag", sha, None)
+
+    with fake_github() as server:
+        _apidocs_status_updates("success", [update], "token", server.url)
+
+    assert [(sha_, payload["target_url"]) for _, sha_, payload in server.statuses] == [
+        (sha, "http://apidocs.slicer.org/v5.8")]